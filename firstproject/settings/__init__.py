@@ -0,0 +1,20 @@
+"""
+Settings are layered: base.py holds what every environment shares, and
+dev.py, test.py and prod.py adjust it. DJANGO_ENV picks the layer (dev by
+default, test for `manage.py test`); DJANGO_SETTINGS_MODULE can also name
+one of them directly, e.g. firstproject.settings.prod.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == 'test':
+    from .test import *  # noqa: F401,F403
+elif DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"DJANGO_ENV must be dev, test or prod, not {DJANGO_ENV!r}.")
@@ -0,0 +1,329 @@
+"""
+Django settings for firstproject project, shared by every environment.
+
+dev.py, test.py and prod.py build on these; see __init__.py for how one is
+picked. Values come from the environment, or from a .env file next to
+manage.py.
+
+Generated by 'django-admin startproject' using Django 5.1.6.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.1/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.1/ref/settings/
+"""
+
+from pathlib import Path
+from urllib.parse import quote
+
+import environ
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+env = environ.Env()
+if (BASE_DIR / '.env').exists():
+    environ.Env.read_env(BASE_DIR / '.env')
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = env.str('SECRET_KEY', default='django-insecure-yd985wt@*9$%odlh^_$t*74k#9jpp)1o^#iq@$weopp75rd$7u')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env.bool('DEBUG', default=False)
+
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['127.0.0.1', 'localhost', 'testserver'])
+
+# Application definition
+
+INSTALLED_APPS = [
+    'todolist.apps.TodolistConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+
+MIDDLEWARE = [
+    'todolist.logs.RequestIdMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'todolist.breaker.DatabaseBreakerMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'todolist.sharding.FrozenShardMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+    'todolist.routers.ReplicaPinningMiddleware',
+    'todolist.timezones.UserTimezoneMiddleware',
+    'todolist.profiling.ProfilingMiddleware',
+]
+
+ROOT_URLCONF = 'firstproject.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'firstproject.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+
+# DATABASE_URL, e.g. postgres://user:password@db:5432/userdb, or the DB_* variables
+# used by docker-compose.yml.
+
+DATABASES = {
+    'default': env.db('DATABASE_URL', default='postgres://{}:{}@{}:{}/{}'.format(
+        quote(env.str('DB_USER', default='user'), safe=''),
+        quote(env.str('DB_PASSWORD', default='password'), safe=''),
+        env.str('DB_HOST', default='db'),
+        env.str('DB_PORT', default='5432'),
+        env.str('DB_NAME', default='userdb'),
+    )),
+}
+# Seconds a connection is kept open between requests; 0 closes it after each one.
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=0)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', default=False)
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2. Each one gets its own
+# alias and shares the credentials of the primary.
+DATABASE_REPLICAS = []
+for index, host in enumerate(env.list('DB_REPLICA_HOSTS', default=[])):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip()}
+    DATABASE_REPLICAS.append(alias)
+
+# Task shards, e.g. DB_TASK_SHARD_HOSTS=shard1,shard2. Each user's tasks live on
+# one of them, see todolist/sharding.py. Empty keeps all tasks on the primary.
+TASK_SHARDS = []
+for index, host in enumerate(env.list('DB_TASK_SHARD_HOSTS', default=[])):
+    alias = f'shard_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip()}
+    TASK_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['todolist.sharding.ShardRouter', 'todolist.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write.
+REPLICA_PIN_SECONDS = env.int('DB_REPLICA_PIN_SECONDS', default=5)
+
+# Cache, e.g. CACHE_URL=redis://cache:6379/0
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Sessions are read from the cache first, so a session can be found while the
+# database is unavailable, see todolist/breaker.py.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Password validation
+# https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+LOGIN_REDIRECT_URL = "/"
+LOGOUT_REDIRECT_URL = "todolist:login"
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.1/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.1/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Email, used for task reminders
+# https://docs.djangoproject.com/en/5.1/topics/email/
+
+EMAIL_BACKEND = env.str('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = env.str('EMAIL_HOST', default='localhost')
+EMAIL_PORT = env.int('EMAIL_PORT', default=25)
+DEFAULT_FROM_EMAIL = env.str('DEFAULT_FROM_EMAIL', default='todolist@localhost')
+
+# Audit log of task changes, flushed in batches by a background thread.
+
+AUDIT_ASYNC = env.bool('AUDIT_ASYNC', default=True)
+AUDIT_QUEUE_SIZE = env.int('AUDIT_QUEUE_SIZE', default=10000)
+AUDIT_BATCH_SIZE = env.int('AUDIT_BATCH_SIZE', default=200)
+AUDIT_FLUSH_INTERVAL = env.float('AUDIT_FLUSH_INTERVAL', default=2)
+AUDIT_ENQUEUE_TIMEOUT = env.float('AUDIT_ENQUEUE_TIMEOUT', default=0.5)
+AUDIT_MAX_ATTEMPTS = env.int('AUDIT_MAX_ATTEMPTS', default=3)
+
+# Logging: JSON lines on stderr, written by a background thread from a bounded
+# queue, see todolist/logs.py. High-volume events are sampled, e.g.
+# LOG_SAMPLE_RATES="request=0.1;update_task=0.01"
+
+LOG_LEVEL = env.str('LOG_LEVEL', default='WARNING')
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+LOG_SAMPLE_RATES = env.dict('LOG_SAMPLE_RATES', cast={'value': float}, default={'request': 0.1, 'update_task': 0.01})
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {'()': 'todolist.logs.SamplingFilter', 'rates': LOG_SAMPLE_RATES},
+        'request_id': {'()': 'todolist.logs.RequestIdFilter'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'todolist.logs.QueueLogHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'filters': ['sampling', 'request_id'],
+        },
+    },
+    'root': {'handlers': ['json'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Request and task events are logged at INFO.
+        'todolist': {'level': env.str('TODOLIST_LOG_LEVEL', default='INFO')},
+    },
+}
+
+# Request profiling, see todolist/profiling.py
+
+PROFILE_SAMPLE_RATE = env.float('PROFILE_SAMPLE_RATE', default=0)
+PROFILE_TRACEMALLOC = env.bool('PROFILE_TRACEMALLOC', default=False)
+PROFILE_TRACEMALLOC_FRAMES = 1
+PROFILE_DIR = Path(env.str('PROFILE_DIR', default=str(BASE_DIR / 'profiles')))
+PROFILE_KEEP = env.int('PROFILE_KEEP', default=50)
+
+# Tasks per page of the index
+
+INDEX_PAGE_SIZE = env.int('INDEX_PAGE_SIZE', default=100)
+
+# Highest page number of the index; past it the OFFSET would only scan rows (or not fit the database)
+
+INDEX_MAX_PAGE = env.int('INDEX_MAX_PAGE', default=1000)
+
+# Most tasks one quick add (one per line of the new task box) can create
+
+QUICK_ADD_MAX_TASKS = env.int('QUICK_ADD_MAX_TASKS', default=100)
+
+# Suggestions for the new task box, see todolist/autocomplete.py. Each process
+# keeps the phrases of AUTOCOMPLETE_CACHE_USERS users in memory.
+
+AUTOCOMPLETE_LIMIT = env.int('AUTOCOMPLETE_LIMIT', default=8)
+AUTOCOMPLETE_HISTORY = env.int('AUTOCOMPLETE_HISTORY', default=5000)
+AUTOCOMPLETE_MAX_PHRASES = env.int('AUTOCOMPLETE_MAX_PHRASES', default=2000)
+AUTOCOMPLETE_CACHE_USERS = env.int('AUTOCOMPLETE_CACHE_USERS', default=1000)
+AUTOCOMPLETE_TTL = env.int('AUTOCOMPLETE_TTL', default=600)
+
+# Rows changed per statement by the bulk task actions, see todolist/bulk.py
+
+BULK_CHUNK_SIZE = env.int('BULK_CHUNK_SIZE', default=1000)
+
+# Calendar feed, see todolist/ical.py. Feeds are cached for ICAL_CACHE_SECONDS
+# unless larger than ICAL_CACHE_MAX_BYTES.
+
+ICAL_CACHE_SECONDS = env.int('ICAL_CACHE_SECONDS', default=86400)
+ICAL_CACHE_MAX_BYTES = env.int('ICAL_CACHE_MAX_BYTES', default=1000000)
+ICAL_CHUNK_SIZE = env.int('ICAL_CHUNK_SIZE', default=500)
+
+# Backfills of large tables, run by `manage.py run_backfills`, see todolist/backfills.py.
+# Batches slower than BACKFILL_BATCH_SECONDS are halved.
+
+BACKFILL_BATCH_SIZE = env.int('BACKFILL_BATCH_SIZE', default=1000)
+BACKFILL_BATCH_SECONDS = env.float('BACKFILL_BATCH_SECONDS', default=1)
+BACKFILL_PAUSE = env.float('BACKFILL_PAUSE', default=0.1)
+
+# Read-only mode while the database is failing or slow, see todolist/breaker.py.
+# Queries slower than DB_BREAKER_SLOW_SECONDS count as failures.
+
+DB_BREAKER_SLOW_SECONDS = env.float('DB_BREAKER_SLOW_SECONDS', default=2)
+DB_BREAKER_WINDOW = env.int('DB_BREAKER_WINDOW', default=50)
+DB_BREAKER_MIN_QUERIES = env.int('DB_BREAKER_MIN_QUERIES', default=10)
+DB_BREAKER_FAILURE_RATE = env.float('DB_BREAKER_FAILURE_RATE', default=0.5)
+DB_BREAKER_PROBE_INTERVAL = env.float('DB_BREAKER_PROBE_INTERVAL', default=5)
+# How long the task list of a day page is kept to be shown read-only.
+DB_BREAKER_SNAPSHOT_SECONDS = env.int('DB_BREAKER_SNAPSHOT_SECONDS', default=86400)
+# A page shown again within this many seconds keeps its snapshot.
+DB_BREAKER_SNAPSHOT_REFRESH = env.int('DB_BREAKER_SNAPSHOT_REFRESH', default=60)
+
+# Seconds the response of a write sent with an Idempotency-Key is kept, see
+# todolist/idempotency.py.
+
+IDEMPOTENCY_TTL = env.int('IDEMPOTENCY_TTL', default=86400)
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Background jobs, run by `manage.py run_workers`, see todolist/jobs.py
+
+JOB_WORKER_PROCESSES = env.int('JOB_WORKER_PROCESSES', default=1)
+JOB_WORKER_THREADS = env.int('JOB_WORKER_THREADS', default=2)
+JOB_POLL_INTERVAL = env.float('JOB_POLL_INTERVAL', default=2)
+# A running job whose worker sent no heartbeat for this many seconds is queued again.
+JOB_TIMEOUT = env.int('JOB_TIMEOUT', default=300)
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=3)
+# Bulk actions on more tasks than this run as a job instead of inside the request.
+JOB_INLINE_LIMIT = env.int('JOB_INLINE_LIMIT', default=1000)
+# Finished jobs, and the export files they wrote, are deleted this many seconds later by prune_jobs.
+JOB_TTL = env.int('JOB_TTL', default=86400)
+# Files written by jobs (task exports). Workers and web servers must share it.
+EXPORT_DIR = Path(env.str('EXPORT_DIR', default=str(BASE_DIR / 'exports')))
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'exports': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': EXPORT_DIR}},
+}
+
+# Webhooks: every task change is posted to each of these URLs by
+# `manage.py deliver_outbox`, see todolist/outbox.py.
+
+OUTBOX_ENDPOINTS = env.list('OUTBOX_ENDPOINTS', default=[])
+OUTBOX_BATCH_SIZE = env.int('OUTBOX_BATCH_SIZE', default=100)
+OUTBOX_CONCURRENCY = env.int('OUTBOX_CONCURRENCY', default=4)
+OUTBOX_TIMEOUT = env.float('OUTBOX_TIMEOUT', default=10)
+# Retries wait OUTBOX_BACKOFF_BASE * 2^(attempt - 1) seconds, at most OUTBOX_BACKOFF_MAX.
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=10)
+OUTBOX_BACKOFF_BASE = env.float('OUTBOX_BACKOFF_BASE', default=2)
+OUTBOX_BACKOFF_MAX = env.float('OUTBOX_BACKOFF_MAX', default=3600)
+# Events claimed by a dispatcher that stopped are sent again after this many seconds.
+OUTBOX_CLAIM_SECONDS = env.int('OUTBOX_CLAIM_SECONDS', default=300)
@@ -0,0 +1,4 @@
+"""Local development: debug on, everything else as in base.py."""
+from .base import *  # noqa: F401,F403
+
+DEBUG = env.bool('DEBUG', default=True)
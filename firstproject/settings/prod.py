@@ -0,0 +1,54 @@
+"""
+Production: no debug, a required SECRET_KEY, persistent database
+connections, cached templates, a shared cache and compressed responses.
+"""
+from .base import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = env.str('SECRET_KEY')
+
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
+
+# Keep connections open across requests, checking them before reuse so a
+# restarted database doesn't fail the first request after it.
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=600),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+    }
+    for alias, database in DATABASES.items()
+}
+
+# Templates are compiled once per process.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Shared by the workers of a container; point CACHE_URL at Redis or Memcached
+# to share it between containers.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache:///tmp/todolist-cache'),
+}
+
+# First, so it compresses what every other middleware produced.
+MIDDLEWARE = ['django.middleware.gzip.GZipMiddleware', *MIDDLEWARE]
+
+STATIC_ROOT = env.str('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# SQL is only logged at DEBUG level and with DEBUG on; make sure it never is.
+LOGGING = {
+    **LOGGING,
+    'loggers': {**LOGGING['loggers'], 'django.db.backends': {'level': 'WARNING'}},
+}
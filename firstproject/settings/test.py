@@ -0,0 +1,45 @@
+"""Settings for `manage.py test`: in-memory SQLite databases and synchronous side jobs."""
+from .base import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'shard_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+# Tests that need them turn these on with override_settings.
+DATABASE_REPLICAS = []
+TASK_SHARDS = []
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Audit rows are written synchronously so tests can assert on them.
+AUDIT_ASYNC = False
+PROFILE_SAMPLE_RATE = 0
+
+# Hashing is deliberately slow; tests create many users.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Only what tests assert on is logged; they attach their own handlers.
+LOGGING = {
+    **LOGGING,
+    'handlers': {'json': {**LOGGING['handlers']['json'], 'level': 'CRITICAL'}},
+}
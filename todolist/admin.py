@@ -1,15 +1,108 @@
 from django.contrib import admin
+from django.db import transaction
 
-from .models import Task
+from .bulk import clear_completed, delete_tasks, mark_done
+from .models import Job, Project, Tag, Task, TaskAudit
+from .sharding import shard_for, task_database
+from .sync import next_change
+
+class OwnNameListFilter(admin.SimpleListFilter):
+    """Filter by one of the logged-in user's projects or tags, read from their shard, not every user's."""
+    model = None
+
+    def lookups(self, request, model_admin):
+        return self.model.objects.for_user(request.user).filter(user=request.user).order_by('name').values_list('id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+class ProjectListFilter(OwnNameListFilter):
+    title = 'project'
+    parameter_name = 'project'
+    model = Project
+
+class TagListFilter(OwnNameListFilter):
+    title = 'tags'
+    parameter_name = 'tags'
+    model = Tag
 
 class TaskAdmin(admin.ModelAdmin):
-    list_display = ('task_text', 'user', 'pub_date')
+    list_display = ('task_text', 'user', 'pub_date', 'due_at', 'project', 'tag_list')
     search_fields = ('task_text',)
-    list_filter = ('user',)
+    list_filter = ('user', ProjectListFilter, TagListFilter)
+    list_select_related = ('project',)
+    actions = ('mark_selected_done', 'delete_selected_completed')
     def get_queryset(self, request):
-        """Return tasks based on the logged-in user."""
-        queryset = super().get_queryset(request)
-        queryset = queryset.filter(user=request.user)
+        """Return tasks based on the logged-in user, from the database holding them."""
+        queryset = super().get_queryset(request).using(shard_for(request.user))
+        # Users live on the default database, so they are prefetched rather than joined.
+        queryset = queryset.filter(user=request.user).prefetch_related('user', 'tags')
         return queryset
 
+    @admin.display(description='tags')
+    def tag_list(self, obj):
+        return ", ".join(tag.name for tag in obj.tags.all())
+
+    def save_model(self, request, obj, form, change):
+        """Save with a change number, so syncing clients and calendar feeds pick the edit up."""
+        database = obj._state.db or task_database(obj.user_id)
+        with transaction.atomic(using=database):
+            if obj.task_list_id is None:
+                obj.change_seq = next_change(obj.user_id, database)
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Task.objects.using(obj._state.db).filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Delete like the site does, leaving tombstones for syncing clients."""
+        delete_tasks(request.user, queryset)
+
+    @admin.action(description='Mark selected tasks done')
+    def mark_selected_done(self, request, queryset):
+        count = mark_done(request.user, queryset)
+        self.message_user(request, f'{count} task(s) marked done.')
+
+    @admin.action(description='Delete selected completed tasks')
+    def delete_selected_completed(self, request, queryset):
+        count = clear_completed(request.user, queryset)
+        self.message_user(request, f'{count} completed task(s) deleted.')
+
+class ProjectAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('name',)
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(shard_for(request.user)).filter(user=request.user)
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('name',)
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(shard_for(request.user)).filter(user=request.user)
+
+class TaskAuditAdmin(admin.ModelAdmin):
+    list_display = ('action', 'task_id', 'user', 'created_at')
+    list_filter = ('action',)
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(user=request.user)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'user', 'status', 'progress', 'total', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('result', 'error', 'worker', 'heartbeat_at')
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(user=request.user)
+
 admin.site.register(Task, TaskAdmin)
+admin.site.register(Project, ProjectAdmin)
+admin.site.register(Tag, TagAdmin)
+admin.site.register(TaskAudit, TaskAuditAdmin)
+admin.site.register(Job, JobAdmin)
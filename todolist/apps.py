@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TodolistConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'todolist'
+
+    def ready(self):
+        from . import timezones  # noqa: F401 connects the login signal
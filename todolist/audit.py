@@ -0,0 +1,171 @@
+"""Audit log of task changes, written off the request path.
+
+Write paths call `record_change`, which only puts the row on an in-process
+bounded queue. A daemon thread drains the queue with `bulk_create`, either
+when AUDIT_BATCH_SIZE rows are waiting or every AUDIT_FLUSH_INTERVAL seconds.
+When the queue is full the request thread waits up to AUDIT_ENQUEUE_TIMEOUT
+and then writes its own row, so a slow database slows requests down instead
+of losing history. A batch whose write fails is retried on the next wake-up;
+after AUDIT_MAX_ATTEMPTS failures its rows are written one at a time and the
+ones that still fail are logged and dropped, so one bad row can't stop the
+log.
+
+With AUDIT_ASYNC off (the test settings) rows are written immediately.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import TaskAudit
+
+logger = logging.getLogger(__name__)
+
+def write_audit_rows(rows):
+    TaskAudit.objects.bulk_create(rows)
+
+
+class AuditLog:
+    def __init__(self, writer=write_audit_rows, maxsize=None, batch_size=None, interval=None, max_attempts=None):
+        self.writer = writer
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.queue = None
+        self.pending = []
+        self.attempts = 0
+        self.thread = None
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+
+    def setup(self):
+        with self.lock:
+            if self.queue is not None:
+                return
+            self.maxsize = self.maxsize or settings.AUDIT_QUEUE_SIZE
+            self.batch_size = self.batch_size or settings.AUDIT_BATCH_SIZE
+            self.interval = self.interval or settings.AUDIT_FLUSH_INTERVAL
+            self.max_attempts = self.max_attempts or settings.AUDIT_MAX_ATTEMPTS
+            self.queue = queue.Queue(maxsize=self.maxsize)
+
+    def start(self):
+        """Start the flushing thread."""
+        self.setup()
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name="audit-log", daemon=True)
+                self.thread.start()
+
+    def enqueue(self, row):
+        if self.thread is None:
+            if not settings.AUDIT_ASYNC:
+                self.writer([row])
+                return
+            self.start()
+        try:
+            self.queue.put(row, timeout=settings.AUDIT_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            self.writer([row])
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self.wakeup.set()
+
+    def drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self):
+        """Write every queued row. Returns how many were written."""
+        self.setup()
+        written = 0
+        while True:
+            # A batch whose write failed is retried before anything newer.
+            self.pending = self.pending or self.drain(self.batch_size)
+            if not self.pending:
+                return written
+            try:
+                self.writer(self.pending)
+            except Exception:
+                self.attempts += 1
+                if self.attempts < self.max_attempts:
+                    raise
+                logger.exception(
+                    "Audit batch failed %d times, writing its rows one at a time.", self.attempts,
+                    extra={"event": "audit_batch_failed", "rows": len(self.pending)},
+                )
+                written += self.write_each(self.pending)
+            else:
+                written += len(self.pending)
+            self.pending = []
+            self.attempts = 0
+
+    def write_each(self, rows):
+        """Write rows one by one, dropping those that fail. Returns how many were written."""
+        written = 0
+        for row in rows:
+            try:
+                self.writer([row])
+            except Exception:
+                logger.exception("Dropped an audit row that can't be written.", extra={"event": "audit_row_dropped"})
+            else:
+                written += 1
+        return written
+
+    def run(self):
+        while not self.stopping.is_set():
+            # Sleeps for the interval unless a full batch is waiting.
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive, the failed batch is retried on the next wake-up.
+                logger.exception(
+                    "Audit batch write failed (attempt %d of %d).", self.attempts, self.max_attempts,
+                    extra={"event": "audit_write_failed", "rows": len(self.pending)},
+                )
+            finally:
+                close_old_connections()
+
+    def shutdown(self):
+        """Stop the thread and write what is still queued."""
+        if self.queue is None:
+            return
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 5)
+            self.thread = None
+        self.flush()
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.shutdown)
+
+
+def record_change(user, task_id, action, **changes):
+    audit_log.enqueue(TaskAudit(
+        user=user, task_id=task_id, action=action, changes=changes, created_at=timezone.now(),
+    ))
+
+
+def history_for(user, task_id=None, since=None):
+    """The user's task changes, newest first, optionally for one task or after a date."""
+    audit = TaskAudit.objects.filter(user=user)
+    if task_id is not None:
+        audit = audit.filter(task_id=task_id)
+    if since is not None:
+        audit = audit.filter(created_at__gt=since)
+    return audit.order_by("-created_at", "-id")
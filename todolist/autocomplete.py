@@ -0,0 +1,156 @@
+"""Suggestions for the new task box, from the phrases a user typed before.
+
+Each process keeps a PrefixIndex per user, for the AUTOCOMPLETE_CACHE_USERS
+users who asked most recently. An index is built the first time a user
+asks, from their AUTOCOMPLETE_HISTORY latest personal tasks: a sorted array
+of their distinct texts (compared without case and extra spaces) and how
+often each was used. A prefix is found with two binary searches and the
+most used matches win, so a keystroke costs no query. Creating, editing or
+deleting a task updates the user's index in the process that handled it,
+once the write is committed; an index is built again after AUTOCOMPLETE_TTL
+seconds, to pick up what the other processes saw.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from .models import Task
+
+
+def normalize(text):
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    def __init__(self, texts=(), size=None):
+        """Index `texts`, newest first, keeping the `size` most used ones."""
+        counts = Counter()
+        self.display = {}
+        for text in texts:
+            key = normalize(text)
+            if key:
+                counts[key] += 1
+                # The newest spelling of a phrase is the one suggested.
+                self.display.setdefault(key, text)
+        self.counts = dict(counts.most_common(size))
+        self.keys = sorted(self.counts)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, text):
+        key = normalize(text)
+        if not key:
+            return
+        if key not in self.counts:
+            bisect.insort(self.keys, key)
+            self.counts[key] = 0
+        self.counts[key] += 1
+        self.display[key] = text
+
+    def discard(self, text):
+        """Count one use of `text` less, e.g. when a task is renamed or deleted."""
+        key = normalize(text)
+        if key not in self.counts:
+            return
+        self.counts[key] -= 1
+        if self.counts[key] <= 0:
+            del self.counts[key], self.display[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def suggest(self, prefix, limit):
+        """The `limit` most used texts starting with `prefix`, most used first."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        if prefix[-1:].isspace():
+            key += " "
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_left(self.keys, key + "\U0010ffff", start)
+        # What was typed in full is not worth suggesting.
+        best = heapq.nlargest(limit + 1, self.keys[start:end], key=self.counts.__getitem__)
+        return [self.display[match] for match in best if match != key][:limit]
+
+
+class IndexCache:
+    """The indexes of the most recent users, least recently used first, each with the time it was built."""
+
+    def __init__(self):
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.indexes.get(user_id)
+            if entry is None or time.monotonic() - entry[1] > settings.AUTOCOMPLETE_TTL:
+                return None
+            self.indexes.move_to_end(user_id)
+            return entry[0]
+
+    def put(self, user_id, index):
+        with self.lock:
+            self.indexes[user_id] = (index, time.monotonic())
+            self.indexes.move_to_end(user_id)
+            while len(self.indexes) > settings.AUTOCOMPLETE_CACHE_USERS:
+                self.indexes.popitem(last=False)
+
+    def update(self, user_id, function):
+        """Call `function` with the user's index, if this process has it."""
+        with self.lock:
+            entry = self.indexes.get(user_id)
+            if entry is not None:
+                function(entry[0])
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+
+indexes = IndexCache()
+
+
+def build_index(user):
+    texts = (
+        Task.objects.for_user(user)
+        .filter(user=user, task_list__isnull=True)
+        .order_by("-pub_date")
+        .values_list("task_text", flat=True)[:settings.AUTOCOMPLETE_HISTORY]
+    )
+    return PrefixIndex(texts, settings.AUTOCOMPLETE_MAX_PHRASES)
+
+
+def suggest(user, prefix, limit=None):
+    index = indexes.get(user.pk)
+    if index is None:
+        index = build_index(user)
+        indexes.put(user.pk, index)
+    with indexes.lock:
+        return index.suggest(prefix, limit or settings.AUTOCOMPLETE_LIMIT)
+
+
+def remember(user, texts):
+    """Add new task texts of a user. Call once they are committed."""
+    def add(index):
+        for text in texts:
+            index.add(text)
+    indexes.update(getattr(user, "pk", user), add)
+
+
+def forget(user, texts):
+    """Count deleted task texts of a user out. Call once the deletion is committed."""
+    def discard(index):
+        for text in texts:
+            index.discard(text)
+    indexes.update(getattr(user, "pk", user), discard)
+
+
+def renamed(user, old, new):
+    """Swap an edited task text of a user. Call once the edit is committed."""
+    def rename(index):
+        index.discard(old)
+        index.add(new)
+    indexes.update(getattr(user, "pk", user), rename)
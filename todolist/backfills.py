@@ -0,0 +1,101 @@
+"""Online data migrations of large tables, run by `manage.py run_backfills`.
+
+A schema migration only adds what it needs (a nullable column, a new
+table); filling it for existing rows is a backfill registered here with
+`@backfill`, tied to that migration. The runner walks the table in primary
+key order, BACKFILL_BATCH_SIZE rows at a time, each batch in a short
+transaction that also saves the checkpoint in BackfillProgress, so the
+table is never locked for long, and a runner that crashed or was stopped
+carries on after the last committed batch. The batch size is halved when a
+batch takes more than BACKFILL_BATCH_SECONDS and grows back after fast
+ones, and the runner sleeps BACKFILL_PAUSE seconds between batches to leave
+room for the site's own queries.
+
+A backfill must be safe to run again on a batch and keep working while the
+site writes new rows: code written with the migration already fills them.
+"""
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+from .models import BackfillProgress
+from .sharding import SHARDED_MODELS, task_databases
+
+BACKFILLS = {}
+
+
+class Backfill:
+    def __init__(self, name, model, migration, function):
+        self.name = name
+        self.model = model
+        self.migration = migration
+        self.function = function
+
+    def databases(self):
+        """Every database holding rows of the model."""
+        if self.model._meta.model_name in SHARDED_MODELS:
+            return task_databases()
+        return [DEFAULT_DB_ALIAS]
+
+    def is_ready(self, database):
+        """Whether the migration the backfill belongs to is applied on the database."""
+        return (self.model._meta.app_label, self.migration) in MigrationRecorder(connections[database]).applied_migrations()
+
+
+def backfill(name, model, migration):
+    """Register the decorated function as the backfill `name` of `model`, run once `migration` is applied.
+
+    The function gets a queryset of the rows of one batch and returns the
+    number of rows it changed.
+    """
+    def register(function):
+        BACKFILLS[name] = Backfill(name, model, migration, function)
+        return function
+    return register
+
+
+def run_batch(backfill, database, batch_size):
+    """Backfill the next batch on a database. Returns the progress, or None when there was nothing left."""
+    with transaction.atomic(using=database):
+        # The lock keeps two runners from taking the same batch.
+        progress = BackfillProgress.objects.using(database).select_for_update().get(name=backfill.name)
+        rows = backfill.model._base_manager.using(database).filter(pk__gt=progress.last_pk).order_by("pk")
+        pks = list(rows.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return None
+        progress.rows += backfill.function(rows.filter(pk__lte=pks[-1])) or 0
+        progress.last_pk = pks[-1]
+        progress.batches += 1
+        progress.updated_at = timezone.now()
+        progress.save(update_fields=["rows", "last_pk", "batches", "updated_at"])
+    return progress
+
+
+def run_backfill(backfill, database, batch_size=None, pause=None, max_batches=None, log=None):
+    """Run a backfill on a database until it is done, or for `max_batches` batches. Returns whether it is done."""
+    max_size = batch_size or settings.BACKFILL_BATCH_SIZE
+    pause = settings.BACKFILL_PAUSE if pause is None else pause
+    batch_size = max_size
+    progress, _ = BackfillProgress.objects.using(database).get_or_create(name=backfill.name)
+    if progress.finished_at is not None:
+        return True
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        started = time.monotonic()
+        progress = run_batch(backfill, database, batch_size)
+        if progress is None:
+            BackfillProgress.objects.using(database).filter(name=backfill.name).update(finished_at=timezone.now())
+            return True
+        batches += 1
+        if log:
+            log(f"{backfill.name} on {database}: {progress.rows} row(s) through pk {progress.last_pk}")
+        if time.monotonic() - started > settings.BACKFILL_BATCH_SECONDS:
+            batch_size = max(1, batch_size // 2)
+        else:
+            batch_size = min(max_size, batch_size * 2)
+        if pause:
+            time.sleep(pause)
+    return False
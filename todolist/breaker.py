@@ -0,0 +1,216 @@
+"""Read-only degraded mode while the database is failing or slow.
+
+DatabaseBreakerMiddleware times every query of a request with an execute
+wrapper and reports it to the process's CircuitBreaker: a query slower than
+DB_BREAKER_SLOW_SECONDS, or one that failed to reach the database, is a
+failure. When at least DB_BREAKER_FAILURE_RATE of the last
+DB_BREAKER_WINDOW queries failed, the breaker opens, and requests stop
+waiting on the database:
+
+- writes are answered 503 with status "read_only" and a Retry-After header
+  (the page's offline queue keeps task edits and sends them again later);
+- a day page is rendered read-only from the snapshot of its task list saved
+  in the cache when it was shown (at most every DB_BREAKER_SNAPSHOT_REFRESH
+  seconds), for the user of the session;
+- anything else gets a 503 page.
+
+Sessions use the cached_db engine, so finding the user of a request doesn't
+need the database either, unless the session fell out of the cache: that
+request gets the 503 page. A background thread probes the databases that
+failed every DB_BREAKER_PROBE_INTERVAL seconds with a trivial query and
+closes the breaker once they all answer in time.
+"""
+import collections
+import contextlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.db import DatabaseError, InterfaceError, OperationalError, connections
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VIEWS = {"index", "day"}
+# Views that never touch the database.
+PASS_THROUGH_VIEWS = {"service_worker"}
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outcomes = collections.deque()
+        self.failing = set()
+        self.opened_at = None
+        self.prober = None
+
+    def is_open(self):
+        return self.opened_at is not None
+
+    def record(self, alias, ok):
+        with self.lock:
+            if self.outcomes.maxlen != settings.DB_BREAKER_WINDOW:
+                self.outcomes = collections.deque(self.outcomes, maxlen=settings.DB_BREAKER_WINDOW)
+            self.outcomes.append(ok)
+            if not ok:
+                self.failing.add(alias)
+            if self.opened_at is not None or len(self.outcomes) < settings.DB_BREAKER_MIN_QUERIES:
+                return
+            if self.outcomes.count(False) / len(self.outcomes) >= settings.DB_BREAKER_FAILURE_RATE:
+                self.opened_at = time.monotonic()
+                logger.error(
+                    "Database breaker opened: serving read-only pages.",
+                    extra={"event": "breaker_open", "databases": sorted(self.failing)},
+                )
+                self.start_probing()
+
+    def start_probing(self):
+        if self.prober is None or not self.prober.is_alive():
+            self.prober = threading.Thread(target=self.probe_until_healthy, name="database-breaker-probe", daemon=True)
+            self.prober.start()
+
+    def probe(self):
+        """Query each failing database once; close the breaker when they all answered in time."""
+        try:
+            for alias in sorted(self.failing):
+                started = time.perf_counter()
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                if time.perf_counter() - started > settings.DB_BREAKER_SLOW_SECONDS:
+                    return False
+        except (OperationalError, InterfaceError):
+            return False
+        finally:
+            # The next probe starts with fresh connections.
+            for alias in self.failing:
+                connections[alias].close()
+        self.reset()
+        logger.warning("Database breaker closed.", extra={"event": "breaker_closed"})
+        return True
+
+    def probe_until_healthy(self):
+        while self.is_open():
+            time.sleep(settings.DB_BREAKER_PROBE_INTERVAL)
+            self.probe()
+
+    def reset(self):
+        with self.lock:
+            self.outcomes.clear()
+            self.failing.clear()
+            self.opened_at = None
+
+
+database_breaker = CircuitBreaker()
+
+
+def timed_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    alias = context["connection"].alias
+    try:
+        result = execute(sql, params, many, context)
+    except (OperationalError, InterfaceError):
+        database_breaker.record(alias, False)
+        raise
+    database_breaker.record(alias, time.perf_counter() - started <= settings.DB_BREAKER_SLOW_SECONDS)
+    return result
+
+
+@contextlib.contextmanager
+def timing(connection):
+    """Time the queries of a connection, including what other execute wrappers add to them."""
+    connection.execute_wrappers.insert(0, timed_query)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.remove(timed_query)
+
+
+def snapshot_key(user_id, path):
+    return f"index-snapshot:{user_id}:{path}"
+
+
+def save_snapshot(request, day, tasks):
+    """Keep the task list shown on a day page, to show it read-only while the database is unavailable.
+
+    Pages shown again within DB_BREAKER_SNAPSHOT_REFRESH seconds keep their
+    snapshot, so most views cost one small cache write instead of a new one.
+    """
+    key = snapshot_key(request.user.pk, request.path)
+    if not cache.add(f"{key}:fresh", True, settings.DB_BREAKER_SNAPSHOT_REFRESH):
+        return
+    cache.set(key, {
+        "auth_hash": request.user.get_session_auth_hash(),
+        "day": day,
+        "tasks": [
+            {
+                "task_text": task.task_text,
+                "done": task.done,
+                # Formatted now: without the database the user's timezone is not known.
+                "due": timezone.localtime(task.due_at).strftime("%H:%M") if task.due_at else "",
+            }
+            for task in tasks
+        ],
+    }, settings.DB_BREAKER_SNAPSHOT_SECONDS)
+
+
+def retry_after():
+    return str(math.ceil(settings.DB_BREAKER_PROBE_INTERVAL))
+
+
+class DatabaseBreakerMiddleware:
+    """Time the queries of each request, and answer without the database while the breaker is open."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if database_breaker.is_open():
+            response = self.degraded(request)
+            if response is not None:
+                return response
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(timing(connection))
+            return self.get_response(request)
+
+    def degraded(self, request):
+        """The response while the breaker is open, or None for a view that doesn't use the database."""
+        try:
+            view_name = resolve(request.path_info).url_name
+        except Resolver404:
+            view_name = None
+        if view_name in PASS_THROUGH_VIEWS:
+            return None
+        if request.method not in ("GET", "HEAD"):
+            response = JsonResponse({
+                "status": "read_only",
+                "message": "Changes can't be saved right now. Please try again in a moment.",
+            }, status=503)
+        elif view_name in SNAPSHOT_VIEWS and (snapshot := self.snapshot(request)) is not None:
+            return render(request, "todolist/read_only.html", snapshot)
+        else:
+            response = render(request, "todolist/read_only.html", {"unavailable": True}, status=503)
+        response["Retry-After"] = retry_after()
+        return response
+
+    def snapshot(self, request):
+        """The saved task list of the page for the session's user, if that session is still valid for it."""
+        try:
+            # A session missing from the cache is loaded from the database.
+            user_id = request.session.get(SESSION_KEY)
+            auth_hash = request.session.get(HASH_SESSION_KEY)
+        except DatabaseError:
+            return None
+        if user_id is None:
+            return None
+        snapshot = cache.get(snapshot_key(user_id, request.path))
+        if snapshot is None or snapshot["auth_hash"] != auth_hash:
+            return None
+        return snapshot
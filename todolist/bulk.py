@@ -0,0 +1,99 @@
+"""Set-based actions on many tasks at once.
+
+Each action works through the matching tasks in id order, BULK_CHUNK_SIZE at
+a time, with one UPDATE or DELETE and one change number per chunk, so even
+very large lists never hold long locks or load task instances. Every action
+returns how many tasks it changed, and calls `progress` with the running
+count after each chunk when one is given (see todolist/jobs.py).
+"""
+import functools
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import record_change
+from .autocomplete import forget
+from .models import Task, TaskAudit
+from .outbox import PAYLOAD_FIELDS, TASK_DELETED, TASK_UPDATED, record_events, task_payload
+from .sharding import task_database
+from .sync import next_change, record_deletions
+
+
+def chunks(queryset, chunk_size, *fields):
+    """Yield lists of (id, *fields) of the queryset, keyset paginated by id."""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).order_by("id").values_list("id", *fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def filter_tasks(queryset, project="", tag=""):
+    """The tasks of the queryset in a project (an id) and with a tag (a name), as the index filters them."""
+    if project.isdigit():
+        queryset = queryset.filter(project_id=project)
+    if tag:
+        queryset = queryset.filter(tasktag__tag__name=tag)
+    return queryset
+
+
+def mark_done(user, queryset, chunk_size=None, progress=None):
+    """Mark every unfinished task of the queryset done."""
+    database = task_database(user)
+    updated = 0
+    for rows in chunks(queryset.filter(done=False), chunk_size or settings.BULK_CHUNK_SIZE):
+        with transaction.atomic(using=database):
+            # Tasks done since the chunk was read are left out, so only real changes get events.
+            tasks = list(
+                Task.objects.using(database).select_for_update()
+                .filter(id__in=[row[0] for row in rows], done=False).only(*PAYLOAD_FIELDS)
+            )
+            ids = [task.id for task in tasks]
+            if ids:
+                Task.objects.using(database).filter(id__in=ids).update(
+                    done=True, updated_at=timezone.now(), change_seq=next_change(user, database),
+                )
+            updated += len(ids)
+            for task in tasks:
+                task.done = True
+            record_events(user, TASK_UPDATED, [task_payload(task) for task in tasks], database)
+            for task_id in ids:
+                transaction.on_commit(functools.partial(record_change, user, task_id, TaskAudit.TOGGLE, done=True), using=database)
+        if progress:
+            progress(updated)
+    return updated
+
+
+def delete_tasks(user, queryset, chunk_size=None, progress=None):
+    """Delete every task of the queryset along with its tags."""
+    database = task_database(user)
+    deleted = 0
+    for rows in chunks(queryset, chunk_size or settings.BULK_CHUNK_SIZE, "task_text"):
+        ids = [row[0] for row in rows]
+        with transaction.atomic(using=database):
+            _, per_model = Task.objects.using(database).filter(id__in=ids).delete()
+            record_deletions(user, ids, next_change(user, database), database)
+            record_events(user, TASK_DELETED, [{"id": task_id, "user_id": user.pk} for task_id in ids], database)
+            transaction.on_commit(functools.partial(forget, user, [row[1] for row in rows]), using=database)
+            for task_id, task_text in rows:
+                transaction.on_commit(
+                    functools.partial(record_change, user, task_id, TaskAudit.DELETE, task_text=task_text), using=database,
+                )
+        deleted += per_model.get(Task._meta.label, 0)
+        if progress:
+            progress(deleted)
+    return deleted
+
+
+def clear_completed(user, queryset, chunk_size=None, progress=None):
+    return delete_tasks(user, queryset.filter(done=True), chunk_size, progress)
+
+
+ACTIONS = {
+    "mark_done": mark_done,
+    "clear_completed": clear_completed,
+    "clear_day": delete_tasks,
+}
@@ -0,0 +1,133 @@
+"""iCalendar feed of a user's tasks, for calendar apps to subscribe to.
+
+The feed's URL carries the user's secret Profile.feed_token instead of a
+session. Each personal task is an all-day event on its day in the user's
+timezone, and done tasks are marked as such in their summary.
+
+Calendar apps poll the feed, usually every few minutes, and it rarely
+changes. Its ETag is the user's ChangeCounter value, which every write to
+their tasks increases, so a poll with a current If-None-Match is answered
+304 after reading that one row. A full feed is streamed while it is
+generated and kept in the cache under the same version for
+ICAL_CACHE_SECONDS; feeds larger than ICAL_CACHE_MAX_BYTES are not cached.
+A newer change number gives a new key, so stale entries are never read
+again and are evicted by the cache.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import ChangeCounter, Task
+from .timezones import get_zone
+
+CONTENT_TYPE = "text/calendar; charset=utf-8"
+# Bump when the generated feed changes, so cached feeds are not served any more.
+FORMAT_VERSION = 1
+
+
+def feed_version(user_id, database):
+    """The user's latest change number: what the feed was generated from."""
+    return ChangeCounter.objects.using(database).filter(user_id=user_id).values_list("value", flat=True).first() or 0
+
+
+def feed_etag(user_id, version, timezone_name):
+    return f'"{FORMAT_VERSION}-{user_id}-{version}-{timezone_name}"'
+
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def fold(line):
+    """Split a content line into lines of at most 75 octets, as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Never cut a UTF-8 sequence in two.
+        while size < len(encoded) and encoded[size] & 0xC0 == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def task_event(task_id, task_text, done, pub_date, tz, stamp):
+    day = pub_date.astimezone(tz).date()
+    return "".join(fold(line) for line in (
+        "BEGIN:VEVENT",
+        f"UID:task-{task_id}@todolist",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{day + datetime.timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{escape(('Done: ' if done else '') + task_text)}",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ))
+
+
+def feed_chunks(user_id, timezone_name, database):
+    """Yield the feed in chunks of ICAL_CHUNK_SIZE tasks, reading them as they are sent."""
+    tz = get_zone(timezone_name)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "".join(fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//todolist//Tasks//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Tasks",
+        f"X-WR-TIMEZONE:{timezone_name}",
+    ))
+    tasks = (
+        Task.objects.using(database)
+        .filter(user_id=user_id, task_list__isnull=True)
+        .order_by("pub_date", "id")
+        .values_list("id", "task_text", "done", "pub_date")
+        .iterator(chunk_size=settings.ICAL_CHUNK_SIZE)
+    )
+    chunk = []
+    for task in tasks:
+        chunk.append(task_event(*task, tz, stamp))
+        if len(chunk) >= settings.ICAL_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("END:VCALENDAR\r\n")
+    yield "".join(chunk)
+
+
+def caching(key, chunks):
+    """Pass the chunks through, and cache the whole feed once it was sent completely."""
+    sent = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        size += len(data)
+        if size <= settings.ICAL_CACHE_MAX_BYTES:
+            sent.append(data)
+        yield data
+    if size <= settings.ICAL_CACHE_MAX_BYTES:
+        cache.set(key, b"".join(sent), settings.ICAL_CACHE_SECONDS)
+
+
+def feed_response(request, user_id, timezone_name, database):
+    """The feed of a user: 304 when the client has the current one, else from the cache or streamed."""
+    # Read from the database the tasks are written to, so the version and the tasks agree.
+    version = feed_version(user_id, database)
+    etag = feed_etag(user_id, version, timezone_name)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = f"ical:{FORMAT_VERSION}:{user_id}:{version}:{timezone_name}"
+        body = cache.get(key)
+        if body is not None:
+            response = HttpResponse(body, content_type=CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(caching(key, feed_chunks(user_id, timezone_name, database)), content_type=CONTENT_TYPE)
+    response["ETag"] = etag
+    # Clients revalidate every time; a 304 costs one indexed read.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,161 @@
+"""Idempotency keys for the task write endpoints.
+
+A client that may retry a write sends an Idempotency-Key header, a unique
+string per intended change. The first request with a key runs the view in
+a transaction on the database the view writes to (the user's task database,
+or the list owner's for a shared list) that also saves the key and the
+response in an IdempotencyKey row; repeats get that response back, with an
+Idempotent-Replayed header, without running the view. Views defer their
+other side effects with `transaction.on_commit`, so they only happen once the
+key is saved. Responses are cached for IDEMPOTENCY_TTL seconds, so a retry
+usually costs no query at all; the row answers when the cache lost it. The
+(user, key) unique constraint serializes concurrent duplicates: the second
+insert waits for the first transaction and then finds its response. A key
+sent again with another request body is refused with 422. Only JSON answers
+and redirects are kept: server errors and re-rendered pages are dropped, so
+the request can be made again; expired rows are deleted by
+`manage.py prune_idempotency_keys`.
+"""
+import datetime
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http.request import RawPostDataException
+from django.utils import timezone
+
+from .models import IdempotencyKey
+from .sharding import task_database
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else part.encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def request_fingerprint(request):
+    try:
+        body = request.body
+    except RawPostDataException:
+        # A multipart body was streamed into request.POST and not kept.
+        body = json.dumps(sorted(request.POST.lists()))
+    return digest(request.method, request.path, body)
+
+
+def stored_response(record):
+    return {
+        "fingerprint": record.fingerprint,
+        "status": record.status,
+        "content_type": record.content_type,
+        "location": record.location,
+        "body": record.body,
+    }
+
+
+def replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return JsonResponse({
+            "status": "error", "message": "This Idempotency-Key was already used for another request.",
+        }, status=422)
+    if stored["status"] is None:
+        return JsonResponse({
+            "status": "error", "message": "A request with this Idempotency-Key is still in progress.",
+        }, status=409)
+    if stored["location"]:
+        response = HttpResponseRedirect(stored["location"], stored["body"], status=stored["status"], content_type=stored["content_type"])
+    else:
+        response = HttpResponse(stored["body"], status=stored["status"], content_type=stored["content_type"])
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def replayable(response):
+    """Whether a response is kept for repeats: JSON answers and redirects, not errors or rendered pages."""
+    if response.streaming or response.status_code >= 500:
+        return False
+    return response.has_header("Location") or response.get("Content-Type", "").startswith("application/json")
+
+
+def user_database(request):
+    return task_database(request.user)
+
+
+def idempotent(view=None, *, database=user_database):
+    """Answer repeated POSTs with the same Idempotency-Key with the response of the first one.
+
+    `database(request)` is the database the view writes to; the key is saved in
+    the same transaction.
+    """
+    if view is None:
+        return functools.partial(idempotent, database=database)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "")
+        if not key or request.method != "POST" or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return JsonResponse({"status": "error", "message": "The Idempotency-Key is too long."}, status=400)
+        user_id = request.user.pk
+        key_hash = digest(key)
+        fingerprint = request_fingerprint(request)
+        cache_key = f"idempotency:{user_id}:{key_hash}"
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        using = database(request)
+        now = timezone.now()
+        expires_at = now + datetime.timedelta(seconds=settings.IDEMPOTENCY_TTL)
+        keys = IdempotencyKey.objects.using(using)
+        # Jobs live on the default database: they commit after the key, and roll back if it fails.
+        with transaction.atomic(using=DEFAULT_DB_ALIAS), transaction.atomic(using=using, savepoint=False):
+            try:
+                with transaction.atomic(using=using):
+                    record = keys.create(
+                        user_id=user_id, key_hash=key_hash, fingerprint=fingerprint, created_at=now, expires_at=expires_at,
+                    )
+            except IntegrityError:
+                # A duplicate: on PostgreSQL the insert waited for the first request to commit.
+                record = keys.select_for_update().get(user_id=user_id, key_hash=key_hash)
+                if record.expires_at > now:
+                    stored = stored_response(record)
+                    if record.status is not None:
+                        cache.set(cache_key, stored, (record.expires_at - now).total_seconds())
+                    return replay(stored, fingerprint)
+                # The key expired and is used again: it starts over.
+                keys.filter(pk=record.pk).update(
+                    fingerprint=fingerprint, status=None, content_type="", location="", body="",
+                    created_at=now, expires_at=expires_at,
+                )
+            response = view(request, *args, **kwargs)
+            if not replayable(response):
+                keys.filter(pk=record.pk).delete()
+                return response
+            stored = {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "content_type": response.get("Content-Type", ""),
+                "location": response.get("Location", "")[:255],
+                "body": response.content.decode(response.charset or "utf-8", "replace"),
+            }
+            keys.filter(pk=record.pk).update(**{name: value for name, value in stored.items() if name != "fingerprint"})
+        cache.set(cache_key, stored, settings.IDEMPOTENCY_TTL)
+        return response
+    return wrapper
+
+
+def prune_idempotency_keys(database, now=None):
+    """Delete the expired keys of a database. Returns how many were deleted."""
+    deleted, _ = IdempotencyKey.objects.using(database).filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,238 @@
+"""Long-running user operations, run off the request path by `manage.py run_workers`.
+
+Views call `enqueue`, which only stores a queued Job row on the default
+database. Workers claim the oldest queued job (with SELECT ... FOR UPDATE
+SKIP LOCKED where the backend has it, and a compare-and-set on the status
+everywhere) and call the handler registered for the job's kind. Handlers
+report progress through `set_progress`, which doubles as the worker's
+heartbeat, and return a JSON-serializable result. A running job whose worker
+sent no heartbeat for JOB_TIMEOUT seconds is queued again, up to
+JOB_MAX_ATTEMPTS times; a handler that raises fails the job right away.
+Large outputs go to the "exports" storage, and the result only names the
+file, so polling a job stays cheap. Finished jobs and their files are
+deleted after JOB_TTL seconds by `manage.py prune_jobs`.
+"""
+import datetime
+import json
+import os
+import socket
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .bulk import ACTIONS, chunks, filter_tasks
+from .models import Job, Task
+from .routers import primary_only
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the decorated function as the handler of jobs of `kind`."""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(user, kind, **params):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    return Job.objects.create(user=user, kind=kind, params=params)
+
+
+def claim_job(worker):
+    """Mark the oldest queued job as run by `worker` and return it, or None when the queue is empty."""
+    now = timezone.now()
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        candidates = Job.objects.using(DEFAULT_DB_ALIAS).filter(status=Job.QUEUED).order_by("created_at", "id")
+        if connections[DEFAULT_DB_ALIAS].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        job_id = candidates.values_list("id", flat=True).first()
+        if job_id is None:
+            return None
+        # Without row locks (SQLite) two workers can pick the same job; only one of them changes its status.
+        claimed = Job.objects.using(DEFAULT_DB_ALIAS).filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, attempts=F("attempts") + 1, started_at=now, heartbeat_at=now,
+        )
+    if not claimed:
+        return claim_job(worker)
+    return Job.objects.using(DEFAULT_DB_ALIAS).select_related("user").get(id=job_id)
+
+
+def set_progress(job, progress, total=None):
+    """Store how far a running job got. Also the worker's heartbeat, so call it at least every JOB_TIMEOUT."""
+    job.progress = progress
+    fields = {"progress": progress, "heartbeat_at": timezone.now()}
+    if total is not None:
+        job.total = fields["total"] = total
+    Job.objects.using(DEFAULT_DB_ALIAS).filter(id=job.id, worker=job.worker).update(**fields)
+
+
+def finish(job, status, result=None, error=""):
+    # A job taken over after a timeout belongs to its new worker, so it is left alone.
+    Job.objects.using(DEFAULT_DB_ALIAS).filter(id=job.id, worker=job.worker, status=Job.RUNNING).update(
+        status=status, result=result, error=error, finished_at=timezone.now(),
+    )
+
+
+def run_job(job):
+    """Run a claimed job with its handler. Returns whether it succeeded."""
+    try:
+        function = HANDLERS.get(job.kind)
+        if function is None:
+            raise ValueError(f"Unknown job kind {job.kind!r}.")
+        result = function(job)
+    except Exception as exc:
+        finish(job, Job.FAILED, error=str(exc) or exc.__class__.__name__)
+        return False
+    finish(job, Job.DONE, result=result)
+    return True
+
+
+def requeue_stale_jobs(now=None):
+    """Queue again the running jobs whose worker went silent, or fail them after JOB_MAX_ATTEMPTS."""
+    now = now or timezone.now()
+    stale = Job.objects.using(DEFAULT_DB_ALIAS).filter(
+        status=Job.RUNNING, heartbeat_at__lt=now - datetime.timedelta(seconds=settings.JOB_TIMEOUT),
+    )
+    stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED, error="The worker running this job stopped.", finished_at=now,
+    )
+    return stale.update(status=Job.QUEUED, worker="")
+
+
+def prune_jobs(now=None):
+    """Delete the jobs finished more than JOB_TTL seconds ago, with the files they wrote. Returns how many."""
+    now = now or timezone.now()
+    expired = Job.objects.using(DEFAULT_DB_ALIAS).filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=now - datetime.timedelta(seconds=settings.JOB_TTL),
+    )
+    for result in expired.filter(result__has_key="file").values_list("result", flat=True):
+        storages["exports"].delete(result["file"])
+    return expired.delete()[0]
+
+
+class Worker:
+    """Runs jobs in `threads` threads of the current process until stopped.
+
+    With `once`, every thread stops when it finds the queue empty.
+    """
+
+    def __init__(self, threads=None, interval=None, once=False, name=None):
+        self.threads = threads or settings.JOB_WORKER_THREADS
+        self.interval = interval if interval is not None else settings.JOB_POLL_INTERVAL
+        self.once = once
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self.work, args=(f"{self.name}:{index}",), name=f"job-worker-{index}")
+            for index in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            # Running jobs are finished, nothing new is claimed.
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self):
+        self.stopping.set()
+
+    def work(self, name):
+        # Jobs read what they then write, so replicas are never used here.
+        with primary_only():
+            try:
+                while not self.stopping.is_set():
+                    try:
+                        job = claim_job(name)
+                        if job is None:
+                            requeue_stale_jobs()
+                    except DatabaseError:
+                        # The database is down or busy (SQLite locks it whole); keep the thread alive.
+                        close_old_connections()
+                        self.stopping.wait(self.interval or 1)
+                        continue
+                    if job is None:
+                        if self.once:
+                            return
+                        self.stopping.wait(self.interval)
+                        continue
+                    succeeded = run_job(job)
+                    with self.lock:
+                        if succeeded:
+                            self.done += 1
+                        else:
+                            self.failed += 1
+                    close_old_connections()
+            finally:
+                connections.close_all()
+
+
+def run_worker_process(threads, interval, once):
+    """Entry point of a worker process started by `manage.py run_workers`."""
+    import django
+    django.setup()
+    Worker(threads, interval, once).run()
+
+
+@handler("bulk_action")
+def run_bulk_action(job):
+    """One of the bulk actions on the user's personal tasks between `start` and `end`, in `project` and with `tag`."""
+    action = job.params["action"]
+    tasks = filter_tasks(
+        Task.objects.for_user(job.user).filter(
+            user=job.user, task_list__isnull=True,
+            pub_date__gte=datetime.datetime.fromisoformat(job.params["start"]),
+            pub_date__lt=datetime.datetime.fromisoformat(job.params["end"]),
+        ),
+        job.params.get("project", ""), job.params.get("tag", ""),
+    )
+    affected = {"mark_done": tasks.filter(done=False), "clear_completed": tasks.filter(done=True)}.get(action, tasks)
+    set_progress(job, 0, affected.count())
+    count = ACTIONS[action](job.user, tasks, progress=lambda count: set_progress(job, count))
+    return {"count": count}
+
+
+@handler("export_tasks")
+def export_tasks(job):
+    """Every personal task of the user, in id order, written chunk by chunk to a JSON file in the exports storage."""
+    tasks = Task.objects.for_user(job.user).filter(user=job.user, task_list__isnull=True)
+    set_progress(job, 0, tasks.count())
+    fields = ("task_text", "done", "pub_date", "due_at", "project__name")
+    exported = 0
+    with tempfile.TemporaryFile() as output:
+        output.write(b'{"tasks": [')
+        for rows in chunks(tasks, settings.BULK_CHUNK_SIZE, *fields):
+            for row in rows:
+                output.write(b"," if exported else b"\n")
+                output.write(json.dumps({
+                    "id": row[0],
+                    "task_text": row[1],
+                    "done": row[2],
+                    "pub_date": row[3].isoformat(),
+                    "due_at": row[4].isoformat() if row[4] else None,
+                    "project": row[5],
+                }).encode())
+                exported += 1
+            set_progress(job, exported)
+        output.write(b"\n]}\n")
+        output.seek(0)
+        name = storages["exports"].save(f"{job.user_id}/tasks-{job.id}.json", File(output))
+    return {"count": exported, "file": name}
@@ -0,0 +1,168 @@
+"""Structured logging that never blocks a request.
+
+Records are put on a bounded in-process queue by QueueLogHandler and written
+as JSON lines by a listener thread, so a slow log sink only slows that
+thread. When the queue is full a record is dropped and counted, and the next
+record that fits is preceded by a warning with the number dropped.
+
+RequestIdMiddleware gives every request a correlation id (the incoming
+X-Request-ID header, or a new one), which RequestIdFilter adds to every
+record logged while the request runs, and logs one "request" event per
+response. Records logged with an `event` extra can be sampled with
+LOG_SAMPLE_RATES, e.g. {"update_task": 0.01} keeps one task edit in a
+hundred; kept records carry their `sample_rate`.
+
+Imported while settings are configured, so nothing here touches the models.
+"""
+import atexit
+import contextvars
+import copy
+import datetime
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+REQUEST_ID_HEADER = "HTTP_X_REQUEST_ID"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Attributes every LogRecord has; anything else was passed as `extra`.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+current_request_id = contextvars.ContextVar("current_request_id", default=None)
+
+request_logger = logging.getLogger("todolist.requests")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the id of the request being handled, if any, to every record."""
+
+    def filter(self, record):
+        record.request_id = current_request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep records of a sampled event with the probability given in `rates`."""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class QueueLogHandler(QueueHandler):
+    """Put records on a queue of `maxsize`; a listener thread writes them to `stream` as JSON.
+
+    The listener starts with the first record of each process, so forked
+    workers get their own.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, target)
+        self.listener_pid = None
+        # itertools.count is incremented atomically under the GIL, so no lock is taken.
+        self.drops = itertools.count(1)
+        self.dropped = 0
+        self.reported = 0
+
+    def start(self):
+        if self.listener_pid != os.getpid():
+            self.listener_pid = os.getpid()
+            self.listener._thread = None
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener_pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def prepare(self, record):
+        # Only what has to be done in the logging thread: freezing the message and the traceback.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.start()
+        if self.dropped > self.reported:
+            dropped = self.dropped
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Dropped {dropped} log record(s) so far: the log queue was full.", "dropped": dropped,
+                }))
+                self.reported = dropped
+            except queue.Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped = next(self.drops)
+
+
+class RequestIdMiddleware:
+    """Tag the request, its log records and its response with a correlation id."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.META.get(REQUEST_ID_HEADER, "")
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = current_request_id.set(request_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response["X-Request-ID"] = request_id
+            if request_logger.isEnabledFor(logging.INFO):
+                request_logger.info(
+                    "%s %s %s", request.method, request.path, response.status_code,
+                    extra={
+                        "event": "request",
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            return response
+        finally:
+            current_request_id.reset(token)
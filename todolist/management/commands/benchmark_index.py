@@ -0,0 +1,70 @@
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from todolist.models import Task
+from todolist.ranking import spread_ranks
+from todolist.sharding import shard_for
+from todolist.views import IndexView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure the latency and memory of rendering the index for days with many tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000], help="Tasks in the day.")
+        parser.add_argument("--repeat", type=int, default=5, help="Requests timed per size.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'tasks':>8} {'median (ms)':>12} {'peak (KiB)':>11} {'page (KiB)':>11}")
+        for size in options["sizes"]:
+            self.benchmark(size, options["repeat"])
+
+    def benchmark(self, size, repeat):
+        """Time the index for a throwaway user with `size` tasks; everything is rolled back."""
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(transaction.atomic(using=DEFAULT_DB_ALIAS))
+                user = User.objects.create_user(username=f"benchmark-{time.time_ns()}")
+                database = shard_for(user) or DEFAULT_DB_ALIAS
+                stack.enter_context(transaction.atomic(using=database))
+                now = timezone.now()
+                Task.objects.using(database).bulk_create(
+                    [Task(user=user, task_text=f"Task {i}", pub_date=now, rank=rank) for i, rank in enumerate(spread_ranks(size))],
+                    batch_size=1000,
+                )
+                self.report(size, user, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def report(self, size, user, repeat):
+        view = IndexView.as_view()
+        request = RequestFactory().get("/")
+        request.user = user
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = view(request).render()
+            timings.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        view(request).render()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{size:>8} {statistics.median(timings) * 1000:>12.1f} {peak / 1024:>11.1f} {len(response.content) / 1024:>11.1f}"
+        )
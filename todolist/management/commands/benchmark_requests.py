@@ -0,0 +1,75 @@
+import io
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests per second for a page, in process, with the active settings. "
+        "Run it once per DJANGO_ENV to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/", help="Page to request.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests timed.")
+        parser.add_argument("--warmup", type=int, default=10, help="Requests made before timing starts.")
+        parser.add_argument("--user", help="Log in as this user first.")
+
+    def handle(self, *args, **options):
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"), "localhost")
+        cookie = ""
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']}.")
+            client = Client()
+            client.force_login(user)
+            cookie = "; ".join(f"{morsel.key}={morsel.value}" for morsel in client.cookies.values())
+
+        # The real WSGI handler rather than the test client, so the request
+        # signals manage database connections as they do when serving.
+        handler = WSGIHandler()
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": options["path"],
+            "QUERY_STRING": "",
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "HTTP_HOST": host,
+            "HTTP_ACCEPT_ENCODING": "gzip",
+            "HTTP_COOKIE": cookie,
+            "wsgi.url_scheme": "http",
+            "wsgi.errors": sys.stderr,
+        }
+
+        def request():
+            status = []
+            response = handler({**environ, "wsgi.input": io.BytesIO()}, lambda s, headers, exc_info=None: status.append(s))
+            body = b"".join(response)
+            response.close()
+            return status[0], body
+
+        for _ in range(options["warmup"]):
+            request()
+        timings = []
+        for _ in range(options["requests"]):
+            started = time.perf_counter()
+            status, body = request()
+            timings.append(time.perf_counter() - started)
+
+        total = sum(timings)
+        timings.sort()
+        self.stdout.write(
+            f"{getattr(settings, 'DJANGO_ENV', settings.SETTINGS_MODULE)} GET {options['path']} -> {status}, {len(body) / 1024:.1f} KiB\n"
+            f"{len(timings) / total:.1f} requests/s, median {statistics.median(timings) * 1000:.2f} ms, "
+            f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000:.2f} ms"
+        )
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from todolist.outbox import ConnectionPool, deliver
+from todolist.sharding import task_databases
+
+
+class Command(BaseCommand):
+    help = "Post queued task change events to the OUTBOX_ENDPOINTS in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE, help="Events per request.")
+        parser.add_argument("--concurrency", type=int, default=settings.OUTBOX_CONCURRENCY, help="Requests in flight.")
+        parser.add_argument("--interval", type=float, default=2, help="Seconds to sleep when nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Send the due events and exit.")
+
+    def handle(self, *args, **options):
+        # A round claims enough events for a full batch per connection, and at least one per endpoint.
+        limit = options["batch_size"] * max(options["concurrency"], len(settings.OUTBOX_ENDPOINTS))
+        pool = ConnectionPool(options["concurrency"], settings.OUTBOX_TIMEOUT)
+        delivered = failed = 0
+        try:
+            with ThreadPoolExecutor(options["concurrency"], thread_name_prefix="outbox") as executor:
+                while True:
+                    busy = False
+                    for database in task_databases():
+                        sent, rejected = deliver(database, pool, executor, options["batch_size"], limit)
+                        delivered += sent
+                        failed += rejected
+                        if sent or rejected:
+                            self.stdout.write(f"{database}: {sent} event(s) delivered, {rejected} to retry")
+                        busy = busy or sent + rejected == limit
+                    # A full round means more are probably due, so go again right away.
+                    if busy:
+                        continue
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close()
+        self.stdout.write(f"{delivered} event(s) delivered, {failed} failed attempt(s)")
@@ -0,0 +1,57 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Summarize the request profiles written by ProfilingMiddleware, per view."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--view", help="Only summarize this view, e.g. todolist.index.")
+        parser.add_argument("--limit", type=int, default=15, help="Number of functions/allocators to show.")
+        parser.add_argument("--sort", default="cumulative", help="pstats sort key, e.g. cumulative or tottime.")
+
+    def handle(self, *args, **options):
+        root = Path(settings.PROFILE_DIR)
+        if not root.is_dir():
+            raise CommandError(f"No profiles found in {root}.")
+        directories = sorted(path for path in root.iterdir() if path.is_dir())
+        if options["view"]:
+            directories = [path for path in directories if path.name == options["view"]]
+        if not directories:
+            raise CommandError("No profiles found for that view.")
+        for directory in directories:
+            self.summarize_view(directory, options)
+
+    def summarize_view(self, directory, options):
+        profiles = sorted(directory.glob("*.prof"))
+        growths = sorted(directory.glob("*.alloc.json"))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{directory.name}: {len(profiles)} profile(s), {len(growths)} memory profile(s)"
+        ))
+        if profiles:
+            output = io.StringIO()
+            stats = pstats.Stats(str(profiles[0]), stream=output)
+            for path in profiles[1:]:
+                stats.add(str(path))
+            stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+            self.stdout.write(output.getvalue())
+        if growths:
+            self.stdout.write("Top allocators (memory still held at the end of the request, average per request):")
+            sizes = defaultdict(int)
+            counts = defaultdict(int)
+            for path in growths:
+                for location, size, count in json.loads(path.read_text()):
+                    sizes[location] += size
+                    counts[location] += count
+            top = sorted(sizes, key=sizes.get, reverse=True)[:options["limit"]]
+            for location in top:
+                self.stdout.write(
+                    f"{sizes[location] / len(growths) / 1024:10.1f} KiB "
+                    f"{counts[location] // len(growths):8d} blocks  {location}"
+                )
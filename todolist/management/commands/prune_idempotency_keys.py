@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from todolist.idempotency import prune_idempotency_keys
+from todolist.sharding import task_databases
+
+
+class Command(BaseCommand):
+    help = "Delete the stored responses of Idempotency-Key requests older than IDEMPOTENCY_TTL."
+
+    def handle(self, *args, **options):
+        for database in task_databases():
+            pruned = prune_idempotency_keys(database)
+            self.stdout.write(f"{database}: pruned {pruned} idempotency key(s).")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from todolist.jobs import prune_jobs
+
+
+class Command(BaseCommand):
+    help = "Delete the jobs finished more than JOB_TTL seconds ago, and the export files they wrote."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Pruned {prune_jobs()} job(s).")
@@ -0,0 +1,19 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from todolist.sharding import task_databases
+from todolist.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete the records of deleted tasks kept for syncing clients, once they are old enough."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Keep tombstones this many days.")
+
+    def handle(self, *args, **options):
+        older_than = datetime.timedelta(days=options["days"])
+        for database in task_databases():
+            pruned = prune_tombstones(database, older_than)
+            self.stdout.write(f"{database}: pruned {pruned} tombstone(s).")
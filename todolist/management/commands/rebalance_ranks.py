@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Length
+
+from todolist.models import Task
+from todolist.ranking import spread_ranks
+from todolist.routers import primary_only
+from todolist.sharding import shard_for, task_database, task_databases
+from todolist.sync import next_change
+
+
+def rebalance_user_ranks(user_id, batch_size=500):
+    """Respace a user's rank keys evenly, keeping their order. Returns the number of rows rewritten."""
+    database = shard_for(user_id)
+    with primary_only(), transaction.atomic(using=database):
+        tasks = list(
+            Task.objects.for_user(user_id).select_for_update().filter(user_id=user_id)
+            .order_by("rank", "pub_date", "id").only("id", "rank", "task_list_id", "change_seq")
+        )
+        changed = []
+        for task, rank in zip(tasks, spread_ranks(len(tasks))):
+            if task.rank != rank:
+                task.rank = rank
+                changed.append(task)
+        if any(task.task_list_id is None for task in changed):
+            # Syncing clients order tasks by rank, so they fetch the rewritten ones again.
+            change_seq = next_change(user_id, task_database(user_id))
+            for task in changed:
+                if task.task_list_id is None:
+                    task.change_seq = change_seq
+        Task.objects.for_user(user_id).bulk_update(changed, ["rank", "change_seq"], batch_size=batch_size)
+    return len(changed)
+
+
+class Command(BaseCommand):
+    help = "Rebalance the rank keys of users whose keys have grown too long."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-length", type=int, default=12, help="Rebalance users with a longer rank key.")
+        parser.add_argument("--limit", type=int, default=50, help="Maximum number of users per run.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = []
+        for database in task_databases():
+            user_ids += (
+                Task.objects.using(database).annotate(rank_length=Length("rank"))
+                .filter(rank_length__gt=options["max_length"])
+                .values_list("user_id", flat=True)
+                .distinct()[:options["limit"] - len(user_ids)]
+            )
+            if len(user_ids) >= options["limit"]:
+                break
+        rewritten = sum(rebalance_user_ranks(user_id, options["batch_size"]) for user_id in user_ids)
+        self.stdout.write(f"Rebalanced {len(user_ids)} user(s), {rewritten} task(s) rewritten.")
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from todolist.models import (
+    ChangeCounter, IdempotencyKey, ListMembership, Project, ShardAssignment, Tag, Task, TaskList, TaskTag, TaskTombstone,
+)
+from todolist.sharding import forget_shard, shard_for
+from todolist.sync import wait_for_writes
+
+
+def user_tasks(user, database):
+    """The tasks stored with a user: their own, and every task of the lists they own."""
+    return Task.objects.using(database).filter(Q(user=user, task_list__isnull=True) | Q(task_list__user=user))
+
+
+def delete_user_data(user, database, batch_size):
+    """Delete a user's sharded rows from one database, in batches to keep transactions short."""
+    while True:
+        ids = list(user_tasks(user, database).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        Task.objects.using(database).filter(id__in=ids).delete()
+    TaskList.objects.using(database).filter(user=user).delete()
+    Tag.objects.using(database).filter(user=user).delete()
+    Project.objects.using(database).filter(user=user).delete()
+    TaskTombstone.objects.using(database).filter(user=user).delete()
+    ChangeCounter.objects.using(database).filter(user=user).delete()
+    # Stored responses name the old task ids, so they are not copied.
+    IdempotencyKey.objects.using(database).filter(user=user).delete()
+
+
+def copy_user_data(user, source, target, batch_size):
+    """Copy a user's projects, tags, lists, tasks and task tags. Rows get new ids on the target."""
+    projects = list(Project.objects.using(source).filter(user=user))
+    created = Project.objects.using(target).bulk_create([Project(user=user, name=p.name) for p in projects])
+    project_ids = {old.id: new.id for old, new in zip(projects, created)}
+
+    tags = list(Tag.objects.using(source).filter(user=user))
+    created = Tag.objects.using(target).bulk_create([Tag(user=user, name=t.name) for t in tags])
+    tag_ids = {old.id: new.id for old, new in zip(tags, created)}
+
+    # List ids are UUIDs, unique across shards, so they are kept.
+    TaskList.objects.using(target).bulk_create(TaskList.objects.using(source).filter(user=user))
+    ListMembership.objects.using(target).bulk_create([
+        ListMembership(task_list_id=m.task_list_id, user_id=m.user_id, role=m.role)
+        for m in ListMembership.objects.using(source).filter(task_list__user=user)
+    ])
+
+    # Task ids change, so syncing clients must reload rather than apply deltas.
+    latest = ChangeCounter.objects.using(source).filter(user=user).values_list("value", flat=True).first() or 0
+    ChangeCounter.objects.using(target).create(user=user, value=latest, pruned_through=latest)
+
+    copied = 0
+    last_id = 0
+    while True:
+        # Keyset pagination, so each batch is an index range scan.
+        batch = list(user_tasks(user, source).filter(id__gt=last_id).order_by("id")[:batch_size])
+        if not batch:
+            return copied
+        last_id = batch[-1].id
+        copies = []
+        for task in batch:
+            copy = Task(
+                user_id=task.user_id, task_text=task.task_text, pub_date=task.pub_date, done=task.done,
+                rank=task.rank, project_id=project_ids.get(task.project_id), due_at=task.due_at,
+                remind_at=task.remind_at, reminder_sent_at=task.reminder_sent_at, updated_at=task.updated_at,
+                task_list_id=task.task_list_id, change_seq=task.change_seq,
+            )
+            copies.append(copy)
+        with transaction.atomic(using=target):
+            Task.objects.using(target).bulk_create(copies)
+            task_ids = {old.id: new.id for old, new in zip(batch, copies)}
+            TaskTag.objects.using(target).bulk_create([
+                TaskTag(task_id=task_ids[link.task_id], tag_id=tag_ids[link.tag_id])
+                for link in TaskTag.objects.using(source).filter(task_id__in=task_ids, tag_id__in=tag_ids)
+            ])
+        copied += len(batch)
+
+
+class Command(BaseCommand):
+    help = "Move one user's tasks to another shard while the rest of the site keeps running."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("target", help="Database alias of the destination shard.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["target"] not in settings.TASK_SHARDS:
+            raise CommandError(f"{options['target']} is not one of TASK_SHARDS: {', '.join(settings.TASK_SHARDS)}.")
+        try:
+            user = User.objects.using(DEFAULT_DB_ALIAS).get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']}.")
+
+        source, target = shard_for(user), options["target"]
+        if source == target:
+            self.stdout.write(f"{user} is already on {target}.")
+            return
+
+        # Reads keep going to the source while the copy runs, writes are refused.
+        ShardAssignment.objects.update_or_create(user=user, defaults={"alias": source, "frozen": True})
+        # Writes that got past the freeze check hold the user's change counter until they commit;
+        # the ones after this see the freeze once they hold it, and roll back.
+        wait_for_writes(user, source)
+        # A previous run may have stopped half way through the copy.
+        delete_user_data(user, target, options["batch_size"])
+        copied = copy_user_data(user, source, target, options["batch_size"])
+        ShardAssignment.objects.filter(user=user).update(alias=target, frozen=False)
+        forget_shard(user)
+        delete_user_data(user, source, options["batch_size"])
+        self.stdout.write(f"Moved {copied} task(s) of {user} from {source} to {target}.")
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from todolist.backfills import BACKFILLS, run_backfill
+from todolist.models import BackfillProgress
+
+
+class Command(BaseCommand):
+    help = "Run the registered backfills in small batches, carrying on where a previous run stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Backfills to run; all of them by default.")
+        parser.add_argument("--database", help="Only backfill this database.")
+        parser.add_argument("--batch-size", type=int, default=settings.BACKFILL_BATCH_SIZE, help="Most rows per batch.")
+        parser.add_argument("--pause", type=float, default=settings.BACKFILL_PAUSE, help="Seconds to sleep between batches.")
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches per database.")
+        parser.add_argument("--list", action="store_true", help="Show the progress of each backfill and exit.")
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - set(BACKFILLS)
+        if unknown:
+            raise CommandError(f"Unknown backfill(s): {', '.join(sorted(unknown))}")
+        for name in options["names"] or BACKFILLS:
+            backfill = BACKFILLS[name]
+            for database in backfill.databases():
+                if options["database"] and database != options["database"]:
+                    continue
+                if not backfill.is_ready(database):
+                    self.stdout.write(f"{name} on {database}: waiting for migration {backfill.migration}")
+                elif options["list"]:
+                    progress = BackfillProgress.objects.using(database).filter(name=name).first()
+                    if progress is None:
+                        self.stdout.write(f"{name} on {database}: not started")
+                    else:
+                        state = "done" if progress.finished_at else "in progress"
+                        self.stdout.write(f"{name} on {database}: {state}, {progress.rows} row(s) through pk {progress.last_pk}")
+                else:
+                    done = run_backfill(
+                        backfill, database, options["batch_size"], options["pause"], options["max_batches"],
+                        log=self.stdout.write if options["verbosity"] > 1 else None,
+                    )
+                    self.stdout.write(f"{name} on {database}: {'done' if done else 'stopped'}")
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todolist.routers import primary_only
+from todolist.sharding import ShardFrozen, task_databases
+from todolist.reminders import ReminderStats, claim_due_reminders, deliver_reminders, release_reminders
+
+
+class Command(BaseCommand):
+    help = "Poll for due task reminders and email them in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to sleep when nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Drain the due reminders and exit.")
+
+    def handle(self, *args, **options):
+        with primary_only():
+            self.run(options)
+
+    def run(self, options):
+        stats = ReminderStats()
+        try:
+            while True:
+                busy = False
+                for database in task_databases():
+                    busy = self.run_batch(database, stats, options) or busy
+                # A full batch means more are probably due, so poll again right away.
+                if busy:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(stats.summary())
+
+    def run_batch(self, database, stats, options):
+        """Claim and deliver one batch from a task database. Returns whether the batch was full."""
+        try:
+            tasks = claim_due_reminders(options["batch_size"], using=database)
+        except ShardFrozen:
+            # A user of the batch is being moved to another shard; their reminders are sent from there.
+            self.stderr.write(f"{database}: a user is being moved, claiming again shortly.")
+            time.sleep(options["interval"])
+            return False
+        if not tasks:
+            return False
+        try:
+            delivered = deliver_reminders(tasks)
+        except Exception as exc:
+            release_reminders(tasks)
+            self.stderr.write(f"Delivery failed, {len(tasks)} reminder(s) requeued: {exc}")
+            time.sleep(options["interval"])
+            return False
+        lag = stats.record(tasks, delivered, timezone.now())
+        self.stdout.write(f"Sent {delivered} reminder(s), lag {lag:.1f}s, {stats.throughput():.1f}/s")
+        return len(tasks) == options["batch_size"]
@@ -0,0 +1,43 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from todolist.jobs import Worker, run_worker_process
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs in a pool of worker processes and threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+        parser.add_argument("--threads", type=int, default=settings.JOB_WORKER_THREADS, help="Threads per process.")
+        parser.add_argument("--interval", type=float, default=settings.JOB_POLL_INTERVAL, help="Seconds to sleep when no job is queued.")
+        parser.add_argument("--once", action="store_true", help="Run the queued jobs and exit.")
+
+    def handle(self, *args, **options):
+        if options["processes"] <= 1:
+            worker = Worker(options["threads"], options["interval"], options["once"])
+            worker.run()
+            self.stdout.write(f"{worker.done} job(s) done, {worker.failed} failed")
+            return
+        # Children open their own connections; inherited sockets must not be shared.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker_process, args=(options["threads"], options["interval"], options["once"]),
+                name=f"job-worker-process-{index}",
+            )
+            for index in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Each child got the interrupt too and finishes its running jobs.
+            for process in processes:
+                process.join()
+        self.stdout.write(f"{len(processes)} worker process(es) stopped")
@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.urls import get_resolver
+
+from todolist.sharding import task_databases
+
+
+class Command(BaseCommand):
+    help = (
+        "Wait for the databases and apply migrations only where some are pending; "
+        "with --serve, then warm up and serve in the same process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", help="Only this database. Defaults to the default database and every task shard.")
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for the database.")
+        parser.add_argument("--serve", metavar="ADDRPORT", help="Then run the development server on this address.")
+
+    def handle(self, *args, **options):
+        # The reloader runs this command again in a child process; the parent already migrated.
+        if os.environ.get("RUN_MAIN") != "true":
+            if options["database"]:
+                databases = [options["database"]]
+            else:
+                databases = list(dict.fromkeys([DEFAULT_DB_ALIAS, *task_databases()]))
+            for database in databases:
+                self.migrate(database, options)
+        if options["serve"]:
+            self.serve(options["serve"])
+
+    def serve(self, addrport):
+        """Serve from this process, which already loaded Django, instead of starting another one."""
+        # Import the URLconf and views now rather than on the first request.
+        get_resolver().url_patterns
+        # Reloading needs a second process, so it is only on in development.
+        call_command("runserver", addrport, use_reloader=settings.DEBUG)
+
+    def migrate(self, database, options):
+        connection = connections[database]
+        self.wait_for_database(connection, options["timeout"])
+
+        # Imported here so the common path (nothing to migrate) skips the
+        # migration autodetector and operations modules.
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write(f"{database}: schema is up to date, skipping migrate.")
+            return
+        self.stdout.write(f"{database}: {len(plan)} migration(s) pending, running migrate.")
+        call_command("migrate", database=database, interactive=False, verbosity=options["verbosity"])
+
+    def wait_for_database(self, connection, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection.ensure_connection()
+                return
+            except OperationalError as exc:
+                if time.monotonic() > deadline:
+                    raise CommandError(f"Database unavailable after {timeout:g}s: {exc}")
+                time.sleep(0.5)
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """Return (module, self_us, cumulative_us) tuples from `python -X importtime` output."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Report the import time of every module loaded by the WSGI entry point."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="firstproject.wsgi", help="Module to import.")
+        parser.add_argument("--limit", type=int, default=20, help="Number of modules to show.")
+        parser.add_argument(
+            "--sort", choices=("self", "cumulative"), default="cumulative",
+            help="Order by the module's own import time or including its children.",
+        )
+
+    def handle(self, *args, **options):
+        # A fresh interpreter, so nothing is already in sys.modules.
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {options['module']}"],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        rows = parse_importtime(result.stderr)
+        if result.returncode != 0:
+            # A crash or a signal can leave nothing on stderr.
+            lines = result.stderr.splitlines() or [f"exit status {result.returncode}"]
+            raise CommandError(f"Importing {options['module']} failed:\n{lines[-1]}")
+
+        total = sum(row[1] for row in rows)
+        key = 1 if options["sort"] == "self" else 2
+        rows.sort(key=lambda row: row[key], reverse=True)
+
+        self.stdout.write(f"{'self (ms)':>10} {'cumul (ms)':>11}  module")
+        for module, self_us, cumulative_us in rows[:options["limit"]]:
+            self.stdout.write(f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>11.1f}  {module}")
+        self.stdout.write(f"{len(rows)} modules imported in {total / 1000:.1f} ms")
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+from todolist.ranking import spread_ranks
+
+
+def backfill_ranks(apps, schema_editor):
+    """Rank existing tasks in the order they were created."""
+    Task = apps.get_model('todolist', 'Task')
+    db = schema_editor.connection.alias
+    user_ids = Task.objects.using(db).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        tasks = list(Task.objects.using(db).filter(user_id=user_id).order_by('pub_date', 'id').only('id'))
+        for task, rank in zip(tasks, spread_ranks(len(tasks))):
+            task.rank = rank
+        Task.objects.using(db).bulk_update(tasks, ['rank'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0002_alter_task_task_text'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'rank'], name='task_user_rank_idx'),
+        ),
+    ]
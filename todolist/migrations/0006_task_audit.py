@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0005_task_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('edit', 'Edit'), ('toggle', 'Toggle'), ('delete', 'Delete')], max_length=10)),
+                ('changes', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at'], name='taskaudit_user_created_idx'), models.Index(fields=['task_id', '-created_at'], name='taskaudit_task_created_idx')],
+            },
+        ),
+    ]
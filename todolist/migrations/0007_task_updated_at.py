@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0006_task_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0013_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='feed_token',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
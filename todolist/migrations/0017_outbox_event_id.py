@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-19 09:12
+
+import uuid
+
+from django.db import migrations, models
+
+
+def fill_event_ids(apps, schema_editor):
+    """Give each queued event its own id; a column default would give them all the same one."""
+    OutboxEvent = apps.get_model('todolist', 'OutboxEvent')
+    db = schema_editor.connection.alias
+    events = list(OutboxEvent.objects.using(db).filter(event_id__isnull=True).only('id'))
+    for event in events:
+        event.event_id = uuid.uuid4()
+    OutboxEvent.objects.using(db).bulk_update(events, ['event_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0016_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='event_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_event_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='event_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -1,17 +1,337 @@
 import datetime
-from django.db import models
+import uuid
+from django.db import models, router
 from django.utils import timezone
 from django.contrib.auth.models import User
+from .ranking import rank_after
+
+class UserShardManager(models.Manager):
+    def for_user(self, user):
+        """Objects on the database holding the tasks of `user` (a User or user id)."""
+        from .sharding import shard_for
+        return self.using(shard_for(user))
+
+class Profile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
+    timezone = models.CharField(max_length=64, default="UTC")
+    # Secret part of the URL of the user's calendar feed, see todolist/ical.py.
+    feed_token = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} ({self.timezone})"
+
+class Project(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    name = models.CharField(max_length=100)
+
+    objects = UserShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "name"], name="project_user_name_unique"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class Tag(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    name = models.CharField(max_length=50)
+
+    objects = UserShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "name"], name="tag_user_name_unique"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_names(cls, user, names):
+        """Return the user's tags with the given names, creating the missing ones in one INSERT."""
+        names = set(names)
+        if not names:
+            return []
+        tags = list(cls.objects.for_user(user).filter(user=user, name__in=names))
+        missing = names - {tag.name for tag in tags}
+        if missing:
+            cls.objects.for_user(user).bulk_create([cls(user=user, name=name) for name in missing], ignore_conflicts=True)
+            tags = list(cls.objects.for_user(user).filter(user=user, name__in=names))
+        return tags
+
+class TaskList(models.Model):
+    """A list shared between users. It is stored with its tasks on the shard of its owner."""
+    # Not a sequence, so ids stay unique across shards.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    name = models.CharField(max_length=100)
+
+    objects = UserShardManager()
+
+    def __str__(self):
+        return self.name
+
+class ListMembership(models.Model):
+    OWNER = "owner"
+    EDITOR = "editor"
+    VIEWER = "viewer"
+    ROLE_CHOICES = [(OWNER, "Owner"), (EDITOR, "Editor"), (VIEWER, "Viewer")]
+    EDIT_ROLES = (OWNER, EDITOR)
+
+    task_list = models.ForeignKey(TaskList, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name="list_memberships")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=EDITOR)
+
+    objects = UserShardManager()
+
+    class Meta:
+        constraints = [
+            # Also the index for both "lists of a user" and the permission join on (list, user).
+            models.UniqueConstraint(fields=["user", "task_list"], name="listmembership_user_list_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.role} of {self.task_list_id}"
 
 class Task(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE) 
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
     task_text = models.CharField(max_length=255)
     pub_date = models.DateTimeField("date published")
     done = models.BooleanField(default=False)
+    rank = models.CharField(max_length=64, blank=True, default="")
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True)
+    tags = models.ManyToManyField(Tag, through="TaskTag", blank=True)
+    due_at = models.DateTimeField(null=True, blank=True)
+    remind_at = models.DateTimeField(null=True, blank=True)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    # Time of the last edit as seen by the client that made it, for last-writer-wins.
+    updated_at = models.DateTimeField(null=True, blank=True)
+    # Set for tasks of a shared list; `user` is then whoever added the task.
+    task_list = models.ForeignKey(TaskList, on_delete=models.CASCADE, null=True, blank=True, related_name="tasks")
+    # The user's change number of the last write, see todolist/sync.py.
+    change_seq = models.BigIntegerField(default=0)
+
+    objects = UserShardManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "rank"], name="task_user_rank_idx"),
+            # Day views select a UTC range of pub_date for one user.
+            models.Index(fields=["user", "pub_date"], name="task_user_pub_date_idx"),
+            models.Index(fields=["task_list", "pub_date"], name="task_list_pub_date_idx"),
+            models.Index(fields=["user", "change_seq"], name="task_user_change_seq_idx"),
+            # Only reminders still waiting to be sent are indexed, so polling stays cheap.
+            models.Index(
+                fields=["remind_at"],
+                condition=models.Q(remind_at__isnull=False, reminder_sent_at__isnull=True),
+                name="task_pending_reminder_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.task_text
 
+    def save(self, *args, **kwargs):
+        """New tasks go to the end of the user's list, or of their shared list."""
+        if not self.rank and self.task_list_id is not None:
+            database = kwargs.get("using") or router.db_for_write(Task, instance=self)
+            last = Task.objects.using(database).filter(task_list_id=self.task_list_id).order_by("-rank").values_list("rank", flat=True).first()
+            self.rank = rank_after(last)
+        elif not self.rank and self.user_id is not None:
+            last = Task.objects.for_user(self.user_id).filter(user_id=self.user_id).order_by("-rank").values_list("rank", flat=True).first()
+            self.rank = rank_after(last)
+        super().save(*args, **kwargs)
+
     def is_from_today(self):
-        now = timezone.now()
-        return self.pub_date.date() == now.date()
\ No newline at end of file
+        """Whether the task is from today in the active (user's) timezone."""
+        return timezone.localtime(self.pub_date).date() == timezone.localdate()
+
+class TaskTag(models.Model):
+    task = models.ForeignKey(Task, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    objects = UserShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task", "tag"], name="tasktag_task_tag_unique"),
+        ]
+        indexes = [
+            # Tag filters look up tasks by tag, the unique constraint covers the other direction.
+            models.Index(fields=["tag", "task"], name="tasktag_tag_task_idx"),
+        ]
+
+class ChangeCounter(models.Model):
+    """The last change number given out for a user's tasks. Lives on the user's shard."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, db_constraint=False)
+    value = models.BigIntegerField(default=0)
+    # Tombstones up to this change number have been deleted.
+    pruned_through = models.BigIntegerField(default=0)
+
+    objects = UserShardManager()
+
+    def __str__(self):
+        return f"{self.user} at {self.value}"
+
+class TaskTombstone(models.Model):
+    """Records a deleted task so syncing clients can drop it."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    task_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = UserShardManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "change_seq"], name="tombstone_user_change_seq_idx"),
+        ]
+
+    def __str__(self):
+        return f"task {self.task_id} deleted"
+
+class OutboxEvent(models.Model):
+    """A task change waiting to be delivered to one endpoint, see todolist/outbox.py.
+
+    Written in the transaction of the change, so it lives on the same database as the task.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    # Sent as the event id: the primary key only counts up per shard, so shards reuse each other's.
+    event_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    endpoint = models.URLField(max_length=200)
+    event = models.CharField(max_length=30)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    # Set after OUTBOX_MAX_ATTEMPTS failed deliveries; kept for inspection, never retried.
+    failed = models.BooleanField(default=False)
+
+    objects = UserShardManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at", "id"], condition=models.Q(failed=False), name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} to {self.endpoint}"
+
+class IdempotencyKey(models.Model):
+    """A write sent with an Idempotency-Key header and its response, see todolist/idempotency.py.
+
+    Saved in the transaction of the write, so it lives on the same database as the user's tasks.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+    # SHA-256 of the client's key, and of the method, path and body of its request.
+    key_hash = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    location = models.CharField(max_length=255, blank=True, default="")
+    body = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    objects = UserShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key_hash"], name="idempotency_user_key_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key_hash[:12]} of {self.user_id}"
+
+class TaskAudit(models.Model):
+    """One change made to a task. Kept after the task itself is deleted."""
+    EDIT = "edit"
+    TOGGLE = "toggle"
+    DELETE = "delete"
+    ACTION_CHOICES = [(EDIT, "Edit"), (TOGGLE, "Toggle"), (DELETE, "Delete")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    task_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changes = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="taskaudit_user_created_idx"),
+            models.Index(fields=["task_id", "-created_at"], name="taskaudit_task_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.action} task {self.task_id}"
+
+class ShardAssignment(models.Model):
+    """Pins a user's tasks to a shard, overriding the hash. Lives on the default database."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    alias = models.CharField(max_length=64)
+    # Set while rebalance_shard copies the user's tasks; writes are refused meanwhile.
+    frozen = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.user} on {self.alias}"
+
+class Job(models.Model):
+    """A long-running operation of a user, run by `manage.py run_workers`. Lives on the default database."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Name of the worker running the job, and when it last reported progress.
+    worker = models.CharField(max_length=100, blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only look at queued and running jobs, so finished ones cost nothing to keep.
+            models.Index(
+                fields=["status", "created_at"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="job_pending_idx",
+            ),
+            models.Index(fields=["user", "-created_at"], name="job_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} of {self.user} ({self.status})"
+
+class BackfillProgress(models.Model):
+    """Checkpoint of a backfill on one database, see todolist/backfills.py.
+
+    Lives on the database it backfills, so it is saved in the transaction of each batch.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    # Every row up to this primary key has been backfilled.
+    last_pk = models.BigIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} through {self.last_pk}"
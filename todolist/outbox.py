@@ -0,0 +1,202 @@
+"""Transactional outbox of task changes for downstream systems.
+
+Write paths call `record_events` inside the transaction of the task change.
+It adds one OutboxEvent per endpoint of OUTBOX_ENDPOINTS on the task's
+database, so an event exists exactly when its change was committed, and a
+slow receiver never slows a request down. `manage.py deliver_outbox` claims
+the due events, POSTs them to their endpoint in batches of
+OUTBOX_BATCH_SIZE over pooled keep-alive connections, with up to
+OUTBOX_CONCURRENCY batches in flight, and deletes the accepted ones. A
+rejected batch is retried with exponential backoff and jitter, and kept
+marked failed after OUTBOX_MAX_ATTEMPTS. Delivery is at least once:
+receivers drop events whose id they have seen. Event ids are UUIDs, unique
+across shards.
+"""
+import datetime
+import http.client
+import json
+import queue
+import random
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+
+
+# The columns task_payload reads, for queries that only load what an event needs.
+PAYLOAD_FIELDS = ("id", "user_id", "task_list_id", "task_text", "done", "pub_date", "due_at", "project_id")
+
+
+def task_payload(task):
+    return {
+        "id": task.id,
+        "user_id": task.user_id,
+        "task_list_id": str(task.task_list_id) if task.task_list_id else None,
+        "task_text": task.task_text,
+        "done": task.done,
+        "pub_date": task.pub_date.isoformat(),
+        "due_at": task.due_at.isoformat() if task.due_at else None,
+        "project_id": task.project_id,
+    }
+
+
+def record_events(user, event, payloads, database):
+    """Queue `event` with each payload for every endpoint. Call inside the transaction of the change."""
+    if not settings.OUTBOX_ENDPOINTS or not payloads:
+        return
+    user_id = getattr(user, "pk", user)
+    now = timezone.now()
+    OutboxEvent.objects.using(database).bulk_create([
+        OutboxEvent(user_id=user_id, endpoint=endpoint, event=event, payload=payload, created_at=now, next_attempt_at=now)
+        for payload in payloads
+        for endpoint in settings.OUTBOX_ENDPOINTS
+    ])
+
+
+def claim_events(database, limit, now=None):
+    """Return up to `limit` due events of a database, hidden from other dispatchers for OUTBOX_CLAIM_SECONDS."""
+    now = now or timezone.now()
+    with transaction.atomic(using=database):
+        due = OutboxEvent.objects.using(database).filter(failed=False, next_attempt_at__lte=now).order_by("id")
+        if connections[database].features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list("id", flat=True)[:limit])
+        OutboxEvent.objects.using(database).filter(id__in=ids).update(
+            next_attempt_at=now + datetime.timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS),
+        )
+    return list(OutboxEvent.objects.using(database).filter(id__in=ids).order_by("id"))
+
+
+def batches(events, batch_size):
+    """Yield (endpoint, events) batches, each endpoint's events in id order."""
+    by_endpoint = defaultdict(list)
+    for event in events:
+        by_endpoint[event.endpoint].append(event)
+    for endpoint, endpoint_events in by_endpoint.items():
+        for start in range(0, len(endpoint_events), batch_size):
+            yield endpoint, endpoint_events[start:start + batch_size]
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt, after `attempts` failed ones."""
+    delay = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    # Jitter spreads out the retries of batches that failed together.
+    return delay * random.uniform(0.5, 1)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections, at most `size` idle ones per host, shared by threads."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.idle = defaultdict(lambda: queue.LifoQueue(self.size))
+        self.lock = threading.Lock()
+
+    def connection(self, scheme, netloc, reuse=True):
+        """Return (connection, whether it was used before)."""
+        with self.lock:
+            idle = self.idle[scheme, netloc]
+        if reuse:
+            try:
+                return idle.get_nowait(), True
+            except queue.Empty:
+                pass
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout), False
+
+    def release(self, scheme, netloc, connection):
+        with self.lock:
+            idle = self.idle[scheme, netloc]
+        try:
+            idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def post(self, url, body, headers):
+        """POST `body` and return the response status."""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        connection, reused = self.connection(parts.scheme, parts.netloc)
+        while True:
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                break
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                # The server may have closed an idle connection; that is retried once on a new one.
+                if not (reused and isinstance(exc, (ConnectionError, http.client.RemoteDisconnected))):
+                    raise
+                connection, reused = self.connection(parts.scheme, parts.netloc, reuse=False)
+        if response.will_close:
+            connection.close()
+        else:
+            self.release(parts.scheme, parts.netloc, connection)
+        return response.status
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                while not idle.empty():
+                    idle.get_nowait().close()
+
+
+def post_batch(pool, endpoint, events):
+    """Send a batch to its endpoint. Returns None when it was accepted, else the error."""
+    body = json.dumps({"events": [
+        {"id": event.event_id, "event": event.event, "created_at": event.created_at, "payload": event.payload}
+        for event in events
+    ]}, cls=DjangoJSONEncoder).encode()
+    try:
+        status = pool.post(endpoint, body, {"Content-Type": "application/json"})
+    except (OSError, http.client.HTTPException) as exc:
+        return f"{exc.__class__.__name__}: {exc}"
+    if 200 <= status < 300:
+        return None
+    return f"HTTP {status}"
+
+
+def retry_later(database, events, error, now=None):
+    """Count a failed attempt for the events, scheduling the next one or giving up."""
+    now = now or timezone.now()
+    attempts = max(event.attempts for event in events) + 1
+    ids = [event.id for event in events]
+    OutboxEvent.objects.using(database).filter(id__in=ids).update(
+        attempts=F("attempts") + 1, last_error=error[:1000],
+        next_attempt_at=now + datetime.timedelta(seconds=backoff(attempts)),
+    )
+    OutboxEvent.objects.using(database).filter(id__in=ids, attempts__gte=settings.OUTBOX_MAX_ATTEMPTS).update(failed=True)
+
+
+def deliver(database, pool, executor, batch_size, limit):
+    """Send one round of due events of a database. Returns (delivered, failed) event counts.
+
+    Only the HTTP requests run in the executor's threads; the database is
+    used from the calling thread.
+    """
+    work = list(batches(claim_events(database, limit), batch_size))
+    errors = executor.map(lambda item: post_batch(pool, *item), work)
+    delivered = failed = 0
+    for (endpoint, events), error in zip(work, errors):
+        if error is None:
+            OutboxEvent.objects.using(database).filter(id__in=[event.id for event in events]).delete()
+            delivered += len(events)
+        else:
+            retry_later(database, events, error)
+            failed += len(events)
+    return delivered, failed
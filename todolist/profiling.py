@@ -0,0 +1,119 @@
+"""Opt-in request profiling.
+
+A sampled fraction of requests (PROFILE_SAMPLE_RATE), or any request from a
+staff user sending the `X-Profile` header, runs under cProfile. With
+PROFILE_TRACEMALLOC on, or `X-Profile: memory`, tracemalloc snapshots are
+taken when the request starts and ends, and the lines whose live memory
+grew in between are kept. Tracing is process-wide, so it is started once
+per process with PROFILE_TRACEMALLOC, and otherwise runs while any request
+asked for it; requests running at the same time in other threads show up
+in each other's growth.
+Results go to PROFILE_DIR/<view name>/, keeping the newest
+PROFILE_KEEP files per view; `manage.py profile_summary` aggregates them.
+"""
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+def view_directory(view_name):
+    return Path(settings.PROFILE_DIR) / (view_name or "unresolved").replace(":", ".")
+
+
+def rotate(directory, keep):
+    """Delete the oldest profiles of a view beyond the newest `keep` of each kind."""
+    for pattern in ("*.prof", "*.alloc.json"):
+        files = sorted(directory.glob(pattern), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in files[keep:]:
+            path.unlink(missing_ok=True)
+
+
+class MemoryTracing:
+    """Counts the requests tracing memory, so one finishing doesn't stop tracing under the others."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.started = False
+
+    def acquire(self):
+        with self.lock:
+            if self.requests == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+                self.started = True
+            self.requests += 1
+
+    def release(self):
+        with self.lock:
+            self.requests -= 1
+            # Tracing started elsewhere (PROFILE_TRACEMALLOC, python -X tracemalloc) is left on.
+            if self.requests == 0 and self.started:
+                tracemalloc.stop()
+                self.started = False
+
+
+memory_tracing = MemoryTracing()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+
+    def should_profile(self, request):
+        if request.META.get(PROFILE_HEADER) and getattr(request, "user", None) and request.user.is_staff:
+            return True
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        trace_memory = settings.PROFILE_TRACEMALLOC or request.META.get(PROFILE_HEADER) == "memory"
+        start = None
+        if trace_memory:
+            memory_tracing.acquire()
+            start = tracemalloc.take_snapshot()
+        # Imported here: most processes never profile a request.
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this thread.
+            profiler = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            growth = None
+            if start is not None:
+                growth = [
+                    [f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}", diff.size_diff, diff.count_diff]
+                    for diff in tracemalloc.take_snapshot().compare_to(start, "lineno")
+                    if diff.size_diff > 0
+                ]
+                memory_tracing.release()
+
+        match = getattr(request, "resolver_match", None)
+        directory = view_directory(match.view_name if match else None)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{time.time():.6f}-{os.getpid()}"
+        if profiler is not None:
+            profiler.dump_stats(directory / f"{stem}.prof")
+        if growth is not None:
+            (directory / f"{stem}.alloc.json").write_text(json.dumps(growth))
+        rotate(directory, settings.PROFILE_KEEP)
+        response["X-Profile-Id"] = f"{directory.name}/{stem}"
+        return response
@@ -0,0 +1,61 @@
+"""Lexicographic rank keys for user-defined task ordering.
+
+Ranks are strings over 0-9a-z, which sort the same way under the SQLite
+binary collation and the usual Postgres locales. A key never ends in "0",
+so there is always room for another key between any two of them and moving
+a task only rewrites that task's rank.
+"""
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+# Appending increments the last of RANK_WIDTH digits, so keys only grow after
+# BASE ** (RANK_WIDTH - 1) appends.
+RANK_WIDTH = 6
+FIRST_RANK = DIGITS[BASE // 2]
+
+
+def rank_between(before="", after=""):
+    """Return a key sorting strictly between `before` and `after`; "" is an open end."""
+    if after and before >= after:
+        raise ValueError(f"{before!r} must sort before {after!r}.")
+    key = []
+    i = 0
+    while True:
+        low = DIGITS.index(before[i]) if i < len(before) else 0
+        high = DIGITS.index(after[i]) if after and i < len(after) else BASE
+        if high - low > 1:
+            key.append(DIGITS[(low + high) // 2])
+            return "".join(key)
+        key.append(DIGITS[low])
+        if high - low == 1:
+            # The key is now below `after` whatever follows.
+            after = ""
+        i += 1
+
+
+def rank_after(last):
+    """Return the key for a task appended after `last`, growing it as slowly as possible."""
+    if not last:
+        return FIRST_RANK
+    digits = [DIGITS.index(c) for c in last.ljust(RANK_WIDTH, "0")]
+    for i in reversed(range(len(digits))):
+        if digits[i] < BASE - 1:
+            digits[i] += 1
+            return "".join(DIGITS[d] for d in digits[:i + 1])
+    return last + FIRST_RANK
+
+
+def spread_ranks(count):
+    """Return `count` evenly spaced, increasing keys of the smallest sensible width."""
+    width = 1
+    while BASE ** width <= 2 * (count + 1):
+        width += 1
+    step = BASE ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value = i * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
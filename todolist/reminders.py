@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import Task
+from .sync import mark_changed
+
+
+def pending_reminders(now, using=DEFAULT_DB_ALIAS):
+    """Reminders that are due and not sent yet; served by the partial index."""
+    return Task.objects.using(using).filter(remind_at__lte=now, reminder_sent_at__isnull=True)
+
+
+def claim_due_reminders(batch_size, now=None, using=DEFAULT_DB_ALIAS):
+    """Mark up to `batch_size` due reminders of one task database as sent by this worker and return them.
+
+    On backends with SKIP LOCKED, concurrent workers lock disjoint rows. SQLite
+    has no row locks, so every worker stamps the rows it selected with its own
+    claim time and keeps only the rows that carry that stamp afterwards.
+    """
+    now = now or timezone.now()
+    claimed_at = timezone.now()
+    with transaction.atomic(using=using):
+        candidates = pending_reminders(now, using).order_by("remind_at")
+        if connections[using].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return []
+        Task.objects.using(using).filter(id__in=ids, reminder_sent_at__isnull=True).update(reminder_sent_at=claimed_at)
+        mark_changed(Task.objects.using(using).filter(id__in=ids, reminder_sent_at=claimed_at), using)
+    # Users may live on another database than the tasks, so they are prefetched rather than joined.
+    return list(
+        Task.objects.using(using).filter(id__in=ids, reminder_sent_at=claimed_at).prefetch_related("user").order_by("remind_at")
+    )
+
+
+def release_reminders(tasks):
+    """Put claimed reminders back in the queue after a failed delivery."""
+    if tasks:
+        database = tasks[0]._state.db
+        released = Task.objects.using(database).filter(id__in=[task.id for task in tasks])
+        with transaction.atomic(using=database):
+            released.update(reminder_sent_at=None)
+            mark_changed(released, database)
+
+
+def build_reminder(task):
+    body = f"Reminder for your task: {task.task_text}"
+    if task.due_at:
+        body += f"\nDue at {timezone.localtime(task.due_at):%Y-%m-%d %H:%M %Z}."
+    return EmailMessage(
+        subject=f"Reminder: {task.task_text}",
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[task.user.email],
+    )
+
+
+def deliver_reminders(tasks):
+    """Send the reminders of users with an email address over one backend connection."""
+    messages = [build_reminder(task) for task in tasks if task.user.email]
+    if not messages:
+        return 0
+    with get_connection() as mail_connection:
+        return mail_connection.send_messages(messages) or 0
+
+
+class ReminderStats:
+    """Delivery lag and throughput of a scheduler run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.delivered = 0
+        self.batches = 0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def record(self, tasks, delivered, now):
+        lags = [(now - task.remind_at).total_seconds() for task in tasks]
+        self.batches += 1
+        self.delivered += delivered
+        self.total_lag += sum(lags)
+        self.max_lag = max([self.max_lag, *lags])
+        return max(lags)
+
+    def throughput(self):
+        elapsed = time.monotonic() - self.started
+        return self.delivered / elapsed if elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"{self.delivered} reminder(s) in {self.batches} batch(es), "
+            f"{self.throughput():.1f}/s, max lag {self.max_lag:.1f}s"
+        )
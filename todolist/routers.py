@@ -0,0 +1,65 @@
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+
+PIN_SESSION_KEY = "db_pin_until"
+ROUTED_APP_LABELS = ("todolist", "auth")
+
+_pinned_to_primary = contextvars.ContextVar("pinned_to_primary", default=False)
+
+
+def pin_to_primary(request):
+    """Send the user's reads to the primary for REPLICA_PIN_SECONDS after a write."""
+    request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+    _pinned_to_primary.set(True)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+@contextlib.contextmanager
+def primary_only():
+    """Send every read in the block to the primary, for background jobs that read then write."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+class ReplicaPinningMiddleware:
+    """Pin the current request to the primary while the user's write window is open."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin_until = request.session.get(PIN_SESSION_KEY, 0)
+        token = _pinned_to_primary.set(pin_until > time.time())
+        try:
+            return self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+
+class ReplicaRouter:
+    """Route Task/User reads to a replica and every write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or is_pinned_to_primary():
+            return "default"
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
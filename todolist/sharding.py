@@ -0,0 +1,152 @@
+"""User-sharded storage of task data.
+
+With TASK_SHARDS set, the tasks, projects, tags and task tags of a user live
+on one of the listed databases, chosen by a stable hash of the user id unless
+a ShardAssignment row pins the user elsewhere (see `manage.py rebalance_shard`).
+Shared task lists, their memberships and their tasks live on the shard of
+the list's owner.
+Users, sessions, profiles and the audit log stay on the default database, so
+the user foreign keys of sharded models are not enforced by the database.
+
+Code reaching sharded data goes through `Model.objects.for_user(user)`; saves
+of new instances are routed by their user_id. With TASK_SHARDS empty, every
+helper here falls back to the normal routing.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SHARDED_MODELS = {
+    "task", "tasktag", "tag", "project", "tasklist", "listmembership", "changecounter", "tasktombstone", "outboxevent",
+    "backfillprogress", "idempotencykey",
+}
+SHARD_CACHE_ATTRIBUTE = "_task_shard"
+
+
+def task_databases():
+    """Every database that can hold tasks."""
+    return list(settings.TASK_SHARDS) or [DEFAULT_DB_ALIAS]
+
+
+def hashed_shard(user_id):
+    shards = settings.TASK_SHARDS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def shard_info(user):
+    """Return (alias, frozen) for a user or user id, memoized on User instances."""
+    from .models import ShardAssignment
+
+    cached = getattr(user, SHARD_CACHE_ATTRIBUTE, None)
+    if cached is not None:
+        return cached
+    user_id = getattr(user, "pk", user)
+    assignment = (
+        ShardAssignment.objects.using(DEFAULT_DB_ALIAS)
+        .filter(user_id=user_id).values_list("alias", "frozen").first()
+    )
+    info = assignment or (hashed_shard(user_id), False)
+    if hasattr(user, "pk"):
+        setattr(user, SHARD_CACHE_ATTRIBUTE, info)
+    return info
+
+
+def shard_for(user):
+    """The database alias holding the user's tasks, or None when sharding is off."""
+    if not settings.TASK_SHARDS:
+        return None
+    return shard_info(user)[0]
+
+
+def task_database(user):
+    """The database the user's tasks are written to. Reads that must see those writes use it too."""
+    return shard_for(user) or DEFAULT_DB_ALIAS
+
+
+def is_frozen(user):
+    """Whether the user's tasks are being moved between shards and must not be written."""
+    return bool(settings.TASK_SHARDS) and shard_info(user)[1]
+
+
+class ShardFrozen(Exception):
+    """A move of the user's tasks began while a write to them was in flight."""
+
+
+def check_writable(user):
+    """Raise ShardFrozen once a move of the user's tasks has begun.
+
+    Reads the flag from the default database each time rather than the
+    memoized one, since it is called after the write took its locks.
+    """
+    from .models import ShardAssignment
+
+    if settings.TASK_SHARDS and (
+        ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(user_id=getattr(user, "pk", user), frozen=True).exists()
+    ):
+        raise ShardFrozen("Your tasks are being moved, please try again in a moment.")
+
+
+def forget_shard(user):
+    if hasattr(user, SHARD_CACHE_ATTRIBUTE):
+        delattr(user, SHARD_CACHE_ATTRIBUTE)
+
+
+class FrozenShardMiddleware:
+    """Answer writes refused by ShardFrozen like the views answer a frozen user up front."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, ShardFrozen):
+            return None
+        from django.contrib import messages
+        from django.http import JsonResponse
+        from django.shortcuts import redirect
+
+        if request.content_type == "application/json" or request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return JsonResponse({"status": "error", "message": str(exception)}, status=503)
+        messages.error(request, str(exception))
+        return redirect(request.get_full_path())
+
+
+class ShardRouter:
+    """Send sharded models to their user's shard and keep shard schemas to what they hold."""
+
+    def route(self, model, **hints):
+        if not settings.TASK_SHARDS or model._meta.app_label != "todolist":
+            return None
+        if model._meta.model_name not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if instance is None:
+            return None
+        if instance._state.db and instance._meta.model_name in SHARDED_MODELS:
+            return instance._state.db
+        # Rows that belong to another one live where it does; shared lists
+        # and their tasks live on the shard of the list's owner.
+        if instance._meta.model_name == "tasktag":
+            return self.route(model, instance=instance.task)
+        if instance._meta.model_name == "listmembership":
+            return self.route(model, instance=instance.task_list)
+        if instance._meta.model_name == "task" and instance.task_list_id is not None:
+            return self.route(model, instance=instance.task_list)
+        user_id = getattr(instance, "user_id", None)
+        if user_id is None and instance._meta.label == settings.AUTH_USER_MODEL:
+            user_id = instance.pk
+        return shard_for(user_id) if user_id is not None else None
+
+    db_for_read = route
+    db_for_write = route
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in settings.TASK_SHARDS:
+            return None
+        if app_label == "todolist":
+            return model_name is None or model_name in SHARDED_MODELS
+        # The schema of the user foreign keys' targets, without any rows.
+        return app_label in ("auth", "contenttypes")
@@ -0,0 +1,62 @@
+"""Task lists shared between users.
+
+A list, its memberships and its tasks are stored together on the shard of
+the list's owner, so permissions are checked by joining ListMembership in
+the same query that loads the tasks rather than in Python afterwards. The
+lists a user belongs to are looked up once per request, on every shard when
+sharding is on.
+"""
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+
+from .models import ListMembership
+
+MEMBERSHIPS_ATTRIBUTE = "_list_memberships"
+
+Membership = namedtuple("Membership", "name role owner_id database")
+
+
+def list_memberships(request):
+    """{list id: Membership} of the lists the user belongs to, memoized on the request."""
+    memberships = getattr(request, MEMBERSHIPS_ATTRIBUTE, None)
+    if memberships is None:
+        memberships = {}
+        # None keeps the normal routing (and replicas) when sharding is off.
+        for database in settings.TASK_SHARDS or [None]:
+            rows = (
+                ListMembership.objects.using(database).filter(user=request.user)
+                .values_list("task_list_id", "task_list__name", "role", "task_list__user_id")
+            )
+            for list_id, name, role, owner_id in rows:
+                memberships[list_id] = Membership(name, role, owner_id, database)
+        setattr(request, MEMBERSHIPS_ATTRIBUTE, memberships)
+    return memberships
+
+
+def membership_for(request, list_id):
+    """The user's membership of a list given as a string or UUID, or None."""
+    try:
+        list_id = list_id if isinstance(list_id, uuid.UUID) else uuid.UUID(list_id)
+    except (TypeError, ValueError):
+        return None
+    return list_memberships(request).get(list_id)
+
+
+def forget_memberships(request):
+    if hasattr(request, MEMBERSHIPS_ATTRIBUTE):
+        delattr(request, MEMBERSHIPS_ATTRIBUTE)
+
+
+def can_edit(user):
+    """A boolean expression for task querysets: the user's own tasks, or those of lists they edit."""
+    return ExpressionWrapper(
+        Q(user_id=user.id, task_list__isnull=True) | Exists(
+            ListMembership.objects.filter(
+                task_list_id=OuterRef("task_list_id"), user_id=user.id, role__in=ListMembership.EDIT_ROLES,
+            )
+        ),
+        output_field=BooleanField(),
+    )
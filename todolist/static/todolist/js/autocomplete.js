@@ -0,0 +1,81 @@
+// Suggests earlier tasks for the line being typed in the new task box.
+// Answers are kept per prefix, so typing back and forth asks the server once.
+$(document).ready(function() {
+    var $input = $('textarea[name="task_text"]');
+    var $list = $('#task-suggestions');
+    if (!$input.length || !$list.length) {
+        return;
+    }
+    var answers = {};
+    var timer = null;
+    var active = -1;
+
+    function currentLine() {
+        var lines = $input.val().split('\n');
+        return lines[lines.length - 1];
+    }
+
+    function show(suggestions) {
+        active = -1;
+        $list.empty().prop('hidden', suggestions.length === 0);
+        suggestions.forEach(function(text) {
+            $('<li>').text(text).appendTo($list);
+        });
+    }
+
+    function complete(text) {
+        var lines = $input.val().split('\n');
+        lines[lines.length - 1] = text;
+        $input.val(lines.join('\n')).focus();
+        show([]);
+    }
+
+    function lookup() {
+        var prefix = currentLine();
+        if (prefix.trim().length < 2) {
+            show([]);
+            return;
+        }
+        if (answers[prefix]) {
+            show(answers[prefix]);
+            return;
+        }
+        $.getJSON(autocompleteURL, { q: prefix }).done(function(response) {
+            answers[prefix] = response.suggestions;
+            if (currentLine() === prefix) {
+                show(response.suggestions);
+            }
+        });
+    }
+
+    $input.on('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(lookup, 100);
+    });
+
+    $input.on('keydown', function(event) {
+        var $items = $list.children();
+        if ($list.prop('hidden') || !$items.length) {
+            return;
+        }
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            active = (active + (event.key === 'ArrowDown' ? 1 : -1) + $items.length) % $items.length;
+            $items.removeClass('active').eq(active).addClass('active');
+        } else if (event.key === 'Tab') {
+            event.preventDefault();
+            complete($items.eq(Math.max(active, 0)).text());
+        } else if (event.key === 'Escape') {
+            show([]);
+        }
+    });
+
+    $list.on('mousedown', 'li', function(event) {
+        event.preventDefault();
+        complete($(this).text());
+    });
+
+    $input.on('blur', function() {
+        show([]);
+    });
+});
@@ -0,0 +1,35 @@
+// Polls the background job started by the last request and shows its progress.
+// Bulk actions reload the page when done; exports are offered as a download.
+$(document).ready(function() {
+    var $progress = $('#job-progress');
+    if (!$progress.length) {
+        return;
+    }
+
+    function download(url) {
+        var link = $('<a>').attr({ href: url, download: 'tasks.json' }).text('Download your tasks');
+        $progress.empty().append(link);
+    }
+
+    function poll() {
+        $.getJSON($progress.data('status-url')).done(function(response) {
+            var job = response.job;
+            if (job.status === 'done') {
+                if (job.kind === 'export_tasks') {
+                    download(job.download_url);
+                } else {
+                    window.location = window.location.pathname;
+                }
+            } else if (job.status === 'failed') {
+                $progress.text('Something went wrong: ' + job.error);
+            } else {
+                $progress.text(job.total ? 'Working on it: ' + job.progress + ' of ' + job.total : 'Working on it…');
+                setTimeout(poll, 2000);
+            }
+        }).fail(function() {
+            setTimeout(poll, 5000);
+        });
+    }
+
+    poll();
+});
@@ -0,0 +1,108 @@
+// Queues task edits in IndexedDB and replays them to the server in order.
+// Each edit carries the time it was made, so the server can keep the newest one,
+// and an Idempotency-Key, so a retry of an edit the server already applied is not applied again.
+var OfflineQueue = (function() {
+    var DB_NAME = "todolist-offline";
+    var STORE = "pending";
+    var flushing = false;
+    var handleResponse = function() {};
+
+    function openDB() {
+        return new Promise(function(resolve, reject) {
+            var request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = function() {
+                request.result.createObjectStore(STORE, { keyPath: "id", autoIncrement: true });
+            };
+            request.onsuccess = function() { resolve(request.result); };
+            request.onerror = function() { reject(request.error); };
+        });
+    }
+
+    function withStore(mode, callback) {
+        return openDB().then(function(db) {
+            return new Promise(function(resolve, reject) {
+                var transaction = db.transaction(STORE, mode);
+                var result = callback(transaction.objectStore(STORE));
+                transaction.oncomplete = function() { resolve(result && result.result); };
+                transaction.onerror = function() { reject(transaction.error); };
+            });
+        });
+    }
+
+    function newKey() {
+        return window.crypto && crypto.randomUUID ? crypto.randomUUID() : Date.now() + "-" + Math.random().toString(36).slice(2);
+    }
+
+    function send(data, key) {
+        var headers = { "X-CSRFToken": getCSRFToken() };
+        // Edits queued before keys were added have none.
+        if (key) {
+            headers["Idempotency-Key"] = key;
+        }
+        return $.ajax({
+            url: updateTaskURL,
+            method: "POST",
+            headers: headers,
+            data: data
+        });
+    }
+
+    function flush() {
+        if (flushing || !navigator.onLine) {
+            return;
+        }
+        flushing = true;
+        withStore("readonly", function(store) { return store.getAll(); }).then(function(items) {
+            var next = function(index) {
+                if (index >= items.length) {
+                    flushing = false;
+                    // Edits pushed while these were sent found the flush running:
+                    // read the store again until it is empty.
+                    if (items.length) {
+                        flush();
+                    }
+                    return;
+                }
+                var item = items[index];
+                send(item.data, item.key).always(function(response, status, xhr) {
+                    var httpStatus = status === "success" ? xhr.status : response.status;
+                    if (httpStatus === 0 || httpStatus === 503) {
+                        // Still offline, or the server can't save changes right now:
+                        // keep this edit and the ones after it.
+                        flushing = false;
+                        if (httpStatus === 503) {
+                            setTimeout(flush, (parseInt(response.getResponseHeader("Retry-After"), 10) || 10) * 1000);
+                        }
+                        return;
+                    }
+                    handleResponse(item.data, status === "success" ? response : response.responseJSON);
+                    withStore("readwrite", function(store) { store.delete(item.id); }).then(function() {
+                        next(index + 1);
+                    });
+                });
+            };
+            next(0);
+        }).catch(function() {
+            flushing = false;
+        });
+    }
+
+    function push(data) {
+        data.client_ts = Date.now();
+        if (!window.indexedDB) {
+            send(data, newKey()).always(function(response, status) {
+                handleResponse(data, status === "success" ? response : response.responseJSON);
+            });
+            return;
+        }
+        withStore("readwrite", function(store) { store.add({ data: data, key: newKey() }); }).then(flush);
+    }
+
+    function onResponse(callback) {
+        handleResponse = callback;
+    }
+
+    window.addEventListener("online", flush);
+
+    return { push: push, flush: flush, onResponse: onResponse };
+})();
@@ -11,33 +11,49 @@ function getCSRFToken() {
     return cookieValue;
 }
 
+// On a shared list page, every edit names the list so the server can find it.
+function withList(data) {
+    if (typeof taskListId !== 'undefined') {
+        data.list_id = taskListId;
+    }
+    return data;
+}
+
 $(document).ready(function() {
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register(serviceWorkerURL).catch(function(error) {
+            console.error('Service worker registration failed', error);
+        });
+    }
+
+    // Edits are applied to the page right away and sent through the offline
+    // queue, which replays them when the connection comes back.
+    OfflineQueue.onResponse(function(data, response) {
+        if (!response) {
+            return;
+        }
+        if (response.status === 'stale') {
+            // A newer edit from another device won, show its values.
+            $(`.editable-task[data-task-id="${data.task_id}"]`).text(response.task_text);
+            $(`.task-checkbox[data-task-id="${data.task_id}"]`).prop('checked', response.done);
+        } else if (response.status === 'error' && response.message) {
+            console.error('Error updating task', response.message);
+        } else if (response.redirect) {
+            window.location.href = response.redirect;
+        } else {
+            console.log('Task updated successfully', response);
+        }
+    });
+    OfflineQueue.flush();
+
     $(".task-checkbox").on('change', function() {
         var taskId = $(this).data('task-id');
         var isChecked = $(this).prop('checked');
 
-        console.log("Sending request:", {
-            url: updateTaskURL,
+        OfflineQueue.push(withList({
             task_id: taskId,
-            done: isChecked,
-            csrf_token: getCSRFToken()
-        });
-
-        $.ajax({
-            url: updateTaskURL,  
-            method: "POST",
-            headers: { "X-CSRFToken": getCSRFToken() }, 
-            data: {
-                task_id: taskId,
-                done: isChecked
-            },
-            success: function(response) {
-                console.log('Task updated successfully', response);
-            },
-            error: function(xhr, status, error) {
-                console.error('Error updating task', xhr.responseText);
-            }
-        });
+            done: isChecked
+        }));
     });
     $(".editable-task").on("keydown", function(e) {
         if (e.key === "Enter") {
@@ -50,26 +66,11 @@ $(document).ready(function() {
         var taskId = $(this).data('task-id');
 
         if (confirm("Are you sure you want to delete this task?")) {
-            $.ajax({
-                url: updateTaskURL, 
-                method: "POST",
-                headers: { "X-CSRFToken": getCSRFToken() },
-                data: {
-                    task_id: taskId,
-                    delete: true
-                },
-                success: function(response) {
-                    if (response.status === 'success') {
-                        console.log("Task deleted successfully", response);
-                        $(`#task-${taskId}`).remove();
-                    } else {
-                        alert(response.message);
-                    }
-                },
-                error: function(xhr, status, error) {
-                    console.error('Error deleting task', xhr.responseText);
-                }
-            });
+            $(`#task-${taskId}`).remove();
+            OfflineQueue.push(withList({
+                task_id: taskId,
+                delete: true
+            }));
         }
     });
     $(".editable-task").on('blur', function() {
@@ -94,25 +95,58 @@ $(document).ready(function() {
         }
 
         if (newTaskText !== null && newTaskText !== taskText) {
-            $.ajax({
-                url: updateTaskURL,
-                method: "POST",
-                headers: { "X-CSRFToken": getCSRFToken() },
-                data: {
-                    task_id: taskId,
-                    task_text: newTaskText
-                },
-                success: function(response) {
-                    if (response.redirect) {
-                        window.location.href = response.redirect;
-                    } else {
-                        console.log("Task updated successfully", response);
-                    }
-                },
-                error: function(xhr, status, error) {
-                    console.error('Error updating task', xhr.responseText);
-                }
-            });
+            OfflineQueue.push(withList({
+                task_id: taskId,
+                task_text: newTaskText
+            }));
+        }
+    });
+    $("form[action$='logout/']").on('submit', function() {
+        if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage('logout');
+        }
+    });
+    var draggedTask = null;
+    $(".task-item").on('dragstart', function(e) {
+        draggedTask = this;
+        e.originalEvent.dataTransfer.effectAllowed = "move";
+    });
+    $(".task-item").on('dragover', function(e) {
+        e.preventDefault();
+    });
+    $(".task-item").on('drop', function(e) {
+        e.preventDefault();
+        if (!draggedTask || draggedTask === this) {
+            return;
+        }
+        var rect = this.getBoundingClientRect();
+        if (e.originalEvent.clientY > rect.top + rect.height / 2) {
+            $(this).after(draggedTask);
+        } else {
+            $(this).before(draggedTask);
         }
+        var before = $(draggedTask).prev('.task-item');
+        var after = $(draggedTask).next('.task-item');
+
+        $.ajax({
+            url: moveTaskURL,
+            method: "POST",
+            headers: { "X-CSRFToken": getCSRFToken() },
+            data: {
+                task_id: $(draggedTask).data('task-id'),
+                before_id: before.length ? before.data('task-id') : '',
+                after_id: after.length ? after.data('task-id') : ''
+            },
+            success: function(response) {
+                console.log("Task moved successfully", response);
+            },
+            error: function(xhr, status, error) {
+                if (xhr.status === 409) {
+                    window.location.reload();
+                }
+                console.error('Error moving task', xhr.responseText);
+            }
+        });
+        draggedTask = null;
     });
 });
\ No newline at end of file
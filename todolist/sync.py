@@ -0,0 +1,116 @@
+"""Incremental sync of a user's tasks.
+
+Every write to a user's personal tasks takes the next number of the user's
+ChangeCounter, inside the write's transaction, and stores it in the task's
+change_seq (or in a TaskTombstone for a deletion). The counter row stays
+locked until the transaction commits, so a committed number is never lower
+than one still in flight. Writes to shared list tasks take no number but
+hold the owner's counter the same way (`hold_changes`), and every write
+checks, once it holds the counter, that the user's tasks are not being
+moved to another shard: `manage.py rebalance_shard` freezes the user and
+then waits for the counter (`wait_for_writes`) before it copies anything. A client keeps the cursor of its last sync and
+asks for what changed after it, which reads the (user, change_seq) indexes
+only.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import ChangeCounter, Task, TaskTombstone
+from .sharding import check_writable
+
+
+def next_change(user, database):
+    """Take the next change number of a user (or user id). Call inside the transaction of the write."""
+    user_id = getattr(user, "pk", user)
+    counters = ChangeCounter.objects.using(database).filter(user_id=user_id)
+    if not counters.update(value=F("value") + 1):
+        ChangeCounter.objects.using(database).get_or_create(user_id=user_id)
+        counters.update(value=F("value") + 1)
+    check_writable(user_id)
+    return counters.values_list("value", flat=True).get()
+
+
+def lock_counter(user, database):
+    """Lock a user's change counter row until the transaction ends, creating it if needed."""
+    user_id = getattr(user, "pk", user)
+    ChangeCounter.objects.using(database).get_or_create(user_id=user_id)
+    list(ChangeCounter.objects.using(database).select_for_update().filter(user_id=user_id).values_list("pk", flat=True))
+
+
+def hold_changes(user, database):
+    """Hold a user's change counter without taking a number, for writes syncing clients don't see. Call inside the transaction of the write."""
+    lock_counter(user, database)
+    check_writable(user)
+
+
+def wait_for_writes(user, database):
+    """Return once every write to the user's tasks on `database` that holds their counter has finished."""
+    with transaction.atomic(using=database):
+        lock_counter(user, database)
+
+
+def mark_changed(tasks, database):
+    """Give the personal tasks of a queryset a new change number, one per user. Call inside the write's transaction."""
+    by_user = defaultdict(list)
+    for task_id, user_id in tasks.filter(task_list__isnull=True).values_list("id", "user_id"):
+        by_user[user_id].append(task_id)
+    for user_id, task_ids in by_user.items():
+        Task.objects.using(database).filter(id__in=task_ids).update(change_seq=next_change(user_id, database))
+
+
+def record_deletions(user, task_ids, change_seq, database):
+    user_id = getattr(user, "pk", user)
+    TaskTombstone.objects.using(database).bulk_create(
+        [TaskTombstone(user_id=user_id, task_id=task_id, change_seq=change_seq) for task_id in task_ids]
+    )
+
+
+def changes_since(user, since, limit, database):
+    """Return (cursor, has_more, tasks, deleted ids) for the changes after `since`.
+
+    None as `since` returns every task. Tasks changed by one write share a
+    change number and are never split between two responses, so a response
+    can exceed `limit` when one bulk action changed more tasks than that.
+    Read from the database the tasks are written to: a replica could return
+    a counter and tasks from two different points in time.
+    """
+    counter = ChangeCounter.objects.using(database).filter(user=user).values_list("value", "pruned_through").first()
+    latest, pruned_through = counter or (0, 0)
+    if since is not None and since < pruned_through:
+        raise ValueError("The cursor is older than the kept deletions.")
+    after = -1 if since is None else since
+    changed = Task.objects.using(database).filter(user=user, task_list__isnull=True, change_seq__gt=after)
+
+    cursor = latest
+    first_left_out = changed.filter(change_seq__lte=latest).order_by("change_seq").values_list("change_seq", flat=True)[limit:limit + 1]
+    if first_left_out:
+        # Stop before the first change that doesn't fit, unless it is the only one.
+        cursor = max(first_left_out[0] - 1, changed.order_by("change_seq").values_list("change_seq", flat=True)[0])
+    tasks = list(changed.filter(change_seq__lte=cursor).order_by("change_seq", "id"))
+    deleted = []
+    if since is not None:
+        deleted = list(
+            TaskTombstone.objects.using(database)
+            .filter(user=user, change_seq__gt=after, change_seq__lte=cursor)
+            .values_list("task_id", flat=True)
+        )
+    return cursor, cursor < latest, tasks, deleted
+
+
+def prune_tombstones(database, older_than):
+    """Delete tombstones older than `older_than`; clients with an older cursor must reload."""
+    cutoff = timezone.now() - older_than
+    pruned = 0
+    for user_id, change_seq in (
+        TaskTombstone.objects.using(database).filter(deleted_at__lt=cutoff)
+        .values("user_id").annotate(last=Max("change_seq")).values_list("user_id", "last")
+    ):
+        with transaction.atomic(using=database):
+            pruned += TaskTombstone.objects.using(database).filter(user_id=user_id, change_seq__lte=change_seq).delete()[0]
+            ChangeCounter.objects.using(database).filter(user_id=user_id, pruned_through__lt=change_seq).update(
+                pruned_through=change_seq,
+            )
+    return pruned
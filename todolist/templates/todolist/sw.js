@@ -0,0 +1,84 @@
+{% load static %}// Caches the app shell so the task list opens without a network round trip.
+var CACHE_NAME = "todolist-shell-v5";
+var SHELL_URLS = [
+    "{% url 'todolist:index' %}",
+    "{% static 'todolist/style.css' %}",
+    "{% static 'todolist/js/offline_queue.js' %}",
+    "{% static 'todolist/js/task_update.js' %}",
+    "{% static 'todolist/js/autocomplete.js' %}",
+    "{% static 'todolist/js/job_progress.js' %}",
+    "https://code.jquery.com/jquery-3.6.0.min.js"
+];
+
+self.addEventListener("install", function(event) {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then(function(cache) {
+            return cache.addAll(SHELL_URLS);
+        }).then(function() {
+            return self.skipWaiting();
+        })
+    );
+});
+
+self.addEventListener("activate", function(event) {
+    event.waitUntil(
+        caches.keys().then(function(names) {
+            return Promise.all(names.filter(function(name) {
+                return name !== CACHE_NAME;
+            }).map(function(name) {
+                return caches.delete(name);
+            }));
+        }).then(function() {
+            return self.clients.claim();
+        })
+    );
+});
+
+self.addEventListener("message", function(event) {
+    if (event.data === "logout") {
+        caches.delete(CACHE_NAME);
+    }
+});
+
+self.addEventListener("fetch", function(event) {
+    var request = event.request;
+    if (request.method !== "GET") {
+        return;
+    }
+    if (request.mode === "navigate") {
+        // Pages: network first so the list is fresh, the cached copy when offline.
+        event.respondWith(
+            fetch(request).then(function(response) {
+                if (response.ok && !response.redirected) {
+                    var copy = response.clone();
+                    caches.open(CACHE_NAME).then(function(cache) {
+                        cache.put(request, copy);
+                    });
+                }
+                return response;
+            }).catch(function() {
+                return caches.match(request).then(function(cached) {
+                    return cached || caches.match("{% url 'todolist:index' %}");
+                });
+            })
+        );
+        return;
+    }
+    // Static assets: network first too, so a changed script or stylesheet is used as soon
+    // as it is deployed; offline, the cached copy of the same version, else of any version.
+    event.respondWith(
+        fetch(request).then(function(response) {
+            if (response.ok) {
+                var copy = response.clone();
+                caches.open(CACHE_NAME).then(function(cache) {
+                    cache.put(request, copy);
+                });
+            }
+            return response;
+        }).catch(function() {
+            return caches.match(request).then(function(cached) {
+                return cached || caches.match(request, {ignoreSearch: true});
+            });
+        })
+    );
+});
@@ -0,0 +1,124 @@
+import threading
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.audit import AuditLog, history_for
+from todolist.models import Task, TaskAudit
+
+class AuditLogTests(TestCase):
+    def test_flush_writes_in_batches(self):
+        batches = []
+        log = AuditLog(writer=batches.append, maxsize=10, batch_size=3, interval=60)
+        log.setup()
+        for i in range(7):
+            log.queue.put(i)
+        self.assertEqual(log.flush(), 7)
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+
+    @override_settings(AUDIT_ASYNC=True, AUDIT_ENQUEUE_TIMEOUT=0.01)
+    def test_background_thread_flushes_on_batch_size(self):
+        written = threading.Event()
+        batches = []
+        def writer(rows):
+            batches.append(rows)
+            written.set()
+        log = AuditLog(writer=writer, maxsize=10, batch_size=2, interval=60)
+        log.enqueue("a")
+        log.enqueue("b")
+        self.assertTrue(written.wait(5))
+        log.shutdown()
+        self.assertEqual(batches, [["a", "b"]])
+
+    @override_settings(AUDIT_ASYNC=True, AUDIT_ENQUEUE_TIMEOUT=0.01)
+    def test_background_thread_flushes_on_interval(self):
+        written = threading.Event()
+        log = AuditLog(writer=lambda rows: written.set(), maxsize=10, batch_size=100, interval=0.05)
+        log.enqueue("a")
+        self.assertTrue(written.wait(5))
+        log.shutdown()
+
+    @override_settings(AUDIT_ASYNC=True, AUDIT_ENQUEUE_TIMEOUT=0.01)
+    def test_full_queue_writes_synchronously(self):
+        """
+        Backpressure: with the queue full the caller writes its own row instead of dropping it.
+        """
+        batches = []
+        log = AuditLog(writer=batches.append, maxsize=1, batch_size=100, interval=60)
+        log.start()
+        log.enqueue("a")
+        log.enqueue("b")
+        self.assertEqual(batches, [["b"]])
+        log.shutdown()
+        self.assertEqual(batches, [["b"], ["a"]])
+
+    def test_failed_batch_is_retried(self):
+        batches = []
+        def writer(rows):
+            if not batches:
+                batches.append(None)
+                raise RuntimeError("database unavailable")
+            batches.append(rows)
+        log = AuditLog(writer=writer, maxsize=10, batch_size=5, interval=60)
+        log.setup()
+        log.queue.put("a")
+        with self.assertRaises(RuntimeError):
+            log.flush()
+        log.flush()
+        self.assertEqual(batches, [None, ["a"]])
+
+    def test_failing_row_does_not_block_later_rows(self):
+        batches = []
+        def writer(rows):
+            if "bad" in rows:
+                raise ValueError("value too long for column")
+            batches.append(rows)
+        log = AuditLog(writer=writer, maxsize=10, batch_size=5, interval=60, max_attempts=2)
+        log.setup()
+        for row in ("a", "bad", "b"):
+            log.queue.put(row)
+        with self.assertRaises(ValueError):
+            log.flush()
+        with self.assertLogs('todolist.audit', 'ERROR'):
+            self.assertEqual(log.flush(), 2)
+        log.queue.put("c")
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(batches, [["a"], ["b"], ["c"]])
+
+class TaskAuditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Test task", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def test_update_task_is_audited(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': "New text"})
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'delete': 'true'})
+        history = history_for(self.user, task_id=self.task.id)
+        self.assertEqual([entry.action for entry in history], [TaskAudit.DELETE, TaskAudit.TOGGLE, TaskAudit.EDIT])
+        self.assertEqual(history[2].changes, {'old': "Test task", 'new': "New text"})
+        self.assertEqual(history[1].changes, {'done': True})
+
+    def test_rejected_update_is_not_audited(self):
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': 'a' * 256})
+        self.assertFalse(TaskAudit.objects.exists())
+
+    def test_history_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+        user2 = User.objects.create_user(username='testuser1', password='testpass')
+        TaskAudit.objects.create(user=user2, task_id=1, action=TaskAudit.TOGGLE, created_at=timezone.now())
+        response = self.client.get(reverse('todolist:task_history'))
+        history = response.json()['history']
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]['task_id'], self.task.id)
+        self.assertEqual(history[0]['changes'], {'done': True})
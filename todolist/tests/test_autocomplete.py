@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.autocomplete import PrefixIndex, indexes
+from todolist.models import Task
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_most_used_first(self):
+        index = PrefixIndex(["Buy milk", "Buy bread", "buy  MILK", "Call mom", "Buy milk"])
+        self.assertEqual(index.suggest("bu", 5), ["Buy milk", "Buy bread"])
+        self.assertEqual(index.suggest("BUY B", 5), ["Buy bread"])
+        self.assertEqual(index.suggest("x", 5), [])
+        self.assertEqual(index.suggest("", 5), [])
+
+    def test_limit_and_size(self):
+        index = PrefixIndex(["a1", "a1", "a2", "a2", "a3"], size=2)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.suggest("a", 1), ["a1"])
+
+    def test_typed_text_is_not_suggested(self):
+        index = PrefixIndex(["Buy", "Buy milk"])
+        self.assertEqual(index.suggest("buy", 5), ["Buy milk"])
+        self.assertEqual(index.suggest("buy ", 5), ["Buy milk"])
+
+    def test_add_and_discard(self):
+        index = PrefixIndex(["Buy milk"])
+        index.add("Buy eggs")
+        index.add("Buy eggs")
+        self.assertEqual(index.suggest("buy", 5), ["Buy eggs", "Buy milk"])
+        index.discard("buy milk")
+        self.assertEqual(index.suggest("buy", 5), ["Buy eggs"])
+
+class AutocompleteViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user who often walks the dog, and another user.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.other = User.objects.create_user(username='other', password='testpass')
+        for text in ["Walk the dog", "Walk the dog", "Water plants"]:
+            Task.objects.create(task_text=text, pub_date=timezone.now(), user=cls.user)
+        cls.task = Task.objects.create(task_text="Wash car", pub_date=timezone.now(), user=cls.user)
+        Task.objects.create(task_text="Wine tasting", pub_date=timezone.now(), user=cls.other)
+
+    def setUp(self):
+        indexes.clear()
+        self.client.login(username='testuser', password='testpass')
+
+    def suggestions(self, prefix):
+        return self.client.get(reverse('todolist:autocomplete'), {'q': prefix}).json()['suggestions']
+
+    def test_suggestions_come_from_the_users_history(self):
+        self.assertEqual(self.suggestions('wa'), ["Walk the dog", "Wash car", "Water plants"])
+        self.assertEqual(self.suggestions('wi'), [])
+
+    def test_index_is_built_once(self):
+        self.suggestions('wa')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.suggestions('wal'), ["Walk the dog"])
+        self.assertFalse(any('"todolist_task"' in query['sql'] for query in queries))
+
+    def test_new_and_edited_tasks_update_the_index(self):
+        self.suggestions('wa')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('todolist:index'), {'task_text': "Wax floor\nWax floor"})
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': 'Wash bike'})
+        self.assertEqual(self.suggestions('wa'), ["Walk the dog", "Wax floor", "Wash bike", "Water plants"])
+
+    def test_deleted_tasks_leave_the_index(self):
+        self.suggestions('wa')
+        water = Task.objects.get(task_text="Water plants")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'delete': 'true'})
+            Task.objects.filter(id=water.id).update(done=True)
+            self.client.post(reverse('todolist:index'), {'bulk_action': 'clear_completed'})
+        self.assertEqual(self.suggestions('wa'), ["Walk the dog"])
+
+    @override_settings(AUTOCOMPLETE_CACHE_USERS=1)
+    def test_least_recently_used_index_is_evicted(self):
+        self.suggestions('wa')
+        self.client.login(username='other', password='testpass')
+        self.assertEqual(self.suggestions('wi'), ["Wine tasting"])
+        self.assertEqual(list(indexes.indexes), [self.other.id])
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('todolist:autocomplete'), {'q': 'wa'}).status_code, 403)
@@ -0,0 +1,89 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models.functions import Upper
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth.models import User
+from todolist.backfills import BACKFILLS, backfill, run_backfill
+from todolist.models import BackfillProgress, Task
+
+class BackfillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with five lowercase tasks.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        Task.objects.bulk_create([Task(task_text=f"task {i}", pub_date=timezone.now(), user=cls.user) for i in range(5)])
+
+    def setUp(self):
+        registry = mock.patch.dict(BACKFILLS)
+        registry.start()
+        self.addCleanup(registry.stop)
+        self.batches = []
+
+        @backfill("upper_text", Task, "0015_backfill_progress")
+        def upper_text(tasks):
+            self.batches.append(sorted(tasks.values_list('id', flat=True)))
+            return tasks.update(task_text=Upper('task_text'))
+
+    def texts(self):
+        return list(Task.objects.order_by('id').values_list('task_text', flat=True))
+
+    def test_rows_are_updated_in_key_order_batches(self):
+        self.assertTrue(run_backfill(BACKFILLS['upper_text'], 'default', batch_size=2, pause=0))
+        ids = list(Task.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.batches, [ids[0:2], ids[2:4], ids[4:5]])
+        self.assertEqual(self.texts(), [f"TASK {i}" for i in range(5)])
+        progress = BackfillProgress.objects.get(name='upper_text')
+        self.assertEqual((progress.rows, progress.batches, progress.last_pk), (5, 3, ids[-1]))
+        self.assertIsNotNone(progress.finished_at)
+
+    def test_resumes_after_the_last_committed_batch(self):
+        """
+        A batch that fails is rolled back with its checkpoint; the next run starts with it.
+        """
+        function = BACKFILLS['upper_text'].function
+        calls = []
+
+        def crash_on_second_batch(tasks):
+            calls.append(1)
+            changed = function(tasks)
+            if len(calls) == 2:
+                raise RuntimeError("Crash")
+            return changed
+        BACKFILLS['upper_text'].function = crash_on_second_batch
+        with self.assertRaises(RuntimeError):
+            run_backfill(BACKFILLS['upper_text'], 'default', batch_size=2, pause=0)
+        self.assertEqual(self.texts(), ["TASK 0", "TASK 1", "task 2", "task 3", "task 4"])
+        self.assertEqual(BackfillProgress.objects.get(name='upper_text').rows, 2)
+
+        BACKFILLS['upper_text'].function = function
+        self.batches.clear()
+        self.assertTrue(run_backfill(BACKFILLS['upper_text'], 'default', batch_size=2, pause=0))
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual(self.texts(), [f"TASK {i}" for i in range(5)])
+
+    @override_settings(BACKFILL_BATCH_SECONDS=0)
+    def test_slow_batches_shrink(self):
+        run_backfill(BACKFILLS['upper_text'], 'default', batch_size=2, pause=0)
+        self.assertEqual([len(batch) for batch in self.batches], [2, 1, 1, 1])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('run_backfills', '--max-batches', '1', '--batch-size', '3', '--pause', '0', stdout=out)
+        self.assertIn("upper_text on default: stopped", out.getvalue())
+        call_command('run_backfills', '--list', stdout=out)
+        self.assertIn("upper_text on default: in progress, 3 row(s)", out.getvalue())
+        call_command('run_backfills', 'upper_text', '--pause', '0', stdout=out)
+        self.assertIn("upper_text on default: done", out.getvalue())
+        self.assertEqual(self.texts(), [f"TASK {i}" for i in range(5)])
+
+    def test_waits_for_its_migration(self):
+        backfill("later", Task, "9999_not_yet")(lambda tasks: 0)
+        out = StringIO()
+        call_command('run_backfills', 'later', stdout=out)
+        self.assertIn("later on default: waiting for migration 9999_not_yet", out.getvalue())
+        self.assertFalse(BackfillProgress.objects.filter(name='later').exists())
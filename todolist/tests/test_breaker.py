@@ -0,0 +1,107 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.breaker import database_breaker
+from todolist.models import Task
+
+def slow_database(execute, sql, params, many, context):
+    time.sleep(0.02)
+    return execute(sql, params, many, context)
+
+def failing_database(execute, sql, params, many, context):
+    raise OperationalError("server closed the connection unexpectedly")
+
+@override_settings(DB_BREAKER_SLOW_SECONDS=0.01, DB_BREAKER_WINDOW=5, DB_BREAKER_MIN_QUERIES=3, DB_BREAKER_PROBE_INTERVAL=2.5)
+class DatabaseBreakerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with a task for today.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Water plants", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        probing = mock.patch.object(database_breaker, 'start_probing')
+        self.start_probing = probing.start()
+        self.addCleanup(probing.stop)
+        self.addCleanup(database_breaker.reset)
+        self.client.login(username='testuser', password='testpass')
+
+    def trip(self):
+        with connection.execute_wrapper(slow_database):
+            self.client.get(reverse('todolist:index'))
+        self.assertTrue(database_breaker.is_open())
+
+    def test_healthy_database_keeps_the_breaker_closed(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('todolist:index')).status_code, 200)
+        self.assertFalse(database_breaker.is_open())
+
+    def test_slow_database_opens_the_breaker(self):
+        self.trip()
+        self.start_probing.assert_called_once()
+
+    def test_failing_database_opens_the_breaker(self):
+        with connection.execute_wrapper(failing_database):
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    self.client.get(reverse('todolist:calendar'))
+        self.assertTrue(database_breaker.is_open())
+        self.assertEqual(database_breaker.failing, {'default'})
+
+    def test_day_page_is_served_read_only_from_the_snapshot(self):
+        self.client.get(reverse('todolist:index'))
+        self.trip()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('todolist:index'))
+        self.assertContains(response, "Water plants")
+        self.assertContains(response, "changes are paused")
+        self.assertNotContains(response, 'contenteditable')
+
+    def test_snapshot_is_not_rewritten_on_every_view(self):
+        self.client.get(reverse('todolist:index'))
+        Task.objects.filter(id=self.task.id).update(task_text="Repot plants")
+        with mock.patch('todolist.breaker.cache.set') as cache_set:
+            self.client.get(reverse('todolist:index'))
+        cache_set.assert_not_called()
+
+    def test_session_missing_from_the_cache_gets_the_unavailable_page(self):
+        self.client.get(reverse('todolist:index'))
+        self.trip()
+        cache.clear()
+        with connection.execute_wrapper(failing_database):
+            response = self.client.get(reverse('todolist:index'))
+        self.assertEqual(response.status_code, 503)
+        self.assertContains(response, "temporarily unavailable", status_code=503)
+
+    def test_pages_without_a_snapshot_are_unavailable(self):
+        self.trip()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('todolist:calendar'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+    def test_writes_are_rejected(self):
+        self.trip()
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'read_only')
+        self.assertFalse(Task.objects.get(id=self.task.id).done)
+
+    def test_probe_closes_the_breaker_once_the_database_is_fast(self):
+        self.trip()
+        with connection.execute_wrapper(slow_database):
+            self.assertFalse(database_breaker.probe())
+        self.assertTrue(database_breaker.is_open())
+        self.assertTrue(database_breaker.probe())
+        self.assertFalse(database_breaker.is_open())
+        self.assertEqual(self.client.get(reverse('todolist:calendar')).status_code, 200)
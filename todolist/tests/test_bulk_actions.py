@@ -0,0 +1,149 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.bulk import delete_tasks, mark_done
+from todolist.models import OutboxEvent, Tag, Task, TaskAudit, TaskTag
+from todolist.outbox import task_payload
+
+class BulkActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Three tasks today, one of them done, one task yesterday and one task of another user.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.other_user = User.objects.create_user(username='otheruser', password='otherpass')
+        now = timezone.now()
+        cls.open_tasks = [Task.objects.create(task_text=f"Open {i}", pub_date=now, user=cls.user) for i in range(2)]
+        cls.done_task = Task.objects.create(task_text="Done", pub_date=now, user=cls.user, done=True)
+        cls.yesterday_task = Task.objects.create(task_text="Yesterday", pub_date=now - datetime.timedelta(days=1), user=cls.user)
+        cls.other_task = Task.objects.create(task_text="Other", pub_date=now, user=cls.other_user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def test_mark_all_done(self):
+        """
+        Every task of the day is marked done; other days and users are untouched.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done'}, follow=True)
+        self.assertContains(response, "2 task(s) marked done.")
+        self.assertEqual(Task.objects.filter(user=self.user, done=True).count(), 3)
+        self.assertFalse(Task.objects.get(id=self.yesterday_task.id).done)
+        self.assertFalse(Task.objects.get(id=self.other_task.id).done)
+        self.assertEqual(TaskAudit.objects.filter(user=self.user, action=TaskAudit.TOGGLE).count(), 2)
+
+    def test_actions_keep_the_filters(self):
+        """
+        On a filtered page the actions only apply to the tasks shown.
+        """
+        tag = Tag.objects.create(user=self.user, name='home')
+        TaskTag.objects.create(task=self.open_tasks[0], tag=tag)
+        response = self.client.post(
+            reverse('todolist:index') + '?tag=home', {'bulk_action': 'mark_done', 'tag': 'home'}, follow=True,
+        )
+        self.assertContains(response, "1 task(s) marked done.")
+        self.assertEqual(response.redirect_chain[-1][0], reverse('todolist:index') + '?tag=home')
+        self.assertTrue(Task.objects.get(id=self.open_tasks[0].id).done)
+        self.assertFalse(Task.objects.get(id=self.open_tasks[1].id).done)
+
+    @override_settings(OUTBOX_ENDPOINTS=['http://receiver.example/'])
+    def test_mark_done_events_only_for_changed_tasks(self):
+        """
+        A task done since its chunk was read is neither counted nor sent as an update.
+        """
+        rows = [(task.id,) for task in self.open_tasks + [self.done_task]]
+        with mock.patch('todolist.bulk.chunks', return_value=iter([rows])):
+            self.assertEqual(mark_done(self.user, Task.objects.filter(user=self.user)), 2)
+        self.assertEqual(
+            sorted(event.payload['id'] for event in OutboxEvent.objects.all()), [task.id for task in self.open_tasks],
+        )
+
+    @override_settings(OUTBOX_ENDPOINTS=['http://receiver.example/'])
+    def test_bulk_updates_send_the_full_task(self):
+        """
+        Receivers get the same task.updated payload as for a single update.
+        """
+        task = self.open_tasks[0]
+        mark_done(self.user, Task.objects.filter(id=task.id))
+        task.refresh_from_db()
+        self.assertEqual(OutboxEvent.objects.get().payload, task_payload(task))
+
+    def test_rolled_back_actions_are_not_audited(self):
+        """
+        Inside an outer transaction (an Idempotency-Key request), the audit waits for the commit.
+        """
+        # Patched: the audit log may write from its own thread, outside the rolled back transaction.
+        with mock.patch('todolist.bulk.record_change') as record_change, self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                mark_done(self.user, Task.objects.filter(user=self.user))
+                delete_tasks(self.user, Task.objects.filter(id=self.done_task.id))
+                raise DatabaseError("rolled back")
+        record_change.assert_not_called()
+
+    def test_clear_completed(self):
+        """
+        Only the completed tasks of the day are deleted, together with their tags.
+        """
+        tag = Tag.objects.create(user=self.user, name='home')
+        TaskTag.objects.create(task=self.done_task, tag=tag)
+        response = self.client.post(
+            reverse('todolist:index'), {'bulk_action': 'clear_completed'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.json(), {'status': 'success', 'count': 1})
+        self.assertFalse(Task.objects.filter(id=self.done_task.id).exists())
+        self.assertFalse(TaskTag.objects.exists())
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 3)
+
+    def test_clear_other_day(self):
+        """
+        Posting to a day page clears that day only.
+        """
+        day = timezone.localdate() - datetime.timedelta(days=1)
+        url = reverse('todolist:day', args=[day.year, day.month, day.day])
+        response = self.client.post(url, {'bulk_action': 'clear_day'})
+        self.assertRedirects(response, url)
+        self.assertFalse(Task.objects.filter(id=self.yesterday_task.id).exists())
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 3)
+
+    def test_unknown_action(self):
+        response = self.client.post(reverse('todolist:index'), {'bulk_action': 'drop_everything'})
+        self.assertContains(response, "Unknown action.")
+        self.assertEqual(Task.objects.count(), 5)
+
+    def test_chunked_updates(self):
+        """
+        Large sets are updated one chunk per statement.
+        """
+        queryset = Task.objects.filter(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(mark_done(self.user, queryset, chunk_size=2), 3)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "todolist_task"')]
+        self.assertEqual(len(updates), 2)
+
+    def test_admin_actions(self):
+        """
+        The admin actions apply to the selected tasks of the logged-in user.
+        """
+        staff = User.objects.create_superuser(username='staff', password='staffpass')
+        tasks = [Task.objects.create(task_text=f"Staff {i}", pub_date=timezone.now(), user=staff) for i in range(2)]
+        self.client.login(username='staff', password='staffpass')
+        url = reverse('admin:todolist_task_changelist')
+        response = self.client.post(url, {
+            'action': 'mark_selected_done',
+            '_selected_action': [task.id for task in tasks],
+        }, follow=True)
+        self.assertContains(response, "2 task(s) marked done.")
+        response = self.client.post(url, {
+            'action': 'delete_selected_completed',
+            '_selected_action': [task.id for task in tasks] + [self.done_task.id],
+        }, follow=True)
+        self.assertContains(response, "2 completed task(s) deleted.")
+        self.assertTrue(Task.objects.filter(id=self.done_task.id).exists())
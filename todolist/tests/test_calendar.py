@@ -0,0 +1,133 @@
+import datetime
+import zoneinfo
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import Profile, Task
+from todolist.timezones import day_bounds, month_bounds
+
+UTC = datetime.timezone.utc
+
+def create_task_at(user, moment, text="Some task", done=False):
+    return Task.objects.create(task_text=text, pub_date=moment, user=user, done=done)
+
+class DayBoundsTests(TestCase):
+    def test_day_bounds_in_user_timezone(self):
+        start, end = day_bounds(datetime.date(2025, 1, 15), zoneinfo.ZoneInfo("America/New_York"))
+        self.assertEqual(start, datetime.datetime(2025, 1, 15, 5, tzinfo=UTC))
+        self.assertEqual(end, datetime.datetime(2025, 1, 16, 5, tzinfo=UTC))
+
+    def test_day_bounds_across_dst_change(self):
+        """
+        The day the clocks go forward is 23 hours long.
+        """
+        start, end = day_bounds(datetime.date(2025, 3, 9), zoneinfo.ZoneInfo("America/New_York"))
+        self.assertEqual(end - start, datetime.timedelta(hours=23))
+
+    def test_month_bounds_wrap_year(self):
+        start, end = month_bounds(2024, 12, UTC)
+        self.assertEqual(start, datetime.datetime(2024, 12, 1, tzinfo=UTC))
+        self.assertEqual(end, datetime.datetime(2025, 1, 1, tzinfo=UTC))
+
+class UserTimezoneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        Profile.objects.create(user=cls.user, timezone="Pacific/Kiritimati")
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def test_today_uses_user_timezone(self):
+        """
+        Kiritimati is UTC+14, so "today" there starts at 10:00 UTC of the previous UTC day.
+        """
+        zone = zoneinfo.ZoneInfo("Pacific/Kiritimati")
+        local_today = timezone.now().astimezone(zone).date()
+        start, end = day_bounds(local_today, zone)
+        inside = create_task_at(self.user, start + datetime.timedelta(minutes=1), "Early task")
+        create_task_at(self.user, start - datetime.timedelta(minutes=1), "Yesterday's task")
+        response = self.client.get(reverse("todolist:index"))
+        self.assertQuerySetEqual(response.context["task_list_today"], [inside])
+
+    def test_day_view(self):
+        zone = zoneinfo.ZoneInfo("Pacific/Kiritimati")
+        task = create_task_at(self.user, datetime.datetime(2025, 1, 15, 12, tzinfo=zone))
+        response = self.client.get(reverse("todolist:day", args=(2025, 1, 15)))
+        self.assertQuerySetEqual(response.context["task_list_today"], [task])
+        self.assertContains(response, "Wednesday, January 15, 2025")
+        response = self.client.get(reverse("todolist:day", args=(2025, 1, 16)))
+        self.assertContains(response, "No tasks for this day.")
+
+    def test_invalid_day(self):
+        response = self.client.get(reverse("todolist:day", args=(2025, 2, 30)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_days_at_the_ends_of_the_calendar(self):
+        """
+        The first and last days have no neighbours, and their bounds would overflow in UTC.
+        """
+        for args in [(1, 1, 1), (9999, 12, 31)]:
+            self.assertEqual(self.client.get(reverse("todolist:day", args=args)).status_code, 404)
+        self.assertEqual(self.client.get(reverse("todolist:day", args=(1, 1, 2))).status_code, 200)
+        self.assertEqual(self.client.get(reverse("todolist:calendar_month", args=(1, 1))).status_code, 404)
+        self.assertEqual(self.client.get(reverse("todolist:calendar_month", args=(1, 2))).status_code, 200)
+
+    def test_set_timezone(self):
+        response = self.client.post(reverse("todolist:user_timezone"), {'timezone': "Europe/Lisbon"})
+        self.assertRedirects(response, reverse("todolist:index"))
+        self.assertEqual(Profile.objects.get(user=self.user).timezone, "Europe/Lisbon")
+        response = self.client.get(reverse("todolist:user_timezone"))
+        self.assertContains(response, '<option value="Europe/Lisbon" selected>')
+
+    def test_set_invalid_timezone(self):
+        response = self.client.post(reverse("todolist:user_timezone"), {'timezone': "Mars/Olympus"})
+        self.assertContains(response, "Select a valid timezone.")
+        self.assertEqual(Profile.objects.get(user=self.user).timezone, "Pacific/Kiritimati")
+
+class CalendarViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        Profile.objects.create(user=cls.user, timezone="America/New_York")
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def test_month_counts_in_user_timezone(self):
+        """
+        A task at 02:00 UTC on the 2nd belongs to the 1st in New York.
+        """
+        create_task_at(self.user, datetime.datetime(2025, 1, 2, 2, tzinfo=UTC), done=True)
+        create_task_at(self.user, datetime.datetime(2025, 1, 2, 15, tzinfo=UTC))
+        create_task_at(self.user, datetime.datetime(2025, 1, 2, 16, tzinfo=UTC), done=True)
+        response = self.client.get(reverse("todolist:calendar_month", args=(2025, 1)))
+        cells = {cell['date']: cell['counts'] for week in response.context['weeks'] for cell in week}
+        self.assertEqual(cells[datetime.date(2025, 1, 1)]['total'], 1)
+        self.assertEqual(cells[datetime.date(2025, 1, 2)]['total'], 2)
+        self.assertEqual(cells[datetime.date(2025, 1, 2)]['done'], 1)
+        self.assertIsNone(cells[datetime.date(2025, 1, 3)])
+        self.assertContains(response, "1/2 done")
+
+    def test_month_is_a_single_query(self):
+        for day in range(1, 29):
+            create_task_at(self.user, datetime.datetime(2025, 2, day, 15, tzinfo=UTC))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("todolist:calendar_month", args=(2025, 2)))
+        task_queries = [q['sql'] for q in queries if '"todolist_task"' in q['sql']]
+        self.assertEqual(len(task_queries), 1)
+        self.assertIn("GROUP BY", task_queries[0])
+
+    def test_invalid_month(self):
+        response = self.client.get(reverse("todolist:calendar_month", args=(2025, 13)))
+        self.assertEqual(response.status_code, 404)
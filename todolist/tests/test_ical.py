@@ -0,0 +1,90 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.ical import fold
+from todolist.models import Profile, Task
+from todolist.sync import next_change
+
+UTC = datetime.timezone.utc
+
+class FoldTests(SimpleTestCase):
+    def test_long_lines_are_folded_without_splitting_characters(self):
+        folded = fold("SUMMARY:" + "é" * 60)
+        lines = folded.split("\r\n")[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual("".join(line[1:] if i else line for i, line in enumerate(lines)), "SUMMARY:" + "é" * 60)
+
+class TaskFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user in New York with a feed, a task late in the evening and a done one.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        Profile.objects.create(user=cls.user, timezone="America/New_York", feed_token="secret-token")
+        cls.task = Task.objects.create(
+            task_text="Buy milk, eggs", pub_date=datetime.datetime(2025, 1, 16, 3, tzinfo=UTC), user=cls.user,
+        )
+        Task.objects.create(task_text="Call mom", pub_date=datetime.datetime(2025, 1, 17, 12, tzinfo=UTC), user=cls.user, done=True)
+        next_change(cls.user, 'default')
+        cls.url = reverse('todolist:task_feed', args=['secret-token'])
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def test_tasks_are_all_day_events_in_the_users_timezone(self):
+        response, body = self.feed()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertIn(f"UID:task-{self.task.id}@todolist\r\n", body)
+        self.assertIn("DTSTART;VALUE=DATE:20250115\r\n", body)
+        self.assertIn("SUMMARY:Buy milk\\, eggs\r\n", body)
+        self.assertIn("SUMMARY:Done: Call mom\r\n", body)
+
+    def test_unchanged_feed_is_not_modified_without_reading_tasks(self):
+        response, _ = self.feed()
+        with CaptureQueriesContext(connection) as queries:
+            not_modified, _ = self.feed(if_none_match=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('"todolist_task"' in query['sql'] for query in queries))
+
+    def test_full_feed_is_cached(self):
+        streamed, body = self.feed()
+        self.assertTrue(streamed.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            cached, cached_body = self.feed()
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached_body, body)
+        self.assertFalse(any('"todolist_task"' in query['sql'] for query in queries))
+
+    def test_changes_give_a_new_feed(self):
+        response, _ = self.feed()
+        self.client.login(username='testuser', password='testpass')
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+        changed, body = self.feed(if_none_match=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertIn("SUMMARY:Done: Buy milk\\, eggs\r\n", body)
+
+    def test_unknown_token(self):
+        self.assertEqual(self.client.get(reverse('todolist:task_feed', args=['wrong'])).status_code, 404)
+
+    def test_new_url_replaces_the_old_one(self):
+        self.client.login(username='testuser', password='testpass')
+        response = self.client.post(reverse('todolist:calendar_feed'), follow=True)
+        token = Profile.objects.get(user=self.user).feed_token
+        self.assertNotEqual(token, 'secret-token')
+        self.assertContains(response, reverse('todolist:task_feed', args=[token]))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -0,0 +1,98 @@
+import datetime
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import IdempotencyKey, Task, TaskAudit
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with one task.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Task", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='testuser', password='testpass')
+
+    def create(self, texts, key='create-1'):
+        return self.client.post(
+            reverse('todolist:index'), json.dumps(texts), content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_repeated_create_returns_the_first_response(self):
+        first = self.create(["Buy milk", "Call mom"])
+        second = self.create(["Buy milk", "Call mom"])
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, second.json()), (201, first.json()))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Task.objects.filter(task_text="Buy milk").count(), 1)
+
+    def test_replay_from_the_database_does_not_touch_tasks(self):
+        first = self.create(["Buy milk"])
+        cache.clear()
+        self.client.login(username='testuser', password='testpass')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.create(["Buy milk"])
+        self.assertEqual(second.json(), first.json())
+        self.assertFalse(any('"todolist_task"' in query['sql'] for query in queries))
+
+    def test_key_reused_for_another_request(self):
+        self.create(["Buy milk"])
+        response = self.create(["Buy bread"])
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Task.objects.filter(task_text="Buy bread").exists())
+
+    def test_form_posts_replay_the_redirect(self):
+        for _ in range(2):
+            response = self.client.post(reverse('todolist:index'), {'task_text': "Walk dog"}, HTTP_IDEMPOTENCY_KEY='form-1')
+            self.assertRedirects(response, reverse('todolist:index'), fetch_redirect_response=False)
+        self.assertEqual(Task.objects.filter(task_text="Walk dog").count(), 1)
+
+    def test_repeated_update_is_applied_once(self):
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': 'Edited'}, HTTP_IDEMPOTENCY_KEY='edit-1',
+                )
+            self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(TaskAudit.objects.filter(task_id=self.task.id, action=TaskAudit.EDIT).count(), 1)
+
+    def test_side_effects_wait_for_the_key(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'}, HTTP_IDEMPOTENCY_KEY='edit-2',
+            )
+        self.assertFalse(TaskAudit.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(TaskAudit.objects.filter(task_id=self.task.id, action=TaskAudit.TOGGLE).exists())
+
+    def test_rendered_pages_are_not_kept(self):
+        response = self.client.post(reverse('todolist:index'), {'task_text': "!!!"}, HTTP_IDEMPOTENCY_KEY='form-2')
+        self.assertContains(response, 'Task must contain at least one letter or number.')
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.client.post(reverse('todolist:index'), {'task_text': "!!!"}, HTTP_IDEMPOTENCY_KEY='form-2')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_requests_without_a_key_are_not_deduplicated(self):
+        self.create(["Buy milk"], key='')
+        self.create(["Buy milk"], key='')
+        self.assertEqual(Task.objects.filter(task_text="Buy milk").count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_keys_are_pruned(self):
+        self.create(["Buy milk"])
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        call_command('prune_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,151 @@
+import datetime
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.jobs import HANDLERS, Worker, claim_job, enqueue, handler, prune_jobs, requeue_stale_jobs
+from todolist.models import Job, Project, Task
+
+@handler("test_failure")
+def fail(job):
+    raise RuntimeError("Boom")
+
+class JobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with three tasks today, one of them done, and another user.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.other_user = User.objects.create_user(username='otheruser', password='otherpass')
+        now = timezone.now()
+        cls.tasks = [Task.objects.create(task_text=f"Task {i}", pub_date=now, user=cls.user) for i in range(2)]
+        Task.objects.create(task_text="Done", pub_date=now, user=cls.user, done=True)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+        exports = tempfile.TemporaryDirectory()
+        self.addCleanup(exports.cleanup)
+        override = override_settings(STORAGES={
+            **settings.STORAGES,
+            'exports': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': exports.name}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def run_jobs(self):
+        """Run the queued jobs in this thread, which sees the test's transaction."""
+        worker = Worker(threads=1, interval=0, once=True, name='test')
+        worker.work('test:0')
+        return worker
+
+    def test_export_runs_in_a_worker(self):
+        response = self.client.post(reverse('todolist:export_tasks'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['job']['status'], Job.QUEUED)
+
+        self.assertEqual(self.run_jobs().done, 1)
+        job = self.client.get(status_url).json()['job']
+        self.assertEqual(job['status'], Job.DONE)
+        self.assertEqual((job['progress'], job['total'], job['result']), (3, 3, {'count': 3}))
+
+        response = self.client.get(job['download_url'])
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.json"')
+        tasks = json.loads(b''.join(response.streaming_content))['tasks']
+        self.assertEqual([task['task_text'] for task in tasks], ["Task 0", "Task 1", "Done"])
+
+    def test_downloads_are_private(self):
+        job = enqueue(self.user, 'export_tasks')
+        self.run_jobs()
+        self.client.login(username='otheruser', password='otherpass')
+        self.assertEqual(self.client.get(reverse('todolist:job_download', args=[job.id])).status_code, 404)
+
+    @override_settings(JOB_INLINE_LIMIT=2)
+    def test_large_bulk_action_is_queued(self):
+        """
+        A bulk action on more tasks than JOB_INLINE_LIMIT returns right away and runs in a worker.
+        """
+        response = self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done'})
+        job = Job.objects.get(user=self.user)
+        self.assertRedirects(response, f"{reverse('todolist:index')}?job={job.id}")
+        self.assertContains(self.client.get(response.url), reverse('todolist:job_status', args=[job.id]))
+        self.assertEqual(Task.objects.filter(user=self.user, done=False).count(), 2)
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress, job.total), (Job.DONE, {'count': 2}, 2, 2))
+        self.assertFalse(Task.objects.filter(user=self.user, done=False).exists())
+
+    @override_settings(JOB_INLINE_LIMIT=0)
+    def test_queued_bulk_action_keeps_the_filters(self):
+        project = Project.objects.create(user=self.user, name='Work')
+        Task.objects.filter(id=self.tasks[0].id).update(project=project)
+        self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done', 'project': str(project.id)})
+        self.run_jobs()
+        self.assertEqual(list(Task.objects.filter(user=self.user, done=False)), [self.tasks[1]])
+
+    def test_small_bulk_action_runs_inline(self):
+        self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done'})
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(Task.objects.filter(user=self.user, done=False).exists())
+
+    def test_failing_job(self):
+        job = enqueue(self.user, 'test_failure')
+        self.assertEqual(self.run_jobs().failed, 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'Boom'))
+
+    def test_unknown_kind_is_refused(self):
+        with self.assertRaises(ValueError):
+            enqueue(self.user, 'missing')
+        self.assertNotIn('missing', HANDLERS)
+
+    def test_a_job_is_claimed_once(self):
+        job = enqueue(self.user, 'export_tasks')
+        self.assertEqual(claim_job('first').id, job.id)
+        self.assertIsNone(claim_job('second'))
+
+    @override_settings(JOB_TIMEOUT=60, JOB_MAX_ATTEMPTS=2)
+    def test_stale_jobs_are_requeued_then_failed(self):
+        """
+        A job whose worker stopped is queued again, until it used all its attempts.
+        """
+        job = enqueue(self.user, 'export_tasks')
+        for attempt in (1, 2):
+            self.assertEqual(claim_job('crashed').attempts, attempt)
+            Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - datetime.timedelta(minutes=5))
+            requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @override_settings(JOB_TTL=60)
+    def test_finished_jobs_are_pruned_with_their_files(self):
+        job = enqueue(self.user, 'export_tasks')
+        self.run_jobs()
+        name = Job.objects.get(id=job.id).result['file']
+        self.assertTrue(storages['exports'].exists(name))
+        running = enqueue(self.user, 'export_tasks')
+        self.assertEqual(prune_jobs(), 0)
+        self.assertEqual(prune_jobs(now=timezone.now() + datetime.timedelta(seconds=61)), 1)
+        self.assertFalse(storages['exports'].exists(name))
+        self.assertEqual(list(Job.objects.values_list('id', flat=True)), [running.id])
+
+    def test_admin_lists_own_jobs_only(self):
+        staff = User.objects.create_superuser(username='staff', password='staffpass')
+        own = enqueue(staff, 'export_tasks')
+        enqueue(self.other_user, 'export_tasks')
+        self.client.login(username='staff', password='staffpass')
+        response = self.client.get(reverse('admin:todolist_job_changelist'))
+        self.assertEqual(list(response.context['cl'].result_list), [own])
+
+    def test_other_users_jobs_are_hidden(self):
+        job = enqueue(self.other_user, 'export_tasks')
+        response = self.client.get(reverse('todolist:job_status', args=[job.id]))
+        self.assertEqual(response.status_code, 404)
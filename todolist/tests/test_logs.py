@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+import sys
+from logging.handlers import BufferingHandler
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.logs import QueueLogHandler, RequestIdFilter, SamplingFilter
+from todolist.models import Task
+
+def record(**extra):
+    return logging.makeLogRecord({'name': 'todolist.test', 'levelno': logging.INFO, 'levelname': 'INFO', 'msg': 'Hello %s', 'args': ('you',), **extra})
+
+class QueueLogHandlerTests(SimpleTestCase):
+    def test_records_are_written_as_json_by_the_listener(self):
+        stream = io.StringIO()
+        handler = QueueLogHandler(maxsize=10, stream=stream)
+        handler.handle(record(event='request', status=200))
+        handler.stop()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['message'], 'Hello you')
+        self.assertEqual((entry['level'], entry['event'], entry['status']), ('INFO', 'request', 200))
+
+    def test_full_queue_drops_and_counts(self):
+        """
+        A full queue never blocks: the record is dropped, and the drop is reported once there is room.
+        """
+        handler = QueueLogHandler(maxsize=2, stream=io.StringIO())
+        handler.start = lambda: None
+        for _ in range(3):
+            handler.handle(record())
+        self.assertEqual(handler.dropped, 1)
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.handle(record())
+        warning = handler.queue.get_nowait()
+        self.assertEqual((warning.levelname, warning.dropped), ('WARNING', 1))
+        self.assertEqual(handler.queue.get_nowait().getMessage(), 'Hello you')
+
+    def test_exceptions_are_formatted_before_queueing(self):
+        handler = QueueLogHandler(maxsize=2, stream=io.StringIO())
+        try:
+            raise ValueError('Boom')
+        except ValueError:
+            queued = handler.prepare(record(exc_info=sys.exc_info()))
+        self.assertIsNone(queued.exc_info)
+        self.assertIn('ValueError: Boom', queued.exc_text)
+
+class SamplingFilterTests(SimpleTestCase):
+    def test_sampled_events(self):
+        self.assertFalse(SamplingFilter({'update_task': 0}).filter(record(event='update_task')))
+        kept = record(event='update_task')
+        self.assertTrue(SamplingFilter({'update_task': 1}).filter(kept))
+        self.assertEqual(kept.sample_rate, 1)
+
+    def test_other_records_are_kept(self):
+        self.assertTrue(SamplingFilter({'update_task': 0}).filter(record()))
+
+class RequestLoggingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with one task.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Task", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+        self.handler = BufferingHandler(100)
+        self.handler.addFilter(RequestIdFilter())
+        logging.getLogger('todolist').addHandler(self.handler)
+        self.addCleanup(logging.getLogger('todolist').removeHandler, self.handler)
+
+    def test_request_id_is_kept_or_created(self):
+        response = self.client.get(reverse('todolist:index'), HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        response = self.client.get(reverse('todolist:index'), HTTP_X_REQUEST_ID='not valid!')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_records_carry_the_request_id(self):
+        self.client.post(
+            reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'}, HTTP_X_REQUEST_ID='toggle-1',
+        )
+        events = {entry.event: entry for entry in self.handler.buffer}
+        self.assertEqual(events['update_task'].request_id, 'toggle-1')
+        self.assertEqual((events['update_task'].action, events['update_task'].done), ('toggle', True))
+        self.assertEqual((events['request'].request_id, events['request'].status), ('toggle-1', 200))
@@ -0,0 +1,76 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import Task
+
+def millis(moment):
+    return int(moment.timestamp() * 1000)
+
+class OfflineSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Test task", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def update(self, edited_at, **data):
+        return self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'client_ts': millis(edited_at), **data})
+
+    def test_newer_edit_wins(self):
+        now = timezone.now()
+        self.update(now - datetime.timedelta(minutes=5), task_text="Older edit")
+        response = self.update(now - datetime.timedelta(minutes=1), task_text="Newer edit")
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.task_text, "Newer edit")
+
+    def test_replayed_older_edit_is_stale(self):
+        """
+        An edit queued offline and replayed after a newer one is not applied.
+        """
+        now = timezone.now()
+        self.update(now - datetime.timedelta(minutes=1), done='true')
+        response = self.update(now - datetime.timedelta(minutes=5), task_text="Offline edit")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'status': 'stale', 'task_text': "Test task", 'done': True})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.task_text, "Test task")
+
+    def test_stale_delete_is_rejected(self):
+        now = timezone.now()
+        self.update(now - datetime.timedelta(minutes=1), task_text="Kept")
+        response = self.update(now - datetime.timedelta(minutes=5), delete='true')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(Task.objects.filter(id=self.task.id).exists())
+
+    def test_future_timestamp_is_clamped(self):
+        """
+        A client with a fast clock cannot block edits from everyone else.
+        """
+        self.update(timezone.now() + datetime.timedelta(days=1), task_text="From the future")
+        self.task.refresh_from_db()
+        self.assertLessEqual(self.task.updated_at, timezone.now())
+        response = self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': "Now"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_service_worker(self):
+        response = self.client.get(reverse('todolist:service_worker'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertEqual(reverse('todolist:service_worker'), '/sw.js')
+        for script in ('offline_queue', 'task_update', 'autocomplete', 'job_progress'):
+            self.assertContains(response, f'/static/todolist/js/{script}.js')
+        self.assertContains(response, 'todolist-shell-v5')
+
+    def test_index_registers_service_worker(self):
+        response = self.client.get(reverse('todolist:index'))
+        self.assertContains(response, 'offline_queue.js')
+        self.assertContains(response, 'var serviceWorkerURL = "/sw.js"')
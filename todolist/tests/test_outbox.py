@@ -0,0 +1,135 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import OutboxEvent, ShardAssignment, Task
+
+class StubReceiver(BaseHTTPRequestHandler):
+    """Records the batches posted to it and answers with the next of `server.statuses` (200 when empty)."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.received.append((self.path, self.client_address, body['events']))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class OutboxTests(TestCase):
+    databases = {'default', 'shard_0', 'shard_1'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubReceiver)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with one task.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Task", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        self.server.received = []
+        self.server.statuses = []
+        self.client.login(username='testuser', password='testpass')
+        endpoints = override_settings(OUTBOX_ENDPOINTS=[f'{self.url}/a', f'{self.url}/b'])
+        endpoints.enable()
+        self.addCleanup(endpoints.disable)
+
+    def deliver(self, *args):
+        call_command('deliver_outbox', '--once', *args, stdout=StringIO())
+
+    def test_changes_queue_one_event_per_endpoint(self):
+        self.client.post(reverse('todolist:index'), {'task_text': "One\nTwo"})
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+        events = list(OutboxEvent.objects.order_by('id').values_list('endpoint', 'event'))
+        self.assertEqual(events, [
+            (f'{self.url}/a', 'task.created'), (f'{self.url}/b', 'task.created'),
+            (f'{self.url}/a', 'task.created'), (f'{self.url}/b', 'task.created'),
+            (f'{self.url}/a', 'task.updated'), (f'{self.url}/b', 'task.updated'),
+        ])
+        self.assertEqual(OutboxEvent.objects.last().payload['done'], True)
+
+    @override_settings(OUTBOX_ENDPOINTS=[])
+    def test_nothing_is_queued_without_endpoints(self):
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'delete': 'true'})
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_events_are_posted_in_batches(self):
+        """
+        Each endpoint gets its events in id order, two per request over one kept-alive connection.
+        """
+        self.client.post(reverse('todolist:index'), {'task_text': "One\nTwo\nThree"})
+        self.deliver('--batch-size', '2', '--concurrency', '1')
+        for path in ('/a', '/b'):
+            batches = [events for received_path, _, events in self.server.received if received_path == path]
+            self.assertEqual([[event['payload']['task_text'] for event in events] for events in batches], [["One", "Two"], ["Three"]])
+        self.assertEqual(len({address for _, address, _ in self.server.received}), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(TASK_SHARDS=['shard_0', 'shard_1'])
+    def test_event_ids_are_unique_across_shards(self):
+        """
+        Each shard counts its own primary keys, but receivers get ids no other shard sends.
+        """
+        for alias in ('shard_0', 'shard_1'):
+            user = User.objects.create_user(username=alias, password='testpass')
+            ShardAssignment.objects.create(user=user, alias=alias)
+            self.client.login(username=alias, password='testpass')
+            self.client.post(reverse('todolist:index'), {'task_text': f"Task on {alias}"})
+            self.assertEqual(OutboxEvent.objects.using(alias).count(), 2)
+        self.deliver()
+        events = [event for path, _, events in self.server.received if path == '/a' for event in events]
+        self.assertEqual(sorted(event['payload']['task_text'] for event in events), ["Task on shard_0", "Task on shard_1"])
+        self.assertEqual(len({event['id'] for event in events}), 2)
+
+    def test_rejected_batches_are_retried_later(self):
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'delete': 'true'})
+        self.server.statuses = [500, 500]
+        self.deliver()
+        self.assertEqual(len(self.server.received), 2)
+        for event in OutboxEvent.objects.all():
+            self.assertEqual((event.event, event.attempts, event.last_error), ('task.deleted', 1, 'HTTP 500'))
+            self.assertGreater(event.next_attempt_at, timezone.now())
+        # Not due yet, so nothing is sent.
+        self.deliver()
+        self.assertEqual(len(self.server.received), 2)
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.deliver()
+        self.assertEqual(len(self.server.received), 4)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    def test_events_fail_after_max_attempts(self):
+        self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'task_text': 'Edited'})
+        self.server.statuses = [503, 503]
+        self.deliver()
+        self.assertEqual(OutboxEvent.objects.filter(failed=True).count(), 2)
+
+    def test_unreachable_endpoint(self):
+        with override_settings(OUTBOX_ENDPOINTS=['http://127.0.0.1:1/']):
+            self.client.post(reverse('todolist:update_task'), {'task_id': self.task.id, 'done': 'true'})
+        self.deliver()
+        self.assertIn('ConnectionRefusedError', OutboxEvent.objects.get().last_error)
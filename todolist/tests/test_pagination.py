@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import Project, Task
+
+@override_settings(INDEX_PAGE_SIZE=2)
+class IndexPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Five tasks today, in rank order.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.project = Project.objects.create(user=cls.user, name='Work')
+        cls.tasks = [
+            Task.objects.create(task_text=f"Task {i}", pub_date=timezone.now(), user=cls.user, project=cls.project)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def test_first_page(self):
+        response = self.client.get(reverse('todolist:index'))
+        self.assertEqual([task.task_text for task in response.context['task_list_today']], ["Task 0", "Task 1"])
+        self.assertContains(response, "page=2")
+        self.assertNotContains(response, "Previous")
+
+    def test_last_page(self):
+        response = self.client.get(reverse('todolist:index'), {'page': 3})
+        self.assertEqual([task.task_text for task in response.context['task_list_today']], ["Task 4"])
+        self.assertContains(response, "page=2")
+        self.assertNotContains(response, "Next")
+
+    def test_invalid_page_shows_first(self):
+        response = self.client.get(reverse('todolist:index'), {'page': 'x'})
+        self.assertEqual(response.context['page_obj']['number'], 1)
+
+    @override_settings(INDEX_MAX_PAGE=3)
+    def test_pages_past_the_last_allowed_are_not_found(self):
+        self.assertEqual(self.client.get(reverse('todolist:index'), {'page': 3}).status_code, 200)
+        for page in [4, '99999999999999999999']:
+            self.assertEqual(self.client.get(reverse('todolist:index'), {'page': page}).status_code, 404)
+
+    def test_page_links_keep_filters(self):
+        response = self.client.get(reverse('todolist:index'), {'project': self.project.id})
+        self.assertContains(response, f"?project={self.project.id}&amp;page=2")
+
+    def test_only_listed_columns_are_loaded(self):
+        """
+        Tasks are loaded with the columns the list shows, other fields are deferred.
+        """
+        response = self.client.get(reverse('todolist:index'))
+        task = response.context['task_list_today'][0]
+        self.assertEqual(task.get_deferred_fields() & {'task_text', 'done', 'due_at'}, set())
+        self.assertIn('remind_at', task.get_deferred_fields())
+
+    def test_benchmark_index(self):
+        """
+        The benchmark reports one line per size and leaves no data behind.
+        """
+        out = StringIO()
+        call_command('benchmark_index', '--sizes', '3', '--repeat', '1', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        self.assertEqual(Task.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 1)
@@ -0,0 +1,153 @@
+"""
+Query and latency budgets of the main views.
+
+Each budget below is checked with datasets of every size in SIZES: the view
+must stay within its query budget, use the same number of queries whatever
+the number of tasks, and not use more queries than stored in the baseline
+(perf_baseline.json). Its time may not exceed the baseline's by more than
+PERF_TOLERANCE (3x by default, plus PERF_SLACK_MS for timer noise), and
+with the largest dataset it may not be more than PERF_SCALING times (10x)
+slower than with the smallest, in the same run.
+
+After an intended change, refresh the baseline with:
+
+    PERF_UPDATE_BASELINE=1 python manage.py test todolist.tests.test_performance
+"""
+import json
+import os
+import statistics
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import ChangeCounter, Project, Tag, Task, TaskAudit, TaskTag
+from todolist.ranking import spread_ranks
+
+BASELINE_PATH = Path(__file__).with_name('perf_baseline.json')
+SIZES = (10, 100, 1000)
+REPEAT = 5
+TOLERANCE = float(os.getenv('PERF_TOLERANCE', '3'))
+SCALING = float(os.getenv('PERF_SCALING', '10'))
+SLACK_MS = float(os.getenv('PERF_SLACK_MS', '5'))
+
+# `path` and `data` get the seeded dataset, a dict with the user's tasks;
+# `check`, if set, tells whether a response did the work being measured.
+Budget = namedtuple('Budget', 'name method path data queries check', defaults=(None,))
+
+BUDGETS = [
+    Budget('index', 'get', lambda seeded: reverse('todolist:index'), lambda seeded: {}, 6),
+    Budget('index_by_tag', 'get', lambda seeded: reverse('todolist:index'), lambda seeded: {'tag': 'home'}, 6),
+    Budget('calendar', 'get', lambda seeded: reverse('todolist:calendar'), lambda seeded: {}, 3),
+    Budget(
+        'sync', 'get', lambda seeded: reverse('todolist:sync'), lambda seeded: {'since': 0, 'limit': 5}, 6,
+        lambda response, seeded: len(response.json()['tasks']) == 5,
+    ),
+    Budget('task_history', 'get', lambda seeded: reverse('todolist:task_history'), lambda seeded: {}, 3),
+    Budget(
+        'update_task', 'post', lambda seeded: reverse('todolist:update_task'),
+        lambda seeded: {'task_id': seeded['tasks'][0], 'task_text': f'Edited {time.perf_counter_ns()}'}, 12,
+    ),
+    Budget(
+        'move_task', 'post', lambda seeded: reverse('todolist:move_task'),
+        lambda seeded: {'task_id': seeded['tasks'][-1], 'before_id': seeded['tasks'][0], 'after_id': seeded['tasks'][1]}, 11,
+    ),
+]
+
+def seed(user, size):
+    """Give the user `size` tasks today, each with a project, a tag and a change number, plus as many history rows."""
+    project = Project.objects.create(user=user, name='Work')
+    tag = Tag.objects.create(user=user, name='home')
+    now = timezone.now()
+    # As if created one by one, so sync pages through them.
+    tasks = Task.objects.bulk_create([
+        Task(user=user, task_text=f'Task {i}', pub_date=now, rank=rank, project=project, change_seq=i + 1)
+        for i, rank in enumerate(spread_ranks(size))
+    ])
+    ChangeCounter.objects.create(user=user, value=size)
+    TaskTag.objects.bulk_create([TaskTag(task=task, tag=tag) for task in tasks])
+    TaskAudit.objects.bulk_create([
+        TaskAudit(user=user, task_id=task.id, action=TaskAudit.EDIT, changes={}, created_at=now) for task in tasks
+    ])
+    return {'tasks': [task.id for task in tasks]}
+
+class PerformanceBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        One user per dataset size.
+        """
+        cls.datasets = {}
+        for size in SIZES:
+            user = User.objects.create_user(username=f'perf{size}', password='testpass')
+            cls.datasets[size] = (user, seed(user, size))
+
+    @classmethod
+    def setUpClass(cls):
+        # Set before setUpTestData, so tests share it instead of getting a copy.
+        cls.measured = {}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.getenv('PERF_UPDATE_BASELINE') and cls.measured:
+            BASELINE_PATH.write_text(json.dumps(cls.measured, indent=2, sort_keys=True) + '\n')
+        super().tearDownClass()
+
+    def measure(self, budget, size):
+        """Return (queries, median milliseconds) of the view for one dataset."""
+        user, seeded = self.datasets[size]
+        self.client.force_login(user)
+        request = getattr(self.client, budget.method)
+        request(budget.path(seeded), budget.data(seeded))
+        with CaptureQueriesContext(connection) as queries:
+            response = request(budget.path(seeded), budget.data(seeded))
+        # Read now: the log the count is sliced from is reset by the next request.
+        query_count = len(queries)
+        self.assertLess(response.status_code, 400, f'{budget.name} answered {response.status_code}')
+        if budget.check is not None:
+            self.assertTrue(budget.check(response, seeded), f'{budget.name} answered without the seeded tasks')
+        timings = []
+        for _ in range(REPEAT):
+            path, data = budget.path(seeded), budget.data(seeded)
+            started = time.perf_counter()
+            request(path, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        return query_count, statistics.median(timings)
+
+    def test_budgets(self):
+        baseline = {} if os.getenv('PERF_UPDATE_BASELINE') else json.loads(BASELINE_PATH.read_text())
+        for budget in BUDGETS:
+            counts = {}
+            timings = {}
+            for size in SIZES:
+                with self.subTest(view=budget.name, tasks=size):
+                    counts[size], timings[size] = self.measure(budget, size)
+                    self.measured.setdefault(budget.name, {})[str(size)] = {
+                        'queries': counts[size], 'ms': round(timings[size], 2),
+                    }
+                    self.assertLessEqual(counts[size], budget.queries, f'{budget.name} is over its query budget')
+                    expected = baseline.get(budget.name, {}).get(str(size))
+                    if expected:
+                        self.assertLessEqual(
+                            counts[size], expected['queries'],
+                            f'{budget.name} with {size} tasks ran {counts[size]} queries, baseline {expected["queries"]}',
+                        )
+                        self.assertLessEqual(
+                            timings[size], expected['ms'] * TOLERANCE + SLACK_MS,
+                            f'{budget.name} with {size} tasks took {timings[size]:.1f} ms, baseline {expected["ms"]} ms',
+                        )
+            with self.subTest(view=budget.name):
+                self.assertEqual(
+                    len(set(counts.values())), 1, f'{budget.name} queries grow with the number of tasks: {counts}',
+                )
+                smallest, largest = timings[SIZES[0]], timings[SIZES[-1]]
+                self.assertLessEqual(
+                    largest, smallest * SCALING + SLACK_MS,
+                    f'{budget.name} took {largest:.1f} ms with {SIZES[-1]} tasks, {smallest:.1f} ms with {SIZES[0]}',
+                )
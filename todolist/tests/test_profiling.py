@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from todolist.profiling import memory_tracing
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.staff = User.objects.create_user(username='staffuser', password='testpass', is_staff=True)
+
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        override = override_settings(PROFILE_DIR=self.profile_dir.name, PROFILE_SAMPLE_RATE=0, PROFILE_KEEP=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def view_files(self, pattern):
+        return sorted(Path(self.profile_dir.name, "todolist.index").glob(pattern))
+
+    def test_not_profiled_by_default(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("todolist:index"))
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    def test_header_ignored_for_non_staff(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("todolist:index"), HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_staff_header_profiles_request(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("todolist:index"), HTTP_X_PROFILE="1")
+        self.assertTrue(response["X-Profile-Id"].startswith("todolist.index/"))
+        self.assertEqual(len(self.view_files("*.prof")), 1)
+        self.assertEqual(self.view_files("*.alloc.json"), [])
+
+    def test_memory_profile_is_the_requests_own(self):
+        """
+        Only what the request allocated is kept, not everything the process holds.
+        """
+        self.client.force_login(self.staff)
+        memory_tracing.acquire()
+        try:
+            # Traced, but allocated before the request started.
+            held = [bytearray(1024) for _ in range(1000)]
+            self.client.get(reverse("todolist:index"), HTTP_X_PROFILE="memory")
+        finally:
+            memory_tracing.release()
+        [path] = self.view_files("*.alloc.json")
+        growth = json.loads(path.read_text())
+        self.assertTrue(all(size > 0 for _, size, _ in growth))
+        self.assertLess(sum(size for _, size, _ in growth), 1000 * 1024)
+        del held
+
+    def test_memory_tracing_outlives_overlapping_requests(self):
+        """
+        A request that finishes doesn't stop tracing for one still running in another thread.
+        """
+        self.assertFalse(tracemalloc.is_tracing())
+        memory_tracing.acquire()
+        memory_tracing.acquire()
+        memory_tracing.release()
+        self.assertTrue(tracemalloc.is_tracing())
+        memory_tracing.release()
+        self.assertFalse(tracemalloc.is_tracing())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sampled_requests_rotate(self):
+        self.client.force_login(self.user)
+        for _ in range(4):
+            self.client.get(reverse("todolist:index"))
+        self.assertEqual(len(self.view_files("*.prof")), 2)
+
+    def test_profile_summary(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse("todolist:index"), HTTP_X_PROFILE="memory")
+        self.client.get(reverse("todolist:index"), HTTP_X_PROFILE="memory")
+        out = StringIO()
+        call_command("profile_summary", view="todolist.index", limit=5, stdout=out)
+        self.assertIn("todolist.index: 2 profile(s), 2 memory profile(s)", out.getvalue())
+        self.assertIn("function calls", out.getvalue())
+        self.assertIn("Top allocators", out.getvalue())
+
+    def test_profile_summary_without_profiles(self):
+        with self.assertRaises(CommandError):
+            call_command("profile_summary", stdout=StringIO())
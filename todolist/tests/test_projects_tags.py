@@ -0,0 +1,93 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import Project, Tag, Task, TaskTag
+
+def create_tagged_tasks(user, count):
+    project = Project.objects.get_or_create(user=user, name="Work")[0]
+    tags = Tag.for_names(user, ["urgent", "home"])
+    tasks = [Task.objects.create(task_text=f"Task {i}", pub_date=timezone.now(), user=user, project=project) for i in range(count)]
+    TaskTag.objects.bulk_create([TaskTag(task=task, tag=tag) for task in tasks for tag in tags])
+    return tasks
+
+class ProjectTagListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_superuser(username='testuser', password='testpass')
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_index_query_count_is_constant(self):
+        """
+        User, tasks with projects, their tags, and the user's projects and tags; the session comes from the cache.
+        """
+        create_tagged_tasks(self.user, 20)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("todolist:index"))
+        self.assertContains(response, "#urgent", count=20 + 1)
+        self.assertContains(response, "Work")
+
+    def test_index_query_count_does_not_grow(self):
+        create_tagged_tasks(self.user, 1)
+        few = self.count_queries(reverse("todolist:index"))
+        create_tagged_tasks(self.user, 30)
+        self.assertEqual(self.count_queries(reverse("todolist:index")), few)
+
+    def test_admin_query_count_does_not_grow(self):
+        create_tagged_tasks(self.user, 1)
+        url = reverse("admin:todolist_task_changelist")
+        few = self.count_queries(url)
+        create_tagged_tasks(self.user, 30)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_admin_filters_list_own_projects_and_tags(self):
+        tasks = create_tagged_tasks(self.user, 1)
+        other = User.objects.create_user(username='other', password='otherpass')
+        Project.objects.create(user=other, name="Secret project")
+        Tag.objects.create(user=other, name="secret-tag")
+        url = reverse("admin:todolist_task_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, f"?project={tasks[0].project_id}")
+        self.assertContains(response, "urgent")
+        self.assertNotContains(response, "Secret project")
+        self.assertNotContains(response, "secret-tag")
+        Task.objects.create(task_text="Untagged", pub_date=timezone.now(), user=self.user)
+        response = self.client.get(url, {'tags': Tag.objects.get(user=self.user, name="urgent").id})
+        self.assertQuerySetEqual(response.context["cl"].result_list, tasks)
+
+    def test_filter_by_tag(self):
+        tasks = create_tagged_tasks(self.user, 2)
+        Task.objects.create(task_text="Untagged", pub_date=timezone.now(), user=self.user)
+        response = self.client.get(reverse("todolist:index"), {'tag': 'urgent'})
+        self.assertQuerySetEqual(response.context["task_list_today"], tasks)
+
+    def test_filter_by_project(self):
+        tasks = create_tagged_tasks(self.user, 2)
+        Task.objects.create(task_text="No project", pub_date=timezone.now(), user=self.user)
+        response = self.client.get(reverse("todolist:index"), {'project': tasks[0].project_id})
+        self.assertQuerySetEqual(response.context["task_list_today"], tasks)
+
+    def test_create_task_with_project_and_tags(self):
+        self.client.post(reverse("todolist:index"), {'task_text': "Write report", 'project': "Work", 'tags': "urgent, office"})
+        task = Task.objects.get(task_text="Write report")
+        self.assertEqual(task.project.name, "Work")
+        self.assertEqual(sorted(tag.name for tag in task.tags.all()), ["office", "urgent"])
+
+    def test_tags_are_per_user(self):
+        user2 = User.objects.create_user(username='testuser1', password='testpass')
+        Tag.for_names(user2, ["urgent"])
+        self.assertEqual(Tag.for_names(self.user, ["urgent"])[0].user, self.user)
+        self.assertEqual(Tag.objects.filter(name="urgent").count(), 2)
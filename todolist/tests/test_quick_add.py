@@ -0,0 +1,77 @@
+import json
+
+from django.contrib import messages
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import ChangeCounter, Task
+
+class QuickAddTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with one task already in their list.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.task = Task.objects.create(task_text="Existing", pub_date=timezone.now(), user=cls.user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def ordered_texts(self):
+        return list(Task.objects.filter(user=self.user).order_by('rank').values_list('task_text', flat=True))
+
+    def test_one_task_per_line(self):
+        """
+        Blank lines are skipped and the new tasks follow the existing ones in the pasted order.
+        """
+        response = self.client.post(reverse('todolist:index'), {'task_text': "Milk\n\n  Eggs \r\nBread", 'tags': 'shop'})
+        self.assertRedirects(response, reverse('todolist:index'))
+        self.assertEqual(self.ordered_texts(), ["Existing", "Milk", "Eggs", "Bread"])
+        self.assertEqual(Task.objects.filter(tags__name='shop').count(), 3)
+
+    def test_tasks_are_inserted_at_once(self):
+        """
+        Fifty lines are one INSERT of tasks and share one change number.
+        """
+        lines = "\n".join(f"Item {i}" for i in range(50))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todolist:index'), {'task_text': lines})
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "todolist_task"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(set(Task.objects.filter(task_text__startswith='Item').values_list('change_seq', flat=True)), {1})
+        self.assertEqual(ChangeCounter.objects.get(user=self.user).value, 1)
+
+    def test_invalid_lines_are_reported_and_nothing_is_created(self):
+        response = self.client.post(reverse('todolist:index'), {'task_text': f"Fine\n!!!\n{'a' * 256}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message.message for message in messages.get_messages(response.wsgi_request)], [
+            'Line 2: Task must contain at least one letter or number.',
+            'Line 3: Task is too long!',
+        ])
+        self.assertContains(response, 'Fine')
+        self.assertEqual(self.ordered_texts(), ["Existing"])
+
+    @override_settings(QUICK_ADD_MAX_TASKS=3)
+    def test_batch_size_is_limited(self):
+        response = self.client.post(reverse('todolist:index'), {'task_text': "a\nb\nc\nd"})
+        self.assertContains(response, 'You can add at most 3 tasks at once.')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_json_array(self):
+        response = self.client.post(reverse('todolist:index'), json.dumps(["Call mom", "Pay rent"]), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Task.objects.filter(id__in=response.json()['created']).order_by('rank').values_list('task_text', flat=True)),
+            ["Call mom", "Pay rent"],
+        )
+
+    def test_json_errors(self):
+        response = self.client.post(reverse('todolist:index'), json.dumps(["Good", "?"]), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'line': 2, 'message': 'Task must contain at least one letter or number.'}])
+        response = self.client.post(reverse('todolist:index'), json.dumps({'task_text': "Good"}), content_type='application/json')
+        self.assertEqual(response.json()['errors'], [{'line': None, 'message': 'Send a JSON array of task texts.'}])
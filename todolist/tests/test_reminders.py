@@ -0,0 +1,84 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.core import mail
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from todolist.models import Task
+from todolist.reminders import claim_due_reminders, pending_reminders
+
+def create_reminder(user, minutes, text="Pay bills"):
+    now = timezone.now()
+    return Task.objects.create(
+        task_text=text, pub_date=now, user=user,
+        due_at=now + datetime.timedelta(hours=1), remind_at=now + datetime.timedelta(minutes=minutes),
+    )
+
+class ReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass', email='testuser@example.com')
+
+    def test_claim_only_due_reminders(self):
+        due = create_reminder(self.user, -5)
+        create_reminder(self.user, 30)
+        Task.objects.create(task_text="No reminder", pub_date=timezone.now(), user=self.user)
+        self.assertEqual(claim_due_reminders(10), [due])
+        due.refresh_from_db()
+        self.assertIsNotNone(due.reminder_sent_at)
+
+    def test_claimed_reminders_are_not_claimed_again(self):
+        create_reminder(self.user, -5)
+        self.assertEqual(len(claim_due_reminders(10)), 1)
+        self.assertEqual(claim_due_reminders(10), [])
+
+    def test_claim_respects_batch_size(self):
+        for i in range(5):
+            create_reminder(self.user, -i)
+        self.assertEqual(len(claim_due_reminders(2)), 2)
+        self.assertEqual(pending_reminders(timezone.now()).count(), 3)
+
+    def test_pending_reminders_use_partial_index(self):
+        """
+        The polling query is answered from the partial index rather than a table scan.
+        """
+        create_reminder(self.user, -5)
+        plan = pending_reminders(timezone.now()).explain()
+        self.assertIn("task_pending_reminder_idx", plan)
+
+    def test_run_reminders_sends_emails_in_batches(self):
+        for i in range(5):
+            create_reminder(self.user, -i, text=f"Task {i}")
+        out = StringIO()
+        with mock.patch("todolist.reminders.get_connection", wraps=mail.get_connection) as get_connection:
+            call_command("run_reminders", once=True, batch_size=2, stdout=out)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(mail.outbox[0].to, ['testuser@example.com'])
+        self.assertIn("5 reminder(s) in 3 batch(es)", out.getvalue())
+        self.assertFalse(pending_reminders(timezone.now()).exists())
+
+    def test_failed_delivery_is_requeued(self):
+        create_reminder(self.user, -5)
+        err = StringIO()
+        with mock.patch("todolist.management.commands.run_reminders.deliver_reminders", side_effect=OSError("down")), \
+                mock.patch("todolist.management.commands.run_reminders.time.sleep", side_effect=KeyboardInterrupt):
+            call_command("run_reminders", stdout=StringIO(), stderr=err)
+        self.assertIn("requeued", err.getvalue())
+        self.assertEqual(pending_reminders(timezone.now()).count(), 1)
+
+    def test_create_task_with_reminder(self):
+        self.client.login(username='testuser', password='testpass')
+        self.client.post(reverse("todolist:index"), {
+            'task_text': "Call mom", 'due_at': "2030-01-01T18:00", 'remind_at': "2030-01-01T17:30",
+        })
+        task = Task.objects.get(task_text="Call mom")
+        self.assertEqual(task.remind_at, timezone.make_aware(datetime.datetime(2030, 1, 1, 17, 30)))
+        self.assertIsNone(task.reminder_sent_at)
@@ -0,0 +1,98 @@
+import time
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from todolist.models import Task
+from todolist.routers import PIN_SESSION_KEY, ReplicaRouter
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(TestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        The same user exists on both databases, as it would on a real replica.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        User.objects.using('replica').create(id=cls.user.id, username='testuser', password=cls.user.password)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_reads_go_to_replica(self):
+        """
+        Task and User reads are served by the replica, everything else stays on the primary.
+        """
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Task), 'replica')
+        self.assertEqual(router.db_for_read(User), 'replica')
+        self.assertIsNone(router.db_for_read(Session))
+
+    def test_writes_go_to_primary(self):
+        """
+        Writes are always sent to the primary.
+        """
+        self.assertEqual(ReplicaRouter().db_for_write(Task), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """
+        Without replicas every read goes to the primary.
+        """
+        self.assertEqual(ReplicaRouter().db_for_read(Task), 'default')
+
+    def test_index_reads_from_replica(self):
+        """
+        The index view lists the tasks stored on the replica.
+        """
+        Task.objects.using('replica').create(task_text="Replica task", pub_date=timezone.now(), user_id=self.user.id)
+        response = self.client.get(reverse("todolist:index"))
+        self.assertContains(response, "Replica task")
+
+    def test_read_your_writes_after_create(self):
+        """
+        After creating a task the user's reads are pinned to the primary, so the new task is listed
+        even though the replica has not caught up.
+        """
+        self.client.post(reverse("todolist:index"), {'task_text': "Fresh task"})
+        self.assertTrue(Task.objects.using('default').filter(task_text="Fresh task").exists())
+        self.assertFalse(Task.objects.using('replica').filter(task_text="Fresh task").exists())
+        response = self.client.get(reverse("todolist:index"))
+        self.assertContains(response, "Fresh task")
+
+    def test_read_your_writes_after_update(self):
+        """
+        update_task reads and writes on the primary and pins the following reads.
+        """
+        task = Task.objects.using('default').create(task_text="Primary task", pub_date=timezone.now(), user=self.user)
+        response = self.client.post(reverse('todolist:update_task'), {'task_id': task.id, 'done': 'true'})
+        self.assertEqual(response.status_code, 200)
+        task.refresh_from_db(using='default')
+        self.assertTrue(task.done)
+        self.assertGreater(self.client.session[PIN_SESSION_KEY], time.time())
+
+    def test_read_your_writes_after_register(self):
+        """
+        A new user is read from the primary right after registering, before the replica has them.
+        """
+        self.client.logout()
+        response = self.client.post(reverse('todolist:register'), {
+            'username': 'newuser', 'password1': 'Newpass123!', 'password2': 'Newpass123!',
+        }, follow=True)
+        self.assertEqual(response.request['PATH_INFO'], reverse('todolist:index'))
+        self.assertEqual(response.context['user'].username, 'newuser')
+
+    def test_pin_expires(self):
+        """
+        Once the window is over reads go back to the replica.
+        """
+        self.client.post(reverse("todolist:index"), {'task_text': "Fresh task"})
+        session = self.client.session
+        session[PIN_SESSION_KEY] = time.time() - 1
+        session.save()
+        response = self.client.get(reverse("todolist:index"))
+        self.assertNotContains(response, "Fresh task")
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+PRINT_SETTINGS = """
+import json
+from django.conf import settings
+print(json.dumps({
+    'debug': settings.DEBUG,
+    'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+    'health_checks': settings.DATABASES['default']['CONN_HEALTH_CHECKS'],
+    'first_middleware': settings.MIDDLEWARE[0],
+    'loaders': settings.TEMPLATES[0]['OPTIONS'].get('loaders'),
+    'cache': settings.CACHES['default']['BACKEND'],
+}))
+"""
+
+def load_settings(**environ):
+    """Import the settings in a fresh interpreter with the given environment."""
+    env = {key: value for key, value in os.environ.items() if not key.startswith('DJANGO_')}
+    env.update(DJANGO_SETTINGS_MODULE='firstproject.settings', **environ)
+    return subprocess.run(
+        [sys.executable, '-c', PRINT_SETTINGS], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+
+class SettingsProfileTests(TestCase):
+    def test_tests_use_test_profile(self):
+        """
+        manage.py test selects the test layer: in-memory databases and synchronous audit writes.
+        """
+        self.assertEqual(settings.DATABASES['default']['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertFalse(settings.AUDIT_ASYNC)
+
+    def test_prod_profile(self):
+        """
+        The prod layer keeps connections open, caches templates and compresses responses.
+        """
+        result = load_settings(DJANGO_ENV='prod', SECRET_KEY='not-so-secret', ALLOWED_HOSTS='example.com')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        values = json.loads(result.stdout)
+        self.assertFalse(values['debug'])
+        self.assertEqual(values['conn_max_age'], 600)
+        self.assertTrue(values['health_checks'])
+        self.assertEqual(values['first_middleware'], 'django.middleware.gzip.GZipMiddleware')
+        self.assertEqual(values['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertEqual(values['cache'], 'django.core.cache.backends.filebased.FileBasedCache')
+
+    def test_prod_requires_secret_key(self):
+        result = load_settings(DJANGO_ENV='prod', ALLOWED_HOSTS='example.com')
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('SECRET_KEY', result.stderr)
+
+    def test_dev_profile(self):
+        result = load_settings(DJANGO_ENV='dev')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        values = json.loads(result.stdout)
+        self.assertTrue(values['debug'])
+        self.assertEqual(values['conn_max_age'], 0)
+
+    def test_unknown_profile(self):
+        result = load_settings(DJANGO_ENV='staging')
+        self.assertIn('DJANGO_ENV must be dev, test or prod', result.stderr)
+
+    def test_benchmark_requests(self):
+        out = StringIO()
+        call_command('benchmark_requests', '--path', '/register/', '--requests', '3', '--warmup', '0', stdout=out)
+        self.assertIn('GET /register/ -> 200 OK', out.getvalue())
+        self.assertIn('requests/s', out.getvalue())
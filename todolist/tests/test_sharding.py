@@ -0,0 +1,146 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import ShardAssignment, Tag, Task, TaskTag
+from todolist.sharding import ShardRouter, hashed_shard, shard_for
+
+@override_settings(TASK_SHARDS=['shard_0', 'shard_1'])
+class ShardingTests(TestCase):
+    databases = {'default', 'shard_0', 'shard_1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Users live on the default database, their tasks on the shard their id hashes to.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.staff = User.objects.create_superuser(username='staff', password='staffpass')
+
+    def setUp(self):
+        self.shard = hashed_shard(self.user.id)
+        self.other_shard = 'shard_1' if self.shard == 'shard_0' else 'shard_0'
+
+    def test_shard_is_hashed_from_user_id(self):
+        """
+        Without an assignment the user's shard is stable and one of TASK_SHARDS.
+        """
+        self.assertIn(self.shard, ['shard_0', 'shard_1'])
+        self.assertEqual(shard_for(self.user), self.shard)
+        self.assertEqual(shard_for(self.user.id), self.shard)
+
+    def test_assignment_overrides_hash(self):
+        """
+        A ShardAssignment row moves the user away from the hashed shard.
+        """
+        ShardAssignment.objects.create(user=self.user, alias=self.other_shard)
+        self.assertEqual(shard_for(User.objects.get(id=self.user.id)), self.other_shard)
+
+    @override_settings(TASK_SHARDS=[])
+    def test_sharding_disabled(self):
+        """
+        With no shards configured the normal routing applies.
+        """
+        self.assertIsNone(shard_for(self.user))
+        self.assertIsNone(ShardRouter().db_for_write(Task, instance=Task(user_id=self.user.id)))
+
+    def test_new_task_is_saved_on_user_shard(self):
+        """
+        Tasks created from the index land on the user's shard only.
+        """
+        self.client.login(username='testuser', password='testpass')
+        self.client.post(reverse('todolist:index'), {'task_text': 'Sharded task', 'tags': 'home'})
+        task = Task.objects.using(self.shard).get(task_text='Sharded task')
+        self.assertFalse(Task.objects.using(self.other_shard).exists())
+        self.assertTrue(TaskTag.objects.using(self.shard).filter(task=task, tag__name='home').exists())
+
+    def test_index_and_update_use_user_shard(self):
+        """
+        The index lists and update_task edits the task stored on the user's shard.
+        """
+        task = Task.objects.using(self.shard).create(task_text="On shard", pub_date=timezone.now(), user_id=self.user.id)
+        self.client.login(username='testuser', password='testpass')
+        self.assertContains(self.client.get(reverse('todolist:index')), "On shard")
+        response = self.client.post(
+            reverse('todolist:update_task'),
+            {'task_id': task.id, 'task_text': 'Edited on shard'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 200)
+        task.refresh_from_db()
+        self.assertEqual(task.task_text, 'Edited on shard')
+
+    def test_frozen_user_cannot_write(self):
+        """
+        While a user's tasks are being moved, writes are refused with a 503.
+        """
+        task = Task.objects.using(self.shard).create(task_text="Frozen", pub_date=timezone.now(), user_id=self.user.id)
+        ShardAssignment.objects.create(user=self.user, alias=self.shard, frozen=True)
+        self.client.login(username='testuser', password='testpass')
+        response = self.client.post(
+            reverse('todolist:update_task'),
+            {'task_id': task.id, 'task_text': 'Changed'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 503)
+        task.refresh_from_db()
+        self.assertEqual(task.task_text, 'Frozen')
+
+    def test_write_in_flight_when_frozen_is_rolled_back(self):
+        """
+        A write that passed the up-front check before the freeze is refused once it holds the change counter.
+        """
+        task = Task.objects.using(self.shard).create(task_text="Frozen", pub_date=timezone.now(), user_id=self.user.id)
+        ShardAssignment.objects.create(user=self.user, alias=self.shard, frozen=True)
+        self.client.login(username='testuser', password='testpass')
+        with mock.patch('todolist.views.is_frozen', return_value=False):
+            response = self.client.post(
+                reverse('todolist:update_task'), {'task_id': task.id, 'done': 'true'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+            self.assertEqual(response.status_code, 503)
+            response = self.client.post(reverse('todolist:index'), {'task_text': 'Late task'}, follow=True)
+        self.assertContains(response, 'Your tasks are being moved')
+        task.refresh_from_db()
+        self.assertFalse(task.done)
+        self.assertFalse(Task.objects.using(self.shard).filter(task_text='Late task').exists())
+
+    def test_admin_lists_tasks_of_staff_shard(self):
+        """
+        The admin task list reads from the shard of the logged-in staff user.
+        """
+        Task.objects.using(hashed_shard(self.staff.id)).create(task_text="Admin task", pub_date=timezone.now(), user_id=self.staff.id)
+        self.client.login(username='staff', password='staffpass')
+        self.assertContains(self.client.get(reverse('admin:todolist_task_changelist')), "Admin task")
+
+    def test_rebalance_shard_moves_tasks(self):
+        """
+        rebalance_shard copies the user's tasks and tags to the target, flips the assignment and
+        removes the originals.
+        """
+        tag = Tag.objects.using(self.shard).create(user_id=self.user.id, name='work')
+        for i in range(3):
+            task = Task.objects.using(self.shard).create(task_text=f"Task {i}", pub_date=timezone.now(), user_id=self.user.id)
+            TaskTag.objects.using(self.shard).create(task=task, tag=tag)
+        out = StringIO()
+        call_command('rebalance_shard', 'testuser', self.other_shard, '--batch-size', '2', stdout=out)
+
+        self.assertIn('Moved 3 task(s)', out.getvalue())
+        self.assertFalse(Task.objects.using(self.shard).exists())
+        self.assertFalse(Tag.objects.using(self.shard).exists())
+        moved = Task.objects.using(self.other_shard).filter(user_id=self.user.id)
+        self.assertEqual(sorted(moved.values_list('task_text', flat=True)), ['Task 0', 'Task 1', 'Task 2'])
+        self.assertEqual(TaskTag.objects.using(self.other_shard).filter(tag__name='work').count(), 3)
+        assignment = ShardAssignment.objects.get(user=self.user)
+        self.assertEqual((assignment.alias, assignment.frozen), (self.other_shard, False))
+
+    def test_rebalance_waits_for_writes_before_copying(self):
+        steps = []
+        command = 'todolist.management.commands.rebalance_shard'
+        with mock.patch(f'{command}.wait_for_writes', side_effect=lambda user, database: steps.append(('wait', database))), \
+                mock.patch(f'{command}.copy_user_data', side_effect=lambda user, source, *args: steps.append(('copy', source)) or 0):
+            call_command('rebalance_shard', 'testuser', self.other_shard, stdout=StringIO())
+        self.assertEqual(steps, [('wait', self.shard), ('copy', self.shard)])
@@ -0,0 +1,96 @@
+import subprocess
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.core.management import CommandError, call_command
+from todolist.management.commands.startup_profile import parse_importtime
+
+class StartupCommandTests(TestCase):
+    databases = {'default', 'shard_0', 'shard_1'}
+
+    def test_skips_migrate_when_schema_is_current(self):
+        """
+        The test database is fully migrated, so startup must not run migrate.
+        """
+        out = StringIO()
+        with mock.patch("todolist.management.commands.startup.call_command") as migrate:
+            call_command("startup", stdout=out)
+        migrate.assert_not_called()
+        self.assertIn("skipping migrate", out.getvalue())
+
+    def test_runs_migrate_when_migrations_are_pending(self):
+        """
+        With a pending migration in the plan, startup delegates to migrate.
+        """
+        out = StringIO()
+        with mock.patch("django.db.migrations.executor.MigrationExecutor.migration_plan", return_value=[("todolist", False)]), \
+                mock.patch("todolist.management.commands.startup.call_command") as migrate:
+            call_command("startup", stdout=out)
+        migrate.assert_called_once()
+        self.assertIn("1 migration(s) pending", out.getvalue())
+
+    @override_settings(TASK_SHARDS=['shard_0', 'shard_1'])
+    def test_migrates_every_task_shard(self):
+        """
+        The task shards are checked and migrated along with the default database.
+        """
+        with mock.patch("django.db.migrations.executor.MigrationExecutor.migration_plan", return_value=[("todolist", False)]), \
+                mock.patch("todolist.management.commands.startup.call_command") as migrate:
+            call_command("startup", stdout=StringIO())
+        self.assertEqual(
+            [call.kwargs["database"] for call in migrate.call_args_list], ['default', 'shard_0', 'shard_1'],
+        )
+
+    @override_settings(DEBUG=False)
+    def test_serve_runs_the_server_in_process(self):
+        """
+        --serve loads the URLconf, then runs the server from the same process.
+        """
+        with mock.patch("todolist.management.commands.startup.get_resolver") as get_resolver, \
+                mock.patch("todolist.management.commands.startup.call_command") as runserver:
+            call_command("startup", serve="0.0.0.0:8000", stdout=StringIO())
+        get_resolver.assert_called_once()
+        runserver.assert_called_once_with("runserver", "0.0.0.0:8000", use_reloader=False)
+
+    def test_reloader_child_skips_the_migration_check(self):
+        """
+        The reloader's child process serves without checking migrations again.
+        """
+        with mock.patch.dict("os.environ", {"RUN_MAIN": "true"}), \
+                mock.patch("django.db.migrations.executor.MigrationExecutor.migration_plan") as plan, \
+                mock.patch("todolist.management.commands.startup.call_command") as runserver:
+            call_command("startup", serve="8000", stdout=StringIO())
+        plan.assert_not_called()
+        self.assertEqual([call.args[0] for call in runserver.call_args_list], ["runserver"])
+
+class StartupProfileTests(TestCase):
+    def test_parse_importtime(self):
+        """
+        Header and malformed lines are ignored, module names are stripped of nesting.
+        """
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      1500 |       2000 | django.conf\n"
+            "Traceback (most recent call last):\n"
+        )
+        self.assertEqual(parse_importtime(output), [("_io", 120, 120), ("django.conf", 1500, 2000)])
+
+    def test_reports_modules(self):
+        """
+        The command lists the imported modules and a total.
+        """
+        out = StringIO()
+        call_command("startup_profile", module="todolist.routers", limit=50, stdout=out)
+        self.assertIn("todolist.routers", out.getvalue())
+        self.assertIn("modules imported in", out.getvalue())
+
+    def test_failure_without_output(self):
+        """
+        A child that dies without writing to stderr still gives a readable error.
+        """
+        result = subprocess.CompletedProcess([], returncode=-9, stdout="", stderr="")
+        with mock.patch("todolist.management.commands.startup_profile.subprocess.run", return_value=result), \
+                self.assertRaisesMessage(CommandError, "exit status -9"):
+            call_command("startup_profile", stdout=StringIO())
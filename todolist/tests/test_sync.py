@@ -0,0 +1,125 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import ChangeCounter, Task, TaskTombstone
+from todolist.reminders import claim_due_reminders
+
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A user with two tasks created before change tracking, and another user.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.other_user = User.objects.create_user(username='otheruser', password='otherpass')
+        cls.tasks = [Task.objects.create(task_text=f"Task {i}", pub_date=timezone.now(), user=cls.user) for i in range(2)]
+        Task.objects.create(task_text="Other", pub_date=timezone.now(), user=cls.other_user)
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def sync(self, **params):
+        return self.client.get(reverse('todolist:sync'), params).json()
+
+    def update(self, **data):
+        return self.client.post(reverse('todolist:update_task'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_full_sync_without_cursor(self):
+        data = self.sync()
+        self.assertEqual(sorted(task['task_text'] for task in data['tasks']), ["Task 0", "Task 1"])
+        self.assertEqual(data['cursor'], 0)
+        self.assertFalse(data['has_more'])
+
+    def test_changes_since_cursor(self):
+        """
+        Only tasks created, edited or deleted after the cursor are returned.
+        """
+        cursor = self.sync()['cursor']
+        self.client.post(reverse('todolist:index'), {'task_text': 'New task'})
+        self.update(task_id=self.tasks[0].id, task_text='Edited')
+        self.update(task_id=self.tasks[1].id, delete='true')
+
+        data = self.sync(since=cursor)
+        self.assertEqual(sorted(task['task_text'] for task in data['tasks']), ['Edited', 'New task'])
+        self.assertEqual(data['deleted'], [self.tasks[1].id])
+        self.assertEqual(data['cursor'], 3)
+        self.assertEqual(self.sync(since=data['cursor']), {
+            'status': 'success', 'cursor': 3, 'has_more': False, 'tasks': [], 'deleted': [],
+        })
+
+    def test_moves_and_bulk_actions_are_tracked(self):
+        cursor = self.sync()['cursor']
+        self.client.post(reverse('todolist:move_task'), {'task_id': self.tasks[1].id, 'after_id': self.tasks[0].id})
+        self.assertEqual([task['id'] for task in self.sync(since=cursor)['tasks']], [self.tasks[1].id])
+        cursor = self.sync(since=cursor)['cursor']
+        self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done'})
+        self.assertEqual(len(self.sync(since=cursor)['tasks']), 2)
+
+    def test_admin_edits_and_deletes_are_tracked(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        cursor = self.sync()['cursor']
+        task = self.tasks[0]
+        self.client.post(reverse('admin:todolist_task_change', args=[task.id]), {
+            'task_text': 'Edited in admin', 'pub_date_0': '2024-01-01', 'pub_date_1': '10:00:00',
+            'user': self.user.id, 'rank': task.rank, 'change_seq': 0,
+        })
+        self.client.post(reverse('admin:todolist_task_changelist'), {
+            'action': 'delete_selected', '_selected_action': [self.tasks[1].id], 'post': 'yes',
+        })
+        data = self.sync(since=cursor)
+        self.assertEqual([task['task_text'] for task in data['tasks']], ['Edited in admin'])
+        self.assertEqual(data['deleted'], [self.tasks[1].id])
+
+    def test_rank_rebalancing_and_reminders_are_tracked(self):
+        cursor = self.sync()['cursor']
+        Task.objects.filter(id=self.tasks[0].id).update(rank='z' * 20)
+        call_command('rebalance_ranks', stdout=StringIO())
+        data = self.sync(since=cursor)
+        self.assertEqual(sorted(task['id'] for task in data['tasks']), [task.id for task in self.tasks])
+        cursor = data['cursor']
+        Task.objects.filter(id=self.tasks[1].id).update(remind_at=timezone.now())
+        claim_due_reminders(10)
+        self.assertEqual([task['id'] for task in self.sync(since=cursor)['tasks']], [self.tasks[1].id])
+
+    def test_pages_never_split_a_change(self):
+        """
+        With a limit, the cursor stops between changes; one change larger than the limit comes whole.
+        """
+        self.client.post(reverse('todolist:index'), {'bulk_action': 'mark_done'})
+        for i in range(3):
+            self.client.post(reverse('todolist:index'), {'task_text': f'New {i}'})
+        first = self.sync(since=0, limit=1)
+        self.assertEqual(len(first['tasks']), 2)
+        self.assertEqual(first['cursor'], 1)
+        self.assertTrue(first['has_more'])
+        second = self.sync(since=first['cursor'], limit=2)
+        self.assertEqual([task['task_text'] for task in second['tasks']], ['New 0', 'New 1'])
+        self.assertTrue(second['has_more'])
+
+    def test_other_users_changes_are_not_returned(self):
+        self.client.login(username='otheruser', password='otherpass')
+        self.assertEqual([task['task_text'] for task in self.sync()['tasks']], ['Other'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('todolist:sync'), {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pruned_cursor_must_reset(self):
+        """
+        Once tombstones are pruned, clients with an older cursor are told to reload.
+        """
+        self.update(task_id=self.tasks[0].id, delete='true')
+        TaskTombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=40))
+        out = StringIO()
+        call_command('prune_tombstones', '--days', '30', stdout=out)
+        self.assertIn('pruned 1 tombstone(s)', out.getvalue())
+        self.assertEqual(ChangeCounter.objects.get(user=self.user).pruned_through, 1)
+        response = self.client.get(reverse('todolist:sync'), {'since': 0})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self.sync(since=1)['status'], 'success')
@@ -0,0 +1,151 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from django.contrib.auth.models import User
+from todolist.models import ListMembership, Task, TaskList
+from todolist.sharding import hashed_shard
+
+class TaskListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        A list owned by testuser, shared with an editor and a viewer, plus an outsider.
+        """
+        cls.owner = User.objects.create_user(username='testuser', password='testpass')
+        cls.editor = User.objects.create_user(username='editor', password='editorpass')
+        cls.viewer = User.objects.create_user(username='viewer', password='viewerpass')
+        cls.outsider = User.objects.create_user(username='outsider', password='outsiderpass')
+        cls.task_list = TaskList.objects.create(user=cls.owner, name='Groceries')
+        ListMembership.objects.create(task_list=cls.task_list, user=cls.owner, role=ListMembership.OWNER)
+        ListMembership.objects.create(task_list=cls.task_list, user=cls.editor, role=ListMembership.EDITOR)
+        ListMembership.objects.create(task_list=cls.task_list, user=cls.viewer, role=ListMembership.VIEWER)
+        cls.task = Task.objects.create(task_text="Milk", pub_date=timezone.now(), user=cls.owner, task_list=cls.task_list)
+
+    def list_url(self):
+        return reverse('todolist:task_list', args=[self.task_list.id])
+
+    def update(self, **data):
+        return self.client.post(reverse('todolist:update_task'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_create_list(self):
+        self.client.login(username='outsider', password='outsiderpass')
+        response = self.client.post(reverse('todolist:task_lists'), {'name': 'Chores'})
+        task_list = TaskList.objects.get(name='Chores')
+        self.assertRedirects(response, reverse('todolist:task_list', args=[task_list.id]))
+        self.assertEqual(ListMembership.objects.get(task_list=task_list).role, ListMembership.OWNER)
+
+    def test_members_see_the_list(self):
+        self.client.login(username='viewer', password='viewerpass')
+        self.assertContains(self.client.get(reverse('todolist:task_lists')), 'Groceries')
+        response = self.client.get(self.list_url())
+        self.assertContains(response, 'Milk')
+        self.assertNotContains(response, 'contenteditable')
+
+    def test_outsider_gets_404(self):
+        self.client.login(username='outsider', password='outsiderpass')
+        self.assertEqual(self.client.get(self.list_url()).status_code, 404)
+
+    def test_list_tasks_are_not_personal_tasks(self):
+        """
+        Tasks of a shared list are shown on the list, not on the index of whoever added them.
+        """
+        self.client.login(username='testuser', password='testpass')
+        self.assertNotContains(self.client.get(reverse('todolist:index')), 'Milk')
+
+    def test_editor_adds_and_edits_tasks(self):
+        self.client.login(username='editor', password='editorpass')
+        self.client.post(self.list_url(), {'task_text': 'Bread'})
+        self.assertTrue(Task.objects.filter(task_list=self.task_list, task_text='Bread', user=self.editor).exists())
+        response = self.update(task_id=self.task.id, list_id=str(self.task_list.id), task_text='Oat milk')
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.task_text, 'Oat milk')
+
+    def test_viewer_cannot_edit(self):
+        self.client.login(username='viewer', password='viewerpass')
+        response = self.update(task_id=self.task.id, list_id=str(self.task_list.id), done='true')
+        self.assertEqual(response.status_code, 403)
+        self.client.post(self.list_url(), {'task_text': 'Bread'})
+        self.assertFalse(Task.objects.filter(task_text='Bread').exists())
+
+    def test_outsider_cannot_edit(self):
+        self.client.login(username='outsider', password='outsiderpass')
+        response = self.update(task_id=self.task.id, list_id=str(self.task_list.id), task_text='Beer')
+        self.assertEqual(response.status_code, 403)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.task_text, 'Milk')
+
+    def test_permission_is_checked_in_the_task_query(self):
+        """
+        Loading the task and checking the membership is one SELECT on todolist_task.
+        """
+        self.client.login(username='editor', password='editorpass')
+        with CaptureQueriesContext(connection) as queries:
+            self.update(task_id=self.task.id, list_id=str(self.task_list.id), done='true')
+        selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'FROM "todolist_task"' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('todolist_listmembership', selects[0])
+
+    def test_owner_shares_list(self):
+        self.client.login(username='testuser', password='testpass')
+        self.client.post(self.list_url(), {'username': 'outsider', 'role': ListMembership.VIEWER})
+        self.assertEqual(ListMembership.objects.get(task_list=self.task_list, user=self.outsider).role, ListMembership.VIEWER)
+
+    def test_only_owner_shares(self):
+        self.client.login(username='editor', password='editorpass')
+        response = self.client.post(self.list_url(), {'username': 'outsider'})
+        self.assertContains(response, 'Only the owner can share this list.')
+        self.assertFalse(ListMembership.objects.filter(user=self.outsider).exists())
+
+@override_settings(TASK_SHARDS=['shard_0', 'shard_1'])
+class ShardedTaskListTests(TestCase):
+    databases = {'default', 'shard_0', 'shard_1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Two users whose own tasks are on different shards.
+        """
+        users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(10)]
+        cls.owner = users[0]
+        cls.member = next(user for user in users if hashed_shard(user.id) != hashed_shard(cls.owner.id))
+        cls.shard = hashed_shard(cls.owner.id)
+
+    def test_list_lives_on_owner_shard(self):
+        """
+        A member's tasks and memberships of someone else's list are stored on the list owner's shard.
+        """
+        self.client.login(username='user0', password='testpass')
+        self.client.post(reverse('todolist:task_lists'), {'name': 'Team'})
+        task_list = TaskList.objects.using(self.shard).get(name='Team')
+        self.client.post(reverse('todolist:task_list', args=[task_list.id]), {'username': self.member.username})
+
+        self.client.login(username=self.member.username, password='testpass')
+        self.assertContains(self.client.get(reverse('todolist:task_lists')), 'Team')
+        self.client.post(reverse('todolist:task_list', args=[task_list.id]), {'task_text': 'Shared task'})
+        task = Task.objects.using(self.shard).get(task_text='Shared task')
+        self.assertEqual(task.user_id, self.member.id)
+
+        response = self.client.post(
+            reverse('todolist:update_task'),
+            {'task_id': task.id, 'list_id': str(task_list.id), 'done': 'true'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 200)
+        task.refresh_from_db()
+        self.assertTrue(task.done)
+
+    def test_rebalance_moves_owned_lists(self):
+        task_list = TaskList.objects.using(self.shard).create(user=self.owner, name='Team')
+        ListMembership.objects.using(self.shard).create(task_list=task_list, user=self.owner, role=ListMembership.OWNER)
+        Task.objects.using(self.shard).create(task_text="Member task", pub_date=timezone.now(), user=self.member, task_list=task_list)
+        other = 'shard_1' if self.shard == 'shard_0' else 'shard_0'
+        call_command('rebalance_shard', 'user0', other, stdout=StringIO())
+        self.assertFalse(TaskList.objects.using(self.shard).exists())
+        self.assertTrue(Task.objects.using(other).filter(task_list_id=task_list.id, task_text="Member task").exists())
+        self.assertTrue(ListMembership.objects.using(other).filter(task_list_id=task_list.id).exists())
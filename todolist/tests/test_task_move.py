@@ -0,0 +1,124 @@
+import random
+from io import StringIO
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from django.urls import reverse
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from todolist.models import Task
+from todolist.ranking import rank_between, rank_after, spread_ranks
+
+class RankingTests(TestCase):
+    def test_rank_between_sorts_between(self):
+        """
+        Random inserts always produce a key strictly between its neighbours.
+        """
+        keys = [rank_between()]
+        rng = random.Random(0)
+        for _ in range(500):
+            i = rng.randint(0, len(keys))
+            before = keys[i - 1] if i > 0 else ''
+            after = keys[i] if i < len(keys) else ''
+            key = rank_between(before, after)
+            self.assertTrue(before < key and (not after or key < after))
+            self.assertFalse(key.endswith('0'))
+            keys.insert(i, key)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_rank_between_rejects_unordered_bounds(self):
+        with self.assertRaises(ValueError):
+            rank_between('b', 'a')
+
+    def test_rank_after_grows_slowly(self):
+        """
+        A thousand appends stay within the fixed rank width.
+        """
+        key = rank_after('')
+        for _ in range(1000):
+            new_key = rank_after(key)
+            self.assertGreater(new_key, key)
+            key = new_key
+        self.assertLessEqual(len(key), 6)
+
+    def test_spread_ranks(self):
+        keys = spread_ranks(100)
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), 100)
+        self.assertTrue(all(k and not k.endswith('0') for k in keys))
+
+class TaskMoveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up data that will be shared across all tests in this class.
+        """
+        cls.user = User.objects.create_user(username='testuser', password='testpass')
+        cls.tasks = [Task.objects.create(task_text=f"Task {i}", pub_date=timezone.now(), user=cls.user) for i in range(3)]
+
+    def setUp(self):
+        self.client.login(username='testuser', password='testpass')
+
+    def listed_texts(self):
+        response = self.client.get(reverse("todolist:index"))
+        return [task.task_text for task in response.context["task_list_today"]]
+
+    def test_new_tasks_are_appended(self):
+        self.assertEqual(self.listed_texts(), ["Task 0", "Task 1", "Task 2"])
+
+    def test_move_to_top(self):
+        response = self.client.post(reverse('todolist:move_task'), {'task_id': self.tasks[2].id, 'after_id': self.tasks[0].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.listed_texts(), ["Task 2", "Task 0", "Task 1"])
+
+    def test_move_to_the_edge_of_a_page(self):
+        """
+        The page shows some tasks only, so a task dropped first or last stays next to its neighbour there.
+        """
+        with self.settings(INDEX_PAGE_SIZE=1):
+            self.client.post(reverse('todolist:move_task'), {'task_id': self.tasks[0].id, 'after_id': self.tasks[2].id})
+            self.assertEqual(self.listed_texts(), ["Task 1"])
+        self.assertEqual(self.listed_texts(), ["Task 1", "Task 0", "Task 2"])
+        self.client.post(reverse('todolist:move_task'), {'task_id': self.tasks[2].id, 'before_id': self.tasks[1].id})
+        self.assertEqual(self.listed_texts(), ["Task 1", "Task 2", "Task 0"])
+
+    def test_move_between_writes_one_row(self):
+        """
+        Moving a task is one read of the neighbours and one UPDATE of the moved row.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('todolist:move_task'), {
+                'task_id': self.tasks[0].id, 'before_id': self.tasks[1].id, 'after_id': self.tasks[2].id,
+            })
+        task_queries = [q['sql'] for q in queries if '"todolist_task"' in q['sql']]
+        self.assertEqual(len(task_queries), 2)
+        self.assertTrue(task_queries[1].startswith('UPDATE'))
+        self.assertEqual(self.listed_texts(), ["Task 1", "Task 0", "Task 2"])
+        ranks = dict(Task.objects.values_list('id', 'rank'))
+        self.assertEqual(ranks[self.tasks[1].id], self.tasks[1].rank)
+        self.assertEqual(ranks[self.tasks[2].id], self.tasks[2].rank)
+
+    def test_move_with_stale_neighbours(self):
+        response = self.client.post(reverse('todolist:move_task'), {
+            'task_id': self.tasks[0].id, 'before_id': self.tasks[2].id, 'after_id': self.tasks[1].id,
+        })
+        self.assertEqual(response.status_code, 409)
+
+    def test_cannot_move_other_users_task(self):
+        user2 = User.objects.create_user(username='testuser1', password='testpass')
+        task2 = Task.objects.create(task_text='Other task', pub_date=timezone.now(), user=user2)
+        response = self.client.post(reverse('todolist:move_task'), {'task_id': task2.id, 'after_id': self.tasks[0].id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebalance_ranks(self):
+        """
+        Long keys are respaced without changing the order.
+        """
+        Task.objects.filter(id=self.tasks[1].id).update(rank=self.tasks[0].rank + '00000zzzzzzzzz')
+        out = StringIO()
+        call_command('rebalance_ranks', max_length=12, stdout=out)
+        self.assertIn("Rebalanced 1 user(s)", out.getvalue())
+        self.assertTrue(all(len(rank) <= 12 for rank in Task.objects.values_list('rank', flat=True)))
+        self.assertEqual(self.listed_texts(), ["Task 0", "Task 1", "Task 2"])
@@ -0,0 +1,67 @@
+import datetime
+import zoneinfo
+
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Profile
+
+TIMEZONE_SESSION_KEY = "user_timezone"
+
+
+def get_zone(name):
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return datetime.timezone.utc
+
+
+def day_bounds(day, tz=None):
+    """Return the UTC [start, end) range of a local calendar day, so lookups can use an index."""
+    tz = tz or timezone.get_current_timezone()
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=tz)
+    end = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz)
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+
+
+def month_bounds(year, month, tz=None):
+    """Return the UTC [start, end) range of a local calendar month."""
+    first = datetime.date(year, month, 1)
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return day_bounds(first, tz)[0], day_bounds(next_month, tz)[0]
+
+
+def set_user_timezone(request, name):
+    Profile.objects.update_or_create(user=request.user, defaults={"timezone": name})
+    request.session[TIMEZONE_SESSION_KEY] = name
+    timezone.activate(get_zone(name))
+
+
+@receiver(user_logged_in)
+def remember_timezone(sender, request, user, **kwargs):
+    """Keep the user's timezone in the session so requests don't have to query it."""
+    if request is not None and hasattr(request, "session"):
+        name = Profile.objects.filter(user=user).values_list("timezone", flat=True).first() or "UTC"
+        request.session[TIMEZONE_SESSION_KEY] = name
+
+
+class UserTimezoneMiddleware:
+    """Activate the logged-in user's timezone, looked up once and then kept in the session."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            name = request.session.get(TIMEZONE_SESSION_KEY)
+            if name is None:
+                name = Profile.objects.filter(user=request.user).values_list("timezone", flat=True).first() or "UTC"
+                request.session[TIMEZONE_SESSION_KEY] = name
+            timezone.activate(get_zone(name))
+        else:
+            timezone.deactivate()
+        try:
+            return self.get_response(request)
+        finally:
+            timezone.deactivate()
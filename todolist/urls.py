@@ -1,7 +1,7 @@
 from django.contrib.auth import views as auth_views
 from django.contrib import admin
 from django.urls import path, include
-from .views import IndexView, update_task, register, CustomLoginView
+from .views import IndexView, CalendarView, TaskListsView, TaskListView, user_timezone, calendar_feed, task_feed, update_task, move_task, task_history, autocomplete, export_tasks, job_status, job_download, sync, service_worker, register, CustomLoginView
 from django.shortcuts import redirect
 
 def redirect_if_not_logged_in(request):
@@ -15,7 +15,23 @@ urlpatterns = [
     path("login/", CustomLoginView.as_view(), name="login"),
     path("logout/", auth_views.LogoutView.as_view(next_page="login"), name="logout"),
     path("", IndexView.as_view(), name="index"),
+    path("day/<int:year>/<int:month>/<int:day>/", IndexView.as_view(), name="day"),
+    path("calendar/", CalendarView.as_view(), name="calendar"),
+    path("calendar/<int:year>/<int:month>/", CalendarView.as_view(), name="calendar_month"),
+    path("settings/timezone/", user_timezone, name="user_timezone"),
+    path("settings/calendar-feed/", calendar_feed, name="calendar_feed"),
+    path("feed/<str:token>.ics", task_feed, name="task_feed"),
+    path("lists/", TaskListsView.as_view(), name="task_lists"),
+    path("lists/<uuid:list_id>/", TaskListView.as_view(), name="task_list"),
     path("update_task/", update_task, name="update_task"),
+    path("move_task/", move_task, name="move_task"),
+    path("history/", task_history, name="task_history"),
+    path("sync/", sync, name="sync"),
+    path("autocomplete/", autocomplete, name="autocomplete"),
+    path("jobs/export/", export_tasks, name="export_tasks"),
+    path("jobs/<int:job_id>/", job_status, name="job_status"),
+    path("jobs/<int:job_id>/download/", job_download, name="job_download"),
+    path("sw.js", service_worker, name="service_worker"),
     path('accounts/', include('django.contrib.auth.urls')),
     path("register/", register, name="register"),
 ]
\ No newline at end of file
@@ -1,16 +1,97 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.core.files.storage import storages
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_protect
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views import generic
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.views import LoginView
+from django.contrib.auth.models import User
 from django.contrib.auth import login
 from django.contrib import messages
-from .models import Task
+from .audit import history_for, record_change
+from .autocomplete import forget, remember, renamed, suggest
+from .breaker import save_snapshot
+from .idempotency import idempotent
+from .ical import feed_response
+from .bulk import clear_completed, delete_tasks, filter_tasks, mark_done
+from .jobs import enqueue
+from .models import Job, ListMembership, Profile, Project, Tag, Task, TaskAudit, TaskList, TaskTag
+from .outbox import TASK_CREATED, TASK_DELETED, TASK_UPDATED, record_events, task_payload
+from .ranking import rank_after, rank_between
+from .routers import pin_to_primary
+from .sharding import is_frozen, task_database
+from .sharing import can_edit, forget_memberships, list_memberships, membership_for
+from .sync import changes_since, hold_changes, next_change, record_deletions
+from .timezones import day_bounds, month_bounds, set_user_timezone
+import calendar
+import datetime
+import functools
+import json
+import logging
 import re
+import secrets
+import zoneinfo
+
+logger = logging.getLogger(__name__)
+
+def parse_local_datetime(value):
+    """Parse a datetime-local form value, returning None when it is empty or invalid."""
+    try:
+        parsed = parse_datetime(value.strip())
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def parse_client_timestamp(value):
+    """Return the client's edit time (ms since the epoch), never later than now."""
+    now = timezone.now()
+    try:
+        client_time = datetime.datetime.fromtimestamp(int(value) / 1000, tz=datetime.timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+    return min(client_time, now)
+
+def task_text_error(task_text):
+    """The message to show for an invalid new task text, or None."""
+    if not task_text or not re.search(r"[a-zA-Z0-9]", task_text):
+        return 'Task must contain at least one letter or number.'
+    if len(task_text) > 255:
+        return 'Task is too long!'
+    return None
+
+def new_task_texts(request):
+    """The texts of the tasks a request creates: the non-blank lines of `task_text`, or a JSON array of strings.
+
+    Returns (texts, errors); errors are (line number, message) pairs, with
+    None as the line number for errors about the whole input.
+    """
+    if request.content_type == 'application/json':
+        try:
+            lines = json.loads(request.body)
+        except ValueError:
+            lines = None
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            return [], [(None, 'Send a JSON array of task texts.')]
+    else:
+        lines = request.POST.get('task_text', '').splitlines()
+    numbered = [(number, line.strip()) for number, line in enumerate(lines, 1) if line.strip()]
+    if not numbered:
+        return [], [(None, task_text_error(''))]
+    if len(numbered) > settings.QUICK_ADD_MAX_TASKS:
+        return [], [(None, f'You can add at most {settings.QUICK_ADD_MAX_TASKS} tasks at once.')]
+    texts = [text for _, text in numbered]
+    return texts, [(number, task_text_error(text)) for number, text in numbered if task_text_error(text)]
 
 class CustomLoginView(LoginView):
     template_name = 'todolist/login.html'
@@ -21,65 +102,450 @@ def register(request):
         if form.is_valid():
             user = form.save()
             login(request, user)  
+            # The new user isn't on the replicas yet.
+            pin_to_primary(request)
             return redirect("todolist:index") 
     else:
         form = UserCreationForm()
     return render(request, "registration/register.html", {"form": form})
 
-class IndexView(LoginRequiredMixin, generic.ListView):
+def job_started(request, job, next_url):
+    """Answer a request whose work was queued as `job`: with the job's status URL, or back to `next_url`, which polls it."""
+    status_url = reverse('todolist:job_status', args=[job.id])
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'status': 'queued', 'job_id': job.id, 'status_url': status_url}, status=202)
+    messages.info(request, 'This will take a while, the page refreshes when it is done.')
+    return redirect(f'{next_url}?job={job.id}')
+
+class TaskPageMixin:
+    """Paginate a ListView of tasks by INDEX_PAGE_SIZE without counting them."""
+
+    def get_paginate_by(self, queryset):
+        return settings.INDEX_PAGE_SIZE
+
+    def page_query(self, number):
+        """The query string of another page, keeping the other parameters (filters)."""
+        query = self.request.GET.copy()
+        query['page'] = number
+        return query.urlencode()
+
+    def paginate_queryset(self, queryset, page_size):
+        """Return one page of tasks, fetching a row more instead of counting them all."""
+        page = self.request.GET.get('page', '')
+        number = int(page) if page.isdigit() and int(page) > 0 else 1
+        if number > settings.INDEX_MAX_PAGE:
+            raise Http404("No such page.")
+        offset = (number - 1) * page_size
+        tasks = list(queryset[offset:offset + page_size + 1])
+        has_next = len(tasks) > page_size
+        page_obj = {
+            'number': number,
+            'previous_query': self.page_query(number - 1) if number > 1 else None,
+            'next_query': self.page_query(number + 1) if has_next else None,
+        }
+        return None, page_obj, tasks[:page_size], number > 1 or has_next
+
+class IndexView(LoginRequiredMixin, TaskPageMixin, generic.ListView):
     template_name = "todolist/index.html"
     login_url = "todolist:login"
     redirect_field_name = "next"
     context_object_name = 'task_list_today'
 
+    def get_day(self):
+        """The day shown: the one in the URL, or today in the user's timezone."""
+        if 'year' not in self.kwargs:
+            return timezone.localdate()
+        try:
+            day = datetime.date(self.kwargs['year'], self.kwargs['month'], self.kwargs['day'])
+        except ValueError:
+            raise Http404("Invalid date.")
+        # The page links the days around it, and the day's UTC bounds must fit a datetime.
+        if not datetime.date.min < day < datetime.date.max:
+            raise Http404("Invalid date.")
+        return day
+
+    def day_tasks(self):
+        """The user's tasks of the day shown, as a UTC range lookup on pub_date."""
+        start, end = day_bounds(self.get_day())
+        return Task.objects.for_user(self.request.user).filter(
+            user=self.request.user, task_list__isnull=True, pub_date__gte=start, pub_date__lt=end,
+        )
+
     def get_queryset(self):
-        """Return the Tasks of the specified user today."""
-        today = timezone.now().date()
-        return Task.objects.filter(user=self.request.user, pub_date__date=today).order_by("pub_date")
+        """Return the Tasks of the specified user for the day, optionally filtered by project or tag."""
+        queryset = filter_tasks(self.day_tasks(), self.request.GET.get('project', ''), self.request.GET.get('tag', ''))
+        # One query for the tasks with their project, one for all their tags. Only the
+        # columns the list shows are loaded.
+        return (
+            queryset.select_related("project").prefetch_related("tags")
+            .only("id", "task_text", "done", "due_at", "project__name")
+            .order_by("rank", "pub_date", "id")
+        )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['projects'] = Project.objects.for_user(self.request.user).filter(user=self.request.user).order_by('name')
+        context['tags'] = Tag.objects.for_user(self.request.user).filter(user=self.request.user).order_by('name')
+        day = self.get_day()
+        context['day'] = day
+        context['is_today'] = day == timezone.localdate()
+        context['previous_day'] = day - datetime.timedelta(days=1)
+        context['next_day'] = day + datetime.timedelta(days=1)
+        job = self.request.GET.get('job', '')
+        if job.isdigit():
+            context['job_status_url'] = reverse('todolist:job_status', args=[int(job)])
+        if not self.request.GET:
+            save_snapshot(self.request, day, context['task_list_today'])
+        return context
+
+    @method_decorator(idempotent)
     def post(self, request, *args, **kwargs):
-        """Handle the creation of the task."""
+        """Handle the creation of the tasks, one per line of the text (or per item of a JSON array)."""
         if not request.user.is_authenticated:
             messages.error(request, 'You must be logged in to create a task.')
             return redirect("todolist:login")
 
+        if 'bulk_action' in request.POST:
+            return self.bulk_action(request, *args, **kwargs)
+
+        wants_json = request.content_type == 'application/json' or request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        task_texts, errors = new_task_texts(request)
+        if errors:
+            if wants_json:
+                return JsonResponse({
+                    'status': 'error', 'errors': [{'line': line, 'message': message} for line, message in errors],
+                }, status=400)
+            for line, message in errors:
+                messages.error(request, f'Line {line}: {message}' if line and len(task_texts) > 1 else message)
+            return self.get(request, *args, **kwargs)
+        if is_frozen(request.user):
+            if wants_json:
+                return JsonResponse({'status': 'error', 'message': 'Your tasks are being moved, please try again in a moment.'}, status=503)
+            messages.error(request, 'Your tasks are being moved, please try again in a moment.')
+            return self.get(request, *args, **kwargs)
+        pin_to_primary(request)
+        project_name = request.POST.get('project', '').strip()[:100]
+        project = None
+        if project_name:
+            project, _ = Project.objects.for_user(request.user).get_or_create(user=request.user, name=project_name)
+        tag_names = [name.strip()[:50] for name in request.POST.get('tags', '').split(',') if name.strip()]
+        tags = Tag.for_names(request.user, tag_names)
+        due_at = parse_local_datetime(request.POST.get('due_at', ''))
+        remind_at = parse_local_datetime(request.POST.get('remind_at', ''))
+        database = task_database(request.user)
+        now = timezone.now()
+        with transaction.atomic(using=database):
+            # bulk_create skips Task.save, so the ranks are appended here, after the user's last one.
+            rank = Task.objects.using(database).filter(user=request.user).order_by('-rank').values_list('rank', flat=True).first()
+            change_seq = next_change(request.user, database)
+            tasks = []
+            for task_text in task_texts:
+                rank = rank_after(rank)
+                tasks.append(Task(
+                    user=request.user, task_text=task_text, pub_date=now, rank=rank, project=project,
+                    due_at=due_at, remind_at=remind_at, change_seq=change_seq,
+                ))
+            Task.objects.using(database).bulk_create(tasks)
+            TaskTag.objects.using(database).bulk_create([TaskTag(task=task, tag=tag) for task in tasks for tag in tags])
+            record_events(request.user, TASK_CREATED, [task_payload(task) for task in tasks], database)
+            # Inside an idempotent request this waits for the key's transaction too.
+            transaction.on_commit(lambda: remember(request.user, task_texts), using=database)
+        if wants_json:
+            return JsonResponse({'status': 'success', 'created': [task.id for task in tasks]}, status=201)
+        return redirect('todolist:index')
+
+    BULK_ACTIONS = {
+        'mark_done': (mark_done, '{} task(s) marked done.'),
+        'clear_completed': (clear_completed, '{} completed task(s) deleted.'),
+        'clear_day': (delete_tasks, '{} task(s) deleted.'),
+    }
+
+    def bulk_action(self, request, *args, **kwargs):
+        """Apply one of BULK_ACTIONS to every task of the day shown, within the posted project and tag filters."""
+        action = self.BULK_ACTIONS.get(request.POST['bulk_action'])
+        if action is None:
+            messages.error(request, 'Unknown action.')
+            return self.get(request, *args, **kwargs)
+        if is_frozen(request.user):
+            messages.error(request, 'Your tasks are being moved, please try again in a moment.')
+            return self.get(request, *args, **kwargs)
+        pin_to_primary(request)
+        function, message = action
+        project, tag = request.POST.get('project', ''), request.POST.get('tag', '')
+        tasks = filter_tasks(self.day_tasks(), project, tag)
+        # Counting stops past the limit, so a huge day costs no more than a normal one here.
+        if tasks[:settings.JOB_INLINE_LIMIT + 1].count() > settings.JOB_INLINE_LIMIT:
+            start, end = day_bounds(self.get_day())
+            job = enqueue(
+                request.user, 'bulk_action',
+                action=request.POST['bulk_action'], start=start.isoformat(), end=end.isoformat(), project=project, tag=tag,
+            )
+            return job_started(request, job, request.path)
+        count = function(request.user, tasks)
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'status': 'success', 'count': count})
+        messages.success(request, message.format(count))
+        return redirect(request.get_full_path())
+
+class CalendarView(LoginRequiredMixin, generic.TemplateView):
+    template_name = "todolist/calendar.html"
+    login_url = "todolist:login"
+
+    def get_context_data(self, **kwargs):
+        """Per-day task counts for a month, from a single GROUP BY query."""
+        context = super().get_context_data(**kwargs)
+        today = timezone.localdate()
+        year = self.kwargs.get('year', today.year)
+        month = self.kwargs.get('month', today.month)
+        # Like days, the first month has no month before it, and may start before datetime.min in UTC.
+        if not 1 <= month <= 12 or not (1, 1) < (year, month) < (9999, 1):
+            raise Http404("Invalid month.")
+        start, end = month_bounds(year, month)
+        counts = {
+            row['day']: row
+            for row in Task.objects.for_user(self.request.user)
+            .filter(user=self.request.user, task_list__isnull=True, pub_date__gte=start, pub_date__lt=end)
+            .annotate(day=TruncDate('pub_date', tzinfo=timezone.get_current_timezone()))
+            .values('day')
+            .annotate(total=Count('id'), done=Count('id', filter=Q(done=True)))
+            .order_by('day')
+        }
+        context['weeks'] = [
+            [
+                {'date': day, 'in_month': day.month == month, 'counts': counts.get(day)}
+                for day in week
+            ]
+            for week in calendar.Calendar().monthdatescalendar(year, month)
+        ]
+        context['month'] = datetime.date(year, month, 1)
+        context['previous_month'] = context['month'] - datetime.timedelta(days=1)
+        context['next_month'] = context['month'] + datetime.timedelta(days=31)
+        return context
+
+class TaskListsView(LoginRequiredMixin, generic.TemplateView):
+    """The shared lists of the user, and creating a new one."""
+    template_name = "todolist/task_lists.html"
+    login_url = "todolist:login"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['memberships'] = sorted(list_memberships(self.request).items(), key=lambda item: item[1].name.lower())
+        return context
+
+    def post(self, request, *args, **kwargs):
+        name = request.POST.get('name', '').strip()[:100]
+        if not name:
+            messages.error(request, 'Give the list a name.')
+            return self.get(request, *args, **kwargs)
+        if is_frozen(request.user):
+            messages.error(request, 'Your tasks are being moved, please try again in a moment.')
+            return self.get(request, *args, **kwargs)
+        pin_to_primary(request)
+        # The list and its owner's membership go to the owner's shard.
+        with transaction.atomic(using=task_database(request.user)):
+            task_list = TaskList.objects.for_user(request.user).create(user=request.user, name=name)
+            ListMembership.objects.for_user(request.user).create(task_list=task_list, user=request.user, role=ListMembership.OWNER)
+        return redirect('todolist:task_list', list_id=task_list.id)
+
+class TaskListView(LoginRequiredMixin, TaskPageMixin, generic.ListView):
+    """The tasks of a shared list, newest first, for its members."""
+    template_name = "todolist/task_list.html"
+    login_url = "todolist:login"
+    context_object_name = 'tasks'
+
+    def get_membership(self):
+        membership = membership_for(self.request, self.kwargs['list_id'])
+        if membership is None:
+            raise Http404("No such list.")
+        return membership
+
+    def get_queryset(self):
+        """The list's tasks, joined on the user's membership so a non-member gets nothing."""
+        return (
+            Task.objects.using(self.get_membership().database)
+            .filter(task_list_id=self.kwargs['list_id'], task_list__memberships__user=self.request.user)
+            .only("id", "task_text", "done", "due_at")
+            .order_by("-pub_date", "-id")
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        membership = self.get_membership()
+        members = dict(
+            ListMembership.objects.using(membership.database)
+            .filter(task_list_id=self.kwargs['list_id']).values_list('user_id', 'role')
+        )
+        context['membership'] = membership
+        context['can_edit'] = membership.role in ListMembership.EDIT_ROLES
+        context['is_owner'] = membership.role == ListMembership.OWNER
+        context['members'] = [
+            (username, members[user_id])
+            for user_id, username in User.objects.filter(id__in=members).order_by('username').values_list('id', 'username')
+        ]
+        context['roles'] = ListMembership.ROLE_CHOICES[1:]
+        return context
+
+    def post(self, request, *args, **kwargs):
+        """Add a task (editors), or share the list with another user (the owner)."""
+        membership = self.get_membership()
+        if is_frozen(membership.owner_id):
+            messages.error(request, 'This list is being moved, please try again in a moment.')
+            return self.get(request, *args, **kwargs)
+        if 'username' in request.POST:
+            return self.share(request, membership, *args, **kwargs)
+        if membership.role not in ListMembership.EDIT_ROLES:
+            messages.error(request, 'You can only view this list.')
+            return self.get(request, *args, **kwargs)
         task_text = request.POST.get('task_text', '').strip()
-        if not task_text or not re.search(r"[a-zA-Z0-9]", task_text): 
-            messages.error(request, 'Task must contain at least one letter or number.')
-            return render(request, self.template_name, {'task_list_today': self.get_queryset()})
-        if len(task_text) > 255:
-            messages.error(request, 'Task is too long!')
-            return render(request, self.template_name, {'task_list_today': self.get_queryset()})
-        Task.objects.create(
-            user=request.user,
-            task_text=task_text,
-            pub_date=timezone.now() 
+        error = task_text_error(task_text)
+        if error:
+            messages.error(request, error)
+            return self.get(request, *args, **kwargs)
+        pin_to_primary(request)
+        with transaction.atomic(using=membership.database):
+            hold_changes(membership.owner_id, membership.database)
+            task = Task.objects.using(membership.database).create(
+                user=request.user,
+                task_list_id=self.kwargs['list_id'],
+                task_text=task_text,
+                pub_date=timezone.now(),
+                due_at=parse_local_datetime(request.POST.get('due_at', '')),
+            )
+            record_events(request.user, TASK_CREATED, [task_payload(task)], membership.database)
+        return redirect('todolist:task_list', list_id=self.kwargs['list_id'])
+
+    def share(self, request, membership, *args, **kwargs):
+        role = request.POST.get('role', ListMembership.EDITOR)
+        if membership.role != ListMembership.OWNER:
+            messages.error(request, 'Only the owner can share this list.')
+            return self.get(request, *args, **kwargs)
+        if role not in dict(ListMembership.ROLE_CHOICES[1:]):
+            messages.error(request, 'Pick a valid role.')
+            return self.get(request, *args, **kwargs)
+        member = User.objects.filter(username=request.POST['username'].strip()).first()
+        if member is None or member == request.user:
+            messages.error(request, 'No other user with that name.')
+            return self.get(request, *args, **kwargs)
+        pin_to_primary(request)
+        ListMembership.objects.using(membership.database).update_or_create(
+            task_list_id=self.kwargs['list_id'], user=member, defaults={'role': role},
         )
-        return redirect('todolist:index')
+        forget_memberships(request)
+        messages.success(request, f'{membership.name} shared with {member.username}.')
+        return redirect('todolist:task_list', list_id=self.kwargs['list_id'])
+
+def user_timezone(request):
+    """Let the user pick the timezone their days are computed in."""
+    if not request.user.is_authenticated:
+        return redirect("todolist:login")
+    if request.method == "POST":
+        name = request.POST.get('timezone', '')
+        if name in zoneinfo.available_timezones():
+            set_user_timezone(request, name)
+            return redirect("todolist:index")
+        messages.error(request, 'Select a valid timezone.')
+    return render(request, "todolist/timezone.html", {
+        'timezones': sorted(zoneinfo.available_timezones()),
+        'current': timezone.get_current_timezone_name(),
+    })
+
+def calendar_feed(request):
+    """Show the URL of the user's calendar feed. POST gives it a new URL, so the old one stops working."""
+    if not request.user.is_authenticated:
+        return redirect("todolist:login")
+    if request.method == "POST":
+        pin_to_primary(request)
+        Profile.objects.update_or_create(user=request.user, defaults={'feed_token': secrets.token_urlsafe(32)})
+        messages.success(request, 'Your calendar feed has a new URL.')
+        return redirect("todolist:calendar_feed")
+    token = Profile.objects.filter(user=request.user).values_list('feed_token', flat=True).first()
+    return render(request, "todolist/calendar_feed.html", {
+        'feed_url': request.build_absolute_uri(reverse('todolist:task_feed', args=[token])) if token else None,
+    })
+
+def task_feed(request, token):
+    """The iCalendar feed of the user whose feed token is in the URL; no login, calendar apps poll it."""
+    profile = Profile.objects.filter(feed_token=token).values_list('user_id', 'timezone').first()
+    if profile is None:
+        raise Http404("No such feed.")
+    user_id, timezone_name = profile
+    return feed_response(request, user_id, timezone_name, task_database(user_id))
+
+def update_database(request):
+    """The database update_task writes to: the list owner's shard for a task of a shared list."""
+    membership = membership_for(request, request.POST.get('list_id'))
+    return membership.database if membership else task_database(request.user)
+
+def log_task_update(task_id, action, **fields):
+    """Log a task update as a sampled "update_task" event, see LOG_SAMPLE_RATES."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Task %s: %s", task_id, action, extra={'event': 'update_task', 'task_id': task_id, 'action': action, **fields})
 
 @csrf_protect 
+@idempotent(database=update_database)
 def update_task(request):
-    """Handle AJAX request to update task status and text."""
+    """Handle AJAX request to update task status and text.
+
+    Offline clients replay queued edits with the time they were made in
+    `client_ts`; an edit older than the task's last one is answered with
+    status "stale" and the current values instead of being applied.
+    """
     if not request.user.is_authenticated:
         messages.error(request, 'You must be logged in to update a task.')
         return redirect("todolist:login")
     if request.method == "POST":
+        # Tasks of a shared list are stored with the list, on its owner's shard.
+        membership = membership_for(request, request.POST.get('list_id'))
+        if is_frozen(membership.owner_id if membership else request.user):
+            return JsonResponse({'status': 'error', 'message': 'Your tasks are being moved, please try again in a moment.'}, status=503)
+        pin_to_primary(request)
+        tasks = Task.objects.using(membership.database) if membership else Task.objects.for_user(request.user)
         task_id = request.POST.get('task_id', '')
         try:
-            task = Task.objects.get(id=task_id)
-        except Task.DoesNotExist:
+            # The permission check is part of the query that loads the task.
+            task = tasks.annotate(can_edit=can_edit(request.user)).get(id=task_id)
+        except (Task.DoesNotExist, ValueError):
             return JsonResponse({'status': 'error', 'message': 'Select a valid task.'}, status=404)
 
-        if task.user != request.user:
+        if not task.can_edit:
             return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+        # Edits replayed by an offline client lose against any newer edit.
+        edited_at = parse_client_timestamp(request.POST.get('client_ts'))
+        if task.updated_at and edited_at < task.updated_at:
+            return JsonResponse({'status': 'stale', 'task_text': task.task_text, 'done': task.done}, status=409)
+        task.updated_at = edited_at
+        database = task._state.db
+        # Personal tasks take a change number so syncing clients pick the write up.
+        tracked = task.task_list_id is None
             
         if request.POST.get('delete') == 'true':
-            task.delete()
+            with transaction.atomic(using=database):
+                # Bound now: the task has no id any more once deleted.
+                transaction.on_commit(
+                    functools.partial(record_change, request.user, task.id, TaskAudit.DELETE, task_text=task.task_text), using=database,
+                )
+                if tracked:
+                    transaction.on_commit(functools.partial(forget, task.user_id, [task.task_text]), using=database)
+                    record_deletions(task.user_id, [task.id], next_change(task.user_id, database), database)
+                else:
+                    hold_changes(membership.owner_id, database)
+                record_events(task.user_id, TASK_DELETED, [{'id': task.id, 'user_id': task.user_id}], database)
+                task.delete()
+            log_task_update(int(task_id), TaskAudit.DELETE)
             return JsonResponse({'status': 'success', 'message': 'Task deleted successfully.'})
 
         if 'done' in request.POST:
             task.done = request.POST['done'] == 'true'
-            task.save()
+            with transaction.atomic(using=database):
+                if tracked:
+                    task.change_seq = next_change(task.user_id, database)
+                else:
+                    hold_changes(membership.owner_id, database)
+                task.save()
+                record_events(task.user_id, TASK_UPDATED, [task_payload(task)], database)
+                transaction.on_commit(lambda: record_change(request.user, task.id, TaskAudit.TOGGLE, done=task.done), using=database)
+            log_task_update(task.id, TaskAudit.TOGGLE, done=task.done)
             return JsonResponse({'status': 'success'})
 
         task_text = request.POST.get('task_text', '').strip()
@@ -90,10 +556,183 @@ def update_task(request):
             if not re.search(r"[a-zA-Z0-9]", task_text):
                 return JsonResponse({'status': 'error', 'message': "Task must contain at least one letter or number."})
             
-            task.task_text = task_text
-            task.save()
+            old_text, task.task_text = task.task_text, task_text
+            with transaction.atomic(using=database):
+                if tracked:
+                    task.change_seq = next_change(task.user_id, database)
+                else:
+                    hold_changes(membership.owner_id, database)
+                task.save()
+                record_events(task.user_id, TASK_UPDATED, [task_payload(task)], database)
+                transaction.on_commit(lambda: record_change(request.user, task.id, TaskAudit.EDIT, old=old_text, new=task_text), using=database)
+                if tracked:
+                    transaction.on_commit(lambda: renamed(task.user_id, old_text, task_text), using=database)
+            log_task_update(task.id, TaskAudit.EDIT)
             return JsonResponse({'status': 'success'})
 
         return JsonResponse({'status': 'error', 'message': "Task cannot be empty!"})
     
-    return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=400)
\ No newline at end of file
+    return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=400)
+
+def autocomplete(request):
+    """Earlier task texts of the user starting with `q`, most used first, for the new task box."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'You must be logged in.'}, status=403)
+    prefix = request.GET.get('q', '')[:255]
+    return JsonResponse({'status': 'success', 'suggestions': suggest(request.user, prefix)})
+
+def service_worker(request):
+    """Serve the service worker from the site root so its scope covers every page."""
+    response = render(request, "todolist/sw.js", content_type="application/javascript")
+    response["Cache-Control"] = "no-cache"
+    return response
+
+def task_history(request):
+    """Return the user's task change history as JSON, optionally for one task."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'You must be logged in.'}, status=403)
+    task_id = request.GET.get('task_id', '')
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), 500) if limit.isdigit() else 100
+    history = history_for(request.user, task_id=int(task_id) if task_id.isdigit() else None)[:limit]
+    return JsonResponse({'status': 'success', 'history': [
+        {
+            'task_id': entry.task_id,
+            'action': entry.action,
+            'changes': entry.changes,
+            'created_at': entry.created_at.isoformat(),
+        }
+        for entry in history
+    ]})
+
+@csrf_protect
+def move_task(request):
+    """Handle AJAX request to move a task between two others, rewriting only its rank."""
+    if not request.user.is_authenticated:
+        messages.error(request, 'You must be logged in to move a task.')
+        return redirect("todolist:login")
+    if request.method != "POST":
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=400)
+
+    if is_frozen(request.user):
+        return JsonResponse({'status': 'error', 'message': 'Your tasks are being moved, please try again in a moment.'}, status=503)
+    pin_to_primary(request)
+    task_id = request.POST.get('task_id', '')
+    before_id = request.POST.get('before_id', '')
+    after_id = request.POST.get('after_id', '')
+    ids = [i for i in (task_id, before_id, after_id) if i]
+    if not task_id or not all(i.isdigit() for i in ids):
+        return JsonResponse({'status': 'error', 'message': 'Select a valid task.'}, status=404)
+
+    ranks = dict(Task.objects.for_user(request.user).filter(user=request.user, id__in=ids).values_list('id', 'rank'))
+    if any(int(i) not in ranks for i in ids):
+        return JsonResponse({'status': 'error', 'message': 'Select a valid task.'}, status=404)
+
+    before = ranks[int(before_id)] if before_id else ''
+    after = ranks[int(after_id)] if after_id else ''
+    # A page only shows some of the tasks: a task dropped at its top or bottom goes next to
+    # the neighbour on the page, not to an end of the whole list.
+    others = Task.objects.for_user(request.user).filter(user=request.user, task_list__isnull=True).exclude(id=task_id)
+    if after and not before:
+        before = others.filter(rank__lt=after).order_by('-rank').values_list('rank', flat=True).first() or ''
+    elif before and not after:
+        after = others.filter(rank__gt=before).order_by('rank').values_list('rank', flat=True).first() or ''
+    try:
+        rank = rank_between(before, after)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'The list changed, please reload.'}, status=409)
+
+    database = task_database(request.user)
+    with transaction.atomic(using=database):
+        Task.objects.using(database).filter(id=task_id).update(rank=rank, change_seq=next_change(request.user, database))
+    return JsonResponse({'status': 'success', 'rank': rank})
+
+def export_tasks(request):
+    """Start a background export of the user's tasks; the finished job offers them as a download."""
+    if not request.user.is_authenticated:
+        return redirect("todolist:login")
+    if request.method != "POST":
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=400)
+    pin_to_primary(request)
+    return job_started(request, enqueue(request.user, 'export_tasks'), reverse('todolist:index'))
+
+def job_status(request, job_id):
+    """Return the status, progress and result of one of the user's background jobs as JSON, for the UI to poll.
+
+    A job that wrote a file gets a `download_url` instead of the file's name.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'You must be logged in.'}, status=403)
+    job = Job.objects.filter(id=job_id, user=request.user).first()
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': 'Job not found.'}, status=404)
+    result = job.result
+    download_url = None
+    if isinstance(result, dict) and 'file' in result:
+        result = {key: value for key, value in result.items() if key != 'file'}
+        download_url = reverse('todolist:job_download', args=[job.id])
+    return JsonResponse({'status': 'success', 'job': {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'result': result,
+        'download_url': download_url,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }})
+
+def job_download(request, job_id):
+    """Stream the file written by one of the user's finished jobs, such as a task export."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'You must be logged in.'}, status=403)
+    result = Job.objects.filter(id=job_id, user=request.user, status=Job.DONE).values_list('result', flat=True).first()
+    if not isinstance(result, dict) or 'file' not in result:
+        raise Http404("No such download.")
+    try:
+        exported = storages['exports'].open(result['file'], 'rb')
+    except FileNotFoundError:
+        raise Http404("The file is gone, export again.")
+    return FileResponse(exported, as_attachment=True, filename='tasks.json', content_type='application/json')
+
+def sync(request):
+    """Return the user's task changes after the `since` cursor as JSON, with the ids of deleted tasks.
+
+    Without `since` every task is returned. Clients pass the returned cursor
+    next time, and ask again right away while `has_more` is true. A cursor
+    older than the kept deletions is answered with status "reset" (410): the
+    client reloads everything.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'You must be logged in.'}, status=403)
+    since = request.GET.get('since', '')
+    if since and not since.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor.'}, status=400)
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), 2000) if limit.isdigit() and int(limit) > 0 else 500
+    try:
+        cursor, has_more, tasks, deleted = changes_since(
+            request.user, int(since) if since else None, limit, task_database(request.user),
+        )
+    except ValueError:
+        return JsonResponse({'status': 'reset', 'message': 'Reload to sync again.'}, status=410)
+    return JsonResponse({
+        'status': 'success',
+        'cursor': cursor,
+        'has_more': has_more,
+        'tasks': [
+            {
+                'id': task.id,
+                'task_text': task.task_text,
+                'done': task.done,
+                'rank': task.rank,
+                'pub_date': task.pub_date.isoformat(),
+                'due_at': task.due_at.isoformat() if task.due_at else None,
+                'project_id': task.project_id,
+            }
+            for task in tasks
+        ],
+        'deleted': deleted,
+    })